@@ -0,0 +1,230 @@
+"""
+Offline evaluation runner.
+
+Plays a JSONL dataset of scripted multi-turn conversations through the real
+graph with `start()` (no REST server), on the in-memory checkpointer, and
+writes each turn's answer, latency and token usage to a JSONL results file,
+so prompts and model configurations can be compared on the same dataset.
+
+    python -m benchmarks.evaluate dataset.jsonl --output results/gpt.jsonl
+    python -m benchmarks.evaluate dataset.jsonl --output results/fake.jsonl --fake-llm
+    python -m benchmarks.evaluate dataset.jsonl --output results/gpt.jsonl --label v2
+
+The providers, vectorstore and RAG setting are the ones configured in the
+environment (`--fake-llm` for the offline fakes, without RAG). Each dataset
+line is one conversation, as in the load test scripts, with an optional `id`:
+
+    {"id": "billing-1", "turns": [{"data": "Hi!"}, {"data": "And then?"}]}
+
+Turns with `"system": true` are sent as system instructions. Conversations run
+concurrently over `--concurrency` workers, each on a thread of its own, with
+their turns in order. A conversation's results are appended once it finished,
+so an interrupted run resumes where it stopped: conversations already in the
+results file are skipped, unless their last attempt failed.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from benchmarks.offline import configure_offline_env
+from benchmarks.report import percentiles
+from benchmarks.run import Turn
+
+logger = logging.getLogger(__name__)
+
+
+class Conversation(BaseModel):
+    id: str
+    turns: list[dict[str, Any]]
+
+
+class TurnResult(BaseModel):
+    conversation_id: str
+    turn: int = Field(description="Position of the turn in the conversation.")
+    label: str | None = Field(
+        default=None, description="Name of the configuration under evaluation."
+    )
+    system: bool = False
+    input: Any
+    answer: Any = Field(default=None, description="The answer, for user turns.")
+    latency_s: float
+    input_tokens: int = 0
+    output_tokens: int = 0
+    llm_calls: int = 0
+    error: str | None = None
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("dataset", type=Path)
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--label", help="Tag the results with a configuration name.")
+    parser.add_argument(
+        "--fake-llm", action="store_true", help="Use the offline fake providers."
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120, help="Seconds allowed per turn."
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def load_dataset(path: Path) -> list[Conversation]:
+    conversations = []
+    with path.open(encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            conversation = json.loads(line)
+            conversations.append(
+                Conversation(
+                    id=str(conversation.get("id", number)),
+                    turns=conversation["turns"],
+                )
+            )
+    if not any(c.turns for c in conversations):
+        raise SystemExit(f"No turns in {path}.")
+    return conversations
+
+
+def completed_conversations(path: Path) -> set[str]:
+    """IDs of the conversations whose last attempt in `path` had no errors."""
+    if not path.exists():
+        return set()
+    failed: dict[str, bool] = {}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = TurnResult.model_validate_json(line)
+            # A conversation's first turn starts a new attempt at it
+            if result.turn == 0:
+                failed[result.conversation_id] = False
+            if result.error:
+                failed[result.conversation_id] = True
+    return {conversation for conversation, error in failed.items() if not error}
+
+
+async def evaluate(
+    conversations: list[Conversation], args: argparse.Namespace
+) -> list[TurnResult]:
+    from langchain_core.messages import SystemMessage
+    from langchain_core.runnables import RunnableConfig
+
+    from src.agent import start
+    from src.agent.input_message import to_input_message
+    from src.token_usage import TokenUsage
+
+    run_id = uuid.uuid4().hex[:8]
+    queue: asyncio.Queue[Conversation] = asyncio.Queue()
+    for conversation in conversations:
+        queue.put_nowait(conversation)
+    results: list[TurnResult] = []
+
+    async def play(conversation: Conversation) -> list[TurnResult]:
+        config: RunnableConfig = {
+            "configurable": {"thread_id": f"eval-{run_id}-{conversation.id}"}
+        }
+        played = []
+        for index, raw in enumerate(conversation.turns):
+            turn = Turn(raw["data"], system=raw.get("system", False))
+            if turn.system:
+                message = to_input_message(turn.data, SystemMessage)
+                function = "context_incrementer"
+            else:
+                message, function = to_input_message(turn.data), "response_generator"
+            result = TurnResult(
+                conversation_id=conversation.id,
+                turn=index,
+                label=args.label,
+                system=turn.system,
+                input=turn.data,
+                latency_s=0,
+            )
+            started = time.perf_counter()
+            try:
+                state = await asyncio.wait_for(
+                    start([message], config, function), timeout=args.timeout
+                )
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+            else:
+                usage = TokenUsage.model_validate(state.get("run_token_usage") or {})
+                result.input_tokens = usage.input_tokens
+                result.output_tokens = usage.output_tokens
+                result.llm_calls = usage.calls
+                if not turn.system and state.get("response") is not None:
+                    result.answer = state["response"].content[0]
+            result.latency_s = time.perf_counter() - started
+            played.append(result)
+            # The rest of the conversation builds on an answer it did not get
+            if result.error:
+                break
+        return played
+
+    async def worker() -> None:
+        with args.output.open("a", encoding="utf-8") as out:
+            while not queue.empty():
+                played = await play(queue.get_nowait())
+                out.writelines(r.model_dump_json() + "\n" for r in played)
+                out.flush()
+                results.extend(played)
+                logger.info(f"{len(results)} turns evaluated.")
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return results
+
+
+def format_summary(results: list[TurnResult]) -> str:
+    answered = [r for r in results if not r.system]
+    errors = [r for r in results if r.error]
+    latency = percentiles([r.latency_s for r in answered if not r.error])
+    lines = [
+        f"{len(results)} turns ({len(answered)} answered), {len(errors)} errors",
+        f"   tokens: {sum(r.input_tokens for r in results)} in / "
+        f"{sum(r.output_tokens for r in results)} out, "
+        f"{sum(r.llm_calls for r in results)} LLM calls",
+    ]
+    if latency is not None:
+        lines.append(
+            f"   latency ms: p50 {latency.p50:.0f}  p95 {latency.p95:.0f}  "
+            f"p99 {latency.p99:.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    if args.fake_llm:
+        configure_offline_env()
+    else:
+        # Configured providers, vectorstore and RAG; only the checkpointer is
+        # in-memory, so the conversations never touch stored threads
+        os.environ["POSTGRES_URI"] = ""
+
+    conversations = load_dataset(args.dataset)
+    done = completed_conversations(args.output)
+    pending = [c for c in conversations if c.id not in done]
+    if done:
+        print(f"Resuming: {len(conversations) - len(pending)} conversations done.")
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = asyncio.run(evaluate(pending, args))
+    print(format_summary(results))
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+Load test.
+
+Drives `/agent/messages/user` or `/agent/messages/user/websocket` of a running
+server with many concurrent conversations, each played from a JSONL script
+with think times between turns, and reports latency, time-to-first-token,
+error rates and server CPU/memory for each concurrency level, so the point
+where p95 degrades shows up as a curve.
+
+    python -m benchmarks.load --scenario websocket --concurrency 1 4 16 64
+    python -m benchmarks.load --script my_conversations.jsonl --p95-slo 500
+    python -m benchmarks.load --url http://localhost:8000 --concurrency 8 32
+
+Unless `--url` is given, the server is started as a separate process with the
+offline configuration: fake (or, with `--cassette`, recorded) providers and
+the in-memory checkpointer standing in for Postgres (`--postgres-uri` to use
+a local one instead).
+
+Each script line is one conversation:
+
+    {"turns": [{"data": "Hi!"}, {"data": "And then?", "think_time": 5}]}
+
+`think_time` is the seconds the user waits before sending the turn; without
+it, waits are drawn from an exponential distribution around `--think-time`.
+Turns with `"system": true` are sent to `/agent/messages/system` and not
+measured.
+
+Server CPU and memory come from the process metrics on `/metrics`, which are
+only available for a single-process server (not in gunicorn multiprocess mode).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from benchmarks.offline import configure_cassette_replay, configure_offline_env, free_port
+from benchmarks.report import (
+    LoadReport,
+    ResourceUsage,
+    Sample,
+    build_load_level,
+    format_load_report,
+)
+from benchmarks.run import Turn, recorded_conversations, websocket_turn
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("rest", "websocket")
+DEFAULT_SCRIPT = Path(__file__).parent / "conversations.jsonl"
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        help="Concurrent conversations of each level.",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=60, help="Seconds per concurrency level."
+    )
+    parser.add_argument("--script", type=Path, help="JSONL conversation script.")
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=3,
+        help="Mean seconds between turns without a scripted think time.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument(
+        "--p95-slo",
+        type=float,
+        help="p95 time-to-first-token (ms) to report the sustained concurrency for.",
+    )
+    parser.add_argument("--url", help="Load an already running server instead.")
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="Fake LLM seconds to first token."
+    )
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=50, help="Fake LLM streaming rate."
+    )
+    parser.add_argument("--cassette", type=Path, help="Replay a recorded cassette.")
+    parser.add_argument(
+        "--cassette-timing",
+        action="store_true",
+        help="Reproduce the recorded provider timings when replaying.",
+    )
+    parser.add_argument("--postgres-uri", help="Checkpoint to a local Postgres.")
+    parser.add_argument("--output", type=Path, help="Write the reports as JSON.")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def load_script(path: Path) -> list[list[Turn]]:
+    conversations = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            conversation = json.loads(line)
+            conversations.append(
+                [
+                    Turn(
+                        turn["data"],
+                        system=turn.get("system", False),
+                        think_time=turn.get("think_time"),
+                    )
+                    for turn in conversation["turns"]
+                ]
+            )
+    if not any(conversations):
+        raise SystemExit(f"No turns in {path}.")
+    return conversations
+
+
+class ServerResources:
+    """Samples the server's CPU time and resident memory from `/metrics`."""
+
+    def __init__(self, client, interval: float = 1.0):
+        self.client = client
+        self.interval = interval
+
+    async def _scrape(self) -> tuple[float | None, float | None]:
+        from prometheus_client.parser import text_string_to_metric_families
+
+        cpu = rss = None
+        try:
+            response = await self.client.get("/metrics")
+            response.raise_for_status()
+        except Exception as e:
+            logger.debug(f"Could not scrape server metrics: {e}")
+            return None, None
+        for family in text_string_to_metric_families(response.text):
+            for sample in family.samples:
+                if sample.name == "process_cpu_seconds_total":
+                    cpu = sample.value
+                elif sample.name == "process_resident_memory_bytes":
+                    rss = sample.value
+        return cpu, rss
+
+    @asynccontextmanager
+    async def measure(self) -> AsyncIterator[ResourceUsage]:
+        usage = ResourceUsage()
+        cpu_before, _ = await self._scrape()
+        started = time.perf_counter()
+        peak: list[float] = []
+
+        async def sample_rss() -> None:
+            while True:
+                _, rss = await self._scrape()
+                if rss is not None:
+                    peak.append(rss)
+                await asyncio.sleep(self.interval)
+
+        sampler = asyncio.create_task(sample_rss())
+        try:
+            yield usage
+        finally:
+            sampler.cancel()
+            cpu_after, rss = await self._scrape()
+            if rss is not None:
+                peak.append(rss)
+            if cpu_before is not None and cpu_after is not None:
+                elapsed = time.perf_counter() - started
+                usage.cpu_percent = (cpu_after - cpu_before) / elapsed * 100
+            if peak:
+                usage.rss_peak_mb = max(peak) / 2**20
+
+
+async def run_level(
+    scenario: str,
+    conversations: list[list[Turn]],
+    concurrency: int,
+    args: argparse.Namespace,
+    client,
+    base_url: str,
+) -> tuple[list[Sample], float]:
+    """
+    Play conversations on `concurrency` simulated users for `args.duration`
+    seconds. Every played conversation gets a fresh thread; turns already
+    sent when the time is up are awaited but no new ones start.
+    """
+    import httpx
+
+    ws_url = base_url.replace("http://", "ws://", 1)
+    run_id = uuid.uuid4().hex[:8]
+    deadline = time.perf_counter() + args.duration
+    samples: list[Sample] = []
+    played = 0
+
+    async def send(thread_id: str, turn: Turn) -> Sample:
+        if scenario == "websocket" and not turn.system:
+            return await websocket_turn(ws_url, thread_id, turn.data, args.timeout)
+        started = time.perf_counter()
+        response = await client.post(
+            "/agent/messages/system" if turn.system else "/agent/messages/user",
+            json={"data": turn.data, "thread_id": thread_id},
+        )
+        response.raise_for_status()
+        return Sample(latency=time.perf_counter() - started)
+
+    async def user(u: int) -> None:
+        nonlocal played
+        rng = random.Random(args.seed * 100_003 + u)
+        # Spread the first requests instead of sending them all at once
+        await asyncio.sleep(rng.uniform(0, args.think_time))
+        while time.perf_counter() < deadline:
+            c, played = played, played + 1
+            thread_id = f"load-{run_id}-{c}"
+            for turn in conversations[c % len(conversations)]:
+                think_time = turn.think_time
+                if think_time is None:
+                    think_time = rng.expovariate(1 / args.think_time)
+                await asyncio.sleep(think_time)
+                if time.perf_counter() >= deadline:
+                    return
+                try:
+                    sample = await send(thread_id, turn)
+                except httpx.HTTPStatusError as e:
+                    sample = _failed(f"http {e.response.status_code}")
+                except TimeoutError:
+                    sample = _failed("timeout")
+                except Exception as e:
+                    logger.warning(f"Request on {thread_id} failed: {e}")
+                    sample = _failed(type(e).__name__)
+                if not turn.system:
+                    samples.append(sample)
+                if not sample.ok:
+                    break  # The rest of the conversation depends on this turn
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def _failed(kind: str) -> Sample:
+    return Sample(latency=0, ok=False, error=kind)
+
+
+@asynccontextmanager
+async def local_server() -> AsyncIterator[str]:
+    """Start the app in its own process, so its resources are measured alone."""
+    import httpx
+
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT_DIR,
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            async with asyncio.timeout(60):
+                while True:
+                    if process.poll() is not None:
+                        raise SystemExit("The server exited during startup.")
+                    try:
+                        (await client.get("/metrics")).raise_for_status()
+                        break
+                    except httpx.HTTPError:
+                        await asyncio.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run_load(args: argparse.Namespace) -> list[LoadReport]:
+    import httpx
+
+    if args.script or not args.cassette:
+        conversations = load_script(args.script or DEFAULT_SCRIPT)
+    else:
+        conversations = recorded_conversations(args.cassette, 1)
+
+    server = local_server() if args.url is None else _remote(args.url)
+    reports = []
+    async with server as base_url:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(
+            base_url=base_url, timeout=args.timeout, limits=limits
+        ) as client:
+            resources = ServerResources(client)
+            for scenario in args.scenario:
+                report = LoadReport(scenario=scenario, levels=[])
+                for concurrency in sorted(args.concurrency):
+                    async with resources.measure() as usage:
+                        samples, duration = await run_level(
+                            scenario, conversations, concurrency, args, client, base_url
+                        )
+                    report.levels.append(
+                        build_load_level(concurrency, samples, duration, usage)
+                    )
+                    logger.info(f"{scenario}: {concurrency} users done.")
+                reports.append(report)
+    return reports
+
+
+@asynccontextmanager
+async def _remote(url: str) -> AsyncIterator[str]:
+    yield url.rstrip("/")
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    if args.url is None:
+        configure_offline_env(
+            args.latency,
+            args.tokens_per_second,
+            postgres_uri=args.postgres_uri,
+            fake_llm=args.cassette is None,
+        )
+        if args.cassette:
+            configure_cassette_replay(args.cassette, args.cassette_timing)
+
+    reports = asyncio.run(run_load(args))
+    for report in reports:
+        print(format_load_report(report, args.p95_slo))
+
+    if args.output:
+        args.output.write_text(
+            json.dumps([r.model_dump() for r in reports], indent=2), encoding="utf-8"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
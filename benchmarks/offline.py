@@ -0,0 +1,153 @@
+"""
+Helpers to run the agent fully offline: fake LLM/embedding providers, an
+in-memory vectorstore and checkpointer, and an in-process uvicorn server.
+
+`configure_offline_env` must run before anything under `src` is imported,
+since the configuration is read at import time.
+"""
+
+import asyncio
+import os
+import socket
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+# Reads no configuration, so it is safe to import before `configure_offline_env`
+from src.common.graph_node import graph_node
+
+FAKE_LLM_ENV = {
+    "LLM_PROVIDER": "fake",
+    "TOOL_EVALUATOR_LLM_PROVIDER": "fake",
+    "SUMMARIZE_LLM_PROVIDER": "fake",
+}
+OFFLINE_ENV = {
+    "TEXT_EMBEDDING_PROVIDER": "fake",
+    "VECTOR_STORE": "memory",
+    "POSTGRES_URI": "",  # MemorySaver checkpointer
+}
+
+
+def configure_offline_env(
+    latency: float = 0.0,
+    tokens_per_second: float = 0.0,
+    use_rag: bool = False,
+    postgres_uri: str | None = None,
+    fake_llm: bool = True,
+) -> None:
+    os.environ.update(OFFLINE_ENV)
+    if fake_llm:
+        os.environ.update(FAKE_LLM_ENV)
+    os.environ["FAKE_LLM_LATENCY"] = str(latency)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    os.environ["FAKE_LLM_USE_RAG"] = str(use_rag).lower()
+    os.environ["RAG_AVAILABLE"] = str(use_rag).lower()
+    if postgres_uri:
+        os.environ["POSTGRES_URI"] = postgres_uri
+
+
+def configure_cassette_replay(path: os.PathLike | str, emulate_timing: bool) -> None:
+    """
+    Serve every LLM call from a recorded cassette (see `src.cassette`).
+
+    The cassette is keyed by provider and model name, so the LLM configuration
+    must match the recording's.
+    """
+    os.environ["LLM_CASSETTE_MODE"] = "replay"
+    os.environ["LLM_CASSETTE_PATH"] = str(path)
+    os.environ["LLM_CASSETTE_EMULATE_TIMING"] = str(emulate_timing).lower()
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Collects the wall time of every graph node run, keyed by node name."""
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self._starts: dict[UUID, tuple[str, float]] = {}
+
+    def take(self) -> dict[str, list[float]]:
+        """The durations collected so far, starting afresh."""
+        durations, self.durations = self.durations, defaultdict(list)
+        return durations
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        node = graph_node(metadata, kwargs)
+        if node is not None:
+            self._starts[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._finish(run_id)
+
+    def _finish(self, run_id: UUID) -> None:
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            node, start = started
+            self.durations[node].append(time.perf_counter() - start)
+
+
+node_timer_var: ContextVar[NodeTimer | None] = ContextVar("node_timer", default=None)
+# Attach the timer to every run configured while the variable is set
+register_configure_hook(node_timer_var, inheritable=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def serve(app: Any, port: int) -> tuple[Any, asyncio.Task]:
+    """Start `app` on 127.0.0.1:`port` in the running loop."""
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # Surface startup errors
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+@asynccontextmanager
+async def serve_timed(app: Any, port: int) -> AsyncIterator[NodeTimer]:
+    """
+    Serve `app` like `serve` within the block, timing the graph nodes run by
+    its requests on the yielded `NodeTimer`.
+    """
+    timer = NodeTimer()
+    # Set before the server starts: its request handlers copy its context
+    token = node_timer_var.set(timer)
+    try:
+        server, task = await serve(app, port)
+        try:
+            yield timer
+        finally:
+            server.should_exit = True
+            await task
+    finally:
+        node_timer_var.reset(token)
@@ -0,0 +1,244 @@
+import json
+import statistics
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+
+class Sample(BaseModel):
+    latency: float = Field(description="Seconds from request to complete answer.")
+    ttft: float | None = Field(
+        default=None, description="Seconds from request to the first answer delta."
+    )
+    ok: bool = True
+    error: str | None = Field(
+        default=None, description="Kind of failure, e.g. `timeout` or `http 500`."
+    )
+
+
+class Percentiles(BaseModel):
+    p50: float
+    p95: float
+    p99: float
+
+
+class NodeStats(BaseModel):
+    count: int
+    mean_ms: float
+    p95_ms: float
+
+
+class BenchmarkReport(BaseModel):
+    scenario: str
+    requests: int
+    errors: int
+    concurrency: int
+    duration_s: float
+    throughput_rps: float
+    latency_ms: Percentiles | None
+    ttft_ms: Percentiles | None
+    nodes: dict[str, NodeStats]
+
+
+def percentiles(values: list[float]) -> Percentiles | None:
+    """p50/p95/p99 of `values` (seconds), in milliseconds."""
+    if not values:
+        return None
+    if len(values) == 1:
+        ms = values[0] * 1000
+        return Percentiles(p50=ms, p95=ms, p99=ms)
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return Percentiles(p50=cuts[49] * 1000, p95=cuts[94] * 1000, p99=cuts[98] * 1000)
+
+
+def build_report(
+    scenario: str,
+    samples: list[Sample],
+    concurrency: int,
+    duration: float,
+    node_durations: dict[str, list[float]],
+) -> BenchmarkReport:
+    ok = [s for s in samples if s.ok]
+    nodes = {}
+    for node, values in sorted(node_durations.items()):
+        p = percentiles(values)
+        nodes[node] = NodeStats(
+            count=len(values),
+            mean_ms=statistics.fmean(values) * 1000,
+            p95_ms=p.p95 if p else 0,
+        )
+
+    return BenchmarkReport(
+        scenario=scenario,
+        requests=len(samples),
+        errors=len(samples) - len(ok),
+        concurrency=concurrency,
+        duration_s=duration,
+        throughput_rps=len(ok) / duration if duration > 0 else 0,
+        latency_ms=percentiles([s.latency for s in ok]),
+        ttft_ms=percentiles([s.ttft for s in ok if s.ttft is not None]),
+        nodes=nodes,
+    )
+
+
+def format_report(report: BenchmarkReport) -> str:
+    lines = [
+        f"== {report.scenario}: {report.requests} requests, "
+        f"concurrency {report.concurrency}, {report.errors} errors",
+        f"   throughput {report.throughput_rps:.1f} req/s in {report.duration_s:.2f}s",
+    ]
+    for label, p in (("latency", report.latency_ms), ("ttft", report.ttft_ms)):
+        if p is not None:
+            lines.append(
+                f"   {label:<8} p50 {p.p50:8.1f}ms  p95 {p.p95:8.1f}ms  p99 {p.p99:8.1f}ms"
+            )
+    for node, stats in report.nodes.items():
+        lines.append(
+            f"   {node:<28} x{stats.count:<5} mean {stats.mean_ms:7.1f}ms  "
+            f"p95 {stats.p95_ms:7.1f}ms"
+        )
+    return "\n".join(lines)
+
+
+def save_baseline(report: BenchmarkReport, baseline_dir: Path) -> Path:
+    baseline_dir.mkdir(parents=True, exist_ok=True)
+    path = baseline_dir / f"{report.scenario}.json"
+    path.write_text(report.model_dump_json(indent=2), encoding="utf-8")
+    return path
+
+
+def compare_to_baseline(
+    report: BenchmarkReport, baseline_dir: Path, tolerance: float
+) -> list[str]:
+    """
+    Return the regressions of `report` against its saved baseline, if any.
+
+    Latency percentiles may grow and throughput may drop by at most
+    `tolerance` (a fraction), and the error count may not grow.
+    """
+    path = baseline_dir / f"{report.scenario}.json"
+    if not path.is_file():
+        return []
+    baseline = BenchmarkReport.model_validate(json.loads(path.read_text("utf-8")))
+
+    regressions: list[str] = []
+    if report.errors > baseline.errors:
+        regressions.append(f"errors {baseline.errors} -> {report.errors}")
+    if report.throughput_rps < baseline.throughput_rps * (1 - tolerance):
+        regressions.append(
+            f"throughput {baseline.throughput_rps:.1f} -> "
+            f"{report.throughput_rps:.1f} req/s"
+        )
+    for label in ("latency_ms", "ttft_ms"):
+        current: Any = getattr(report, label)
+        previous: Any = getattr(baseline, label)
+        if current is None or previous is None:
+            continue
+        for q in ("p50", "p95", "p99"):
+            before, after = getattr(previous, q), getattr(current, q)
+            if after > before * (1 + tolerance):
+                regressions.append(f"{label} {q} {before:.1f} -> {after:.1f}")
+    return regressions
+
+
+class ResourceUsage(BaseModel):
+    cpu_percent: float | None = Field(
+        default=None, description="Server CPU time over wall time (100 = one core)."
+    )
+    rss_peak_mb: float | None = Field(
+        default=None, description="Peak server resident memory."
+    )
+
+
+class LoadLevel(BaseModel):
+    concurrency: int
+    requests: int
+    errors: int
+    error_rate: float
+    errors_by_kind: dict[str, int]
+    duration_s: float
+    throughput_rps: float
+    latency_ms: Percentiles | None
+    ttft_ms: Percentiles | None
+    resources: ResourceUsage
+
+
+class LoadReport(BaseModel):
+    scenario: str
+    levels: list[LoadLevel]
+
+
+def build_load_level(
+    concurrency: int,
+    samples: list[Sample],
+    duration: float,
+    resources: ResourceUsage,
+) -> LoadLevel:
+    ok = [s for s in samples if s.ok]
+    errors_by_kind: dict[str, int] = {}
+    for sample in samples:
+        if not sample.ok:
+            kind = sample.error or "error"
+            errors_by_kind[kind] = errors_by_kind.get(kind, 0) + 1
+
+    errors = len(samples) - len(ok)
+    return LoadLevel(
+        concurrency=concurrency,
+        requests=len(samples),
+        errors=errors,
+        error_rate=errors / len(samples) if samples else 0,
+        errors_by_kind=errors_by_kind,
+        duration_s=duration,
+        throughput_rps=len(ok) / duration if duration > 0 else 0,
+        latency_ms=percentiles([s.latency for s in ok]),
+        ttft_ms=percentiles([s.ttft for s in ok if s.ttft is not None]),
+        resources=resources,
+    )
+
+
+def saturation_point(report: LoadReport, p95_slo_ms: float) -> int | None:
+    """
+    Highest concurrency before p95 time-to-first-token (or latency, for
+    scenarios that do not stream) first exceeds `p95_slo_ms`; `None` when even
+    the lowest level does.
+    """
+    within = None
+    for level in sorted(report.levels, key=lambda level: level.concurrency):
+        p = level.ttft_ms or level.latency_ms
+        if p is None or p.p95 > p95_slo_ms:
+            break
+        within = level.concurrency
+    return within
+
+
+def format_load_report(report: LoadReport, p95_slo_ms: float | None = None) -> str:
+    lines = [
+        f"== {report.scenario}",
+        "   users  req/s  errors   p50 lat   p95 lat  p50 ttft  p95 ttft   cpu%   rss MB",
+    ]
+    for level in report.levels:
+        lines.append(
+            f"   {level.concurrency:>5} {level.throughput_rps:>6.1f} "
+            f"{level.error_rate:>6.1%} {_ms(level.latency_ms, 'p50')} "
+            f"{_ms(level.latency_ms, 'p95')} {_ms(level.ttft_ms, 'p50')} "
+            f"{_ms(level.ttft_ms, 'p95')} {_number(level.resources.cpu_percent, 6)} "
+            f"{_number(level.resources.rss_peak_mb, 8)}"
+        )
+        for kind, count in sorted(level.errors_by_kind.items()):
+            lines.append(f"         {count} x {kind}")
+    if p95_slo_ms is not None:
+        saturation = saturation_point(report, p95_slo_ms)
+        lines.append(
+            f"   p95 within {p95_slo_ms:.0f}ms up to "
+            + (f"{saturation} concurrent conversations" if saturation else "no level")
+        )
+    return "\n".join(lines)
+
+
+def _ms(p: Percentiles | None, q: str) -> str:
+    return _number(getattr(p, q) if p is not None else None, 9)
+
+
+def _number(value: float | None, width: int) -> str:
+    return f"{value:>{width}.1f}" if value is not None else "-".rjust(width)
@@ -0,0 +1,318 @@
+"""
+Offline benchmark suite.
+
+Runs `start()`, the REST route and the websocket route against deterministic
+fake providers (no network, Postgres or Milvus) under configurable concurrency,
+reports latency, throughput, time-to-first-token and per-node time, and fails
+when results regress against the saved baselines.
+
+    python -m benchmarks.run --scenario start rest websocket --concurrency 16
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --cassette cassettes/llm.jsonl --cassette-timing
+
+With `--cassette`, the conversations recorded with `LLM_CASSETTE_MODE=record`
+are replayed instead of synthetic messages and every LLM call is served from
+the cassette. Calls are keyed by provider, model name and prompt, so run it
+with the recording's LLM configuration (and `--rag` if RAG was available).
+Each replay runs on a fresh thread, so the prompts match the recording; turns
+whose prompts included retrieved documents only match when the in-memory
+vectorstore returns the same documents.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from benchmarks.offline import (
+    configure_cassette_replay,
+    configure_offline_env,
+    free_port,
+    serve_timed,
+)
+from benchmarks.report import (
+    BenchmarkReport,
+    Sample,
+    build_report,
+    compare_to_baseline,
+    format_report,
+    save_baseline,
+)
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("start", "rest", "websocket")
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Fake LLM seconds to first token."
+    )
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=400, help="Fake LLM streaming rate."
+    )
+    parser.add_argument("--rag", action="store_true", help="Exercise the RAG loop.")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--cassette", type=Path, help="Replay a recorded cassette.")
+    parser.add_argument(
+        "--cassette-timing",
+        action="store_true",
+        help="Reproduce the recorded provider timings when replaying.",
+    )
+    parser.add_argument("--baseline-dir", type=Path, default=BASELINE_DIR)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative regression against the baseline.",
+    )
+    parser.add_argument("--output", type=Path, help="Write the reports as JSON.")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+class Turn(NamedTuple):
+    data: Any
+    system: bool = False  # Sent as system instructions (`context_incrementer`)
+    think_time: float | None = None  # Seconds the user waits before sending it
+
+
+Send = Callable[[str, Turn], Awaitable[Sample]]
+
+
+def synthetic_conversations(requests: int, concurrency: int) -> list[list[Turn]]:
+    """One growing conversation per worker, `requests` turns in total."""
+    return [
+        [Turn(f"Benchmark message {i}") for i in range(w, requests, concurrency)]
+        for w in range(concurrency)
+    ]
+
+
+def recorded_conversations(path: Path, requests: int) -> list[list[Turn]]:
+    """The cassette's conversations, repeated until they add up to `requests` turns."""
+    from langchain_core.messages import SystemMessage, messages_from_dict
+
+    from src.cassette.main import Cassette
+
+    conversations = []
+    for turns in Cassette(path=path).turns().values():
+        conversation = []
+        for turn in turns:
+            for message in messages_from_dict(turn.input):
+                data = [p["data"] for p in message.content if isinstance(p, dict)]
+                conversation.append(
+                    Turn(data[0], system=isinstance(message, SystemMessage))
+                )
+        conversations.append(conversation)
+    if not any(conversations):
+        raise SystemExit(f"No recorded turns in {path}.")
+
+    repeated: list[list[Turn]] = []
+    while sum(map(len, repeated)) < requests:
+        repeated.extend(conversations)
+    return repeated
+
+
+async def run_workers(
+    conversations: list[list[Turn]], concurrency: int, send: Send
+) -> tuple[list[Sample], float]:
+    """
+    Run the conversations over `concurrency` workers. Each conversation gets
+    its own thread and its turns run in order, so they never race each other.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    samples: list[Sample] = []
+
+    async def worker(w: int) -> None:
+        for c in range(w, len(conversations), concurrency):
+            thread_id = f"bench-{run_id}-{c}"
+            for turn in conversations[c]:
+                try:
+                    sample = await send(thread_id, turn)
+                except Exception as e:
+                    logger.warning(f"Request on {thread_id} failed: {e}")
+                    sample = Sample(latency=0, ok=False)
+                # Only answered turns are measured
+                if not turn.system:
+                    samples.append(sample)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+async def bench_start(args: argparse.Namespace) -> list[Sample]:
+    from langchain_core.messages import SystemMessage
+    from langchain_core.runnables import RunnableConfig
+
+    from src.agent import start
+    from src.agent.input_message import to_input_message
+
+    async def send(thread_id: str, turn: Turn) -> Sample:
+        config: RunnableConfig = {"configurable": {"thread_id": thread_id}}
+        if turn.system:
+            message = to_input_message(turn.data, SystemMessage)
+            function = "context_incrementer"
+        else:
+            message, function = to_input_message(turn.data), "response_generator"
+        started = time.perf_counter()
+        await asyncio.wait_for(
+            start([message], config, function), timeout=args.timeout
+        )
+        return Sample(latency=time.perf_counter() - started)
+
+    return await _run(args, send)
+
+
+async def bench_rest(args: argparse.Namespace, base_url: str) -> list[Sample]:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+
+        async def send(thread_id: str, turn: Turn) -> Sample:
+            started = time.perf_counter()
+            response = await client.post(
+                "/agent/messages/system" if turn.system else "/agent/messages/user",
+                json={"data": turn.data, "thread_id": thread_id},
+            )
+            response.raise_for_status()
+            return Sample(latency=time.perf_counter() - started)
+
+        return await _run(args, send)
+
+
+async def bench_websocket(args: argparse.Namespace, base_url: str) -> list[Sample]:
+    import httpx
+
+    ws_url = base_url.replace("http://", "ws://", 1)
+    client = httpx.AsyncClient(base_url=base_url, timeout=args.timeout)
+
+    async def send(thread_id: str, turn: Turn) -> Sample:
+        if turn.system:
+            response = await client.post(
+                "/agent/messages/system",
+                json={"data": turn.data, "thread_id": thread_id},
+            )
+            response.raise_for_status()
+            return Sample(latency=0)
+        return await websocket_turn(ws_url, thread_id, turn.data, args.timeout)
+
+    async with client:
+        return await _run(args, send)
+
+
+async def websocket_turn(
+    ws_url: str, thread_id: str, data: Any, timeout: float
+) -> Sample:
+    """Send one user message over a new websocket and wait for the answer."""
+    import websockets
+
+    async with websockets.connect(f"{ws_url}/agent/messages/user/websocket") as ws:
+        started = time.perf_counter()
+        ttft = None
+        await ws.send(
+            json.dumps(
+                {"data": data, "thread_id": thread_id, "chat_interface": "websocket"}
+            )
+        )
+        async with asyncio.timeout(timeout):
+            while True:
+                frame = json.loads(await ws.recv())
+                payload = frame.get("data") or {}
+                if ttft is None and (payload.get("response") or payload.get("text")):
+                    ttft = time.perf_counter() - started
+                # The evaluator sends its own final frame before the answer's
+                if frame.get("type") == "final" and "response" in payload:
+                    break
+        return Sample(latency=time.perf_counter() - started, ttft=ttft)
+
+
+async def _run(args: argparse.Namespace, send: Send) -> list[Sample]:
+    if args.cassette:
+        conversations = recorded_conversations(args.cassette, args.requests)
+    else:
+        conversations = synthetic_conversations(args.requests, args.concurrency)
+    samples, duration = await run_workers(conversations, args.concurrency, send)
+    args._duration = duration
+    return samples
+
+
+async def run_benchmarks(args: argparse.Namespace) -> list[BenchmarkReport]:
+    from src.agent import workflow
+    from src.main import app
+
+    await workflow.ensure_ready()
+    if args.rag:
+        from langchain_core.documents import Document
+
+        await workflow.vector_manager.add_documents(
+            [Document(page_content=f"Benchmark document {i}.") for i in range(100)]
+        )
+
+    port = free_port()
+    reports = []
+    async with serve_timed(app, port) as timer:
+        for scenario in args.scenario:
+            timer.take()
+            match scenario:
+                case "start":
+                    samples = await bench_start(args)
+                case "rest":
+                    samples = await bench_rest(args, f"http://127.0.0.1:{port}")
+                case "websocket":
+                    samples = await bench_websocket(args, f"http://127.0.0.1:{port}")
+
+            reports.append(
+                build_report(
+                    scenario, samples, args.concurrency, args._duration, timer.take()
+                )
+            )
+    return reports
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    configure_offline_env(
+        args.latency,
+        args.tokens_per_second,
+        use_rag=args.rag,
+        fake_llm=args.cassette is None,
+    )
+    if args.cassette:
+        configure_cassette_replay(args.cassette, args.cassette_timing)
+
+    reports = asyncio.run(run_benchmarks(args))
+
+    failed = False
+    for report in reports:
+        print(format_report(report))
+        if args.save_baseline:
+            print(f"   baseline saved to {save_baseline(report, args.baseline_dir)}")
+            continue
+        regressions = compare_to_baseline(report, args.baseline_dir, args.tolerance)
+        for regression in regressions:
+            print(f"   REGRESSION: {regression}")
+        failed = failed or bool(regressions)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps([r.model_dump() for r in reports], indent=2), encoding="utf-8"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,12 @@
 #!/bin/bash
 
+# Gunicorn workers are separate processes: share Prometheus metrics through files
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/lia-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 # Start the backend (FastAPI with Gunicorn) in the background
 gunicorn src.main:app \
+    -c gunicorn.conf.py \
     -k uvicorn.workers.UvicornWorker \
     --bind 0.0.0.0:8000 \
     --workers $(python -c "import multiprocessing; print(multiprocessing.cpu_count() * 2 + 1)") &
@@ -0,0 +1,6 @@
+from prometheus_client import multiprocess
+
+
+# Drop the metric files of dead workers from the shared multiprocess directory
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
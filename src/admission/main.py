@@ -0,0 +1,353 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from src.admission.model.priority import Priority
+from src.config import env
+from src.metrics.main import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_LIMIT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_RATE_LIMITED,
+    ADMISSION_WAIT,
+)
+from src.token_usage import TokenUsage
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+# Error class names of rate limits for providers whose errors carry no status
+_RATE_LIMIT_ERRORS = ("RateLimit", "ResourceExhausted", "TooManyRequests")
+
+
+# Priority class of the calls made in the current context
+priority_var: ContextVar[Priority] = ContextVar(
+    "admission_priority", default=Priority.interactive
+)
+
+
+@contextmanager
+def lowered_priority(priority: Priority) -> Iterator[None]:
+    """Make the calls within the block at most as urgent as `priority`."""
+    current = priority_var.get()
+    token = priority_var.set(priority if priority.rank > current.rank else current)
+    try:
+        yield
+    finally:
+        priority_var.reset(token)
+
+
+class Overloaded(Exception):
+    """The provider could not take the call within the queue-time budget."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Allows `rate` units per second on average, in bursts of up to `capacity`.
+
+    The balance may go negative when a call turns out larger than admitted;
+    later calls then wait for it to refill.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._updated) * self.rate, self.capacity
+        )
+        self._updated = now
+
+    async def take(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return
+            await asyncio.sleep((amount - self._tokens) / self.rate)
+
+    def debit(self, amount: float) -> None:
+        self._refill()
+        self._tokens -= amount
+
+
+@dataclass(eq=False)
+class _Waiter:
+    priority: Priority
+    seq: int
+    queued: float
+    admitted: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+
+class AdmissionController:
+    """
+    Admits the model or embedding calls of one provider model.
+
+    At most `limit` calls run at once and the others queue. The limit adapts
+    AIMD-style: it grows by about one per round of successful calls and is cut
+    by `backoff` when the provider rate-limits (429) or a call is slower than
+    `latency_target`. Optional token buckets cap requests and tokens per
+    minute; prompts are charged up front from an estimate, then corrected by
+    the usage the provider reports. A call that cannot start within
+    `queue_timeout` seconds (`bulk_queue_timeout` for bulk calls) raises
+    `Overloaded`.
+
+    Queued calls start by priority class (see `Priority`), each class using
+    at most its share of the limit. Calls queued for over `starvation_age`
+    seconds go first whatever their class.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int | None = None,
+        min_concurrency: int | None = None,
+        queue_timeout: float | None = None,
+        bulk_queue_timeout: float | None = None,
+        latency_target: float | None = None,
+        backoff: float | None = None,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        shares: dict[Priority, float] | None = None,
+        starvation_age: float | None = None,
+    ):
+        self.name = name
+        self.enabled = env.ADMISSION_ENABLED
+        self.max_concurrency = max_concurrency or env.ADMISSION_MAX_CONCURRENCY
+        self.min_concurrency = min_concurrency or env.ADMISSION_MIN_CONCURRENCY
+        self.queue_timeout = (
+            env.ADMISSION_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        )
+        self.bulk_queue_timeout = (
+            env.ADMISSION_BULK_QUEUE_TIMEOUT
+            if bulk_queue_timeout is None
+            else bulk_queue_timeout
+        )
+        self.latency_target = (
+            env.ADMISSION_LATENCY_TARGET if latency_target is None else latency_target
+        )
+        self.backoff = backoff or env.ADMISSION_BACKOFF
+        self.shares = shares or {
+            Priority.interactive: env.ADMISSION_SHARE_INTERACTIVE,
+            Priority.background: env.ADMISSION_SHARE_BACKGROUND,
+            Priority.bulk: env.ADMISSION_SHARE_BULK,
+        }
+        self.starvation_age = (
+            env.ADMISSION_STARVATION_AGE if starvation_age is None else starvation_age
+        )
+        self.limit = float(self.max_concurrency)
+        self.requests = (
+            TokenBucket(requests_per_minute / 60, max(requests_per_minute / 60, 1))
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+            if tokens_per_minute
+            else None
+        )
+        self._in_flight: Counter[Priority] = Counter()
+        self._waiters: list[_Waiter] = []
+        self._seq = 0
+        self._last_decrease = 0.0
+        ADMISSION_LIMIT.labels(name).set(self.limit)
+
+    @property
+    def concurrency(self) -> int:
+        return max(int(self.limit), self.min_concurrency)
+
+    def share(self, priority: Priority) -> int:
+        """Calls of the class that may run at once."""
+        return max(math.floor(self.shares.get(priority, 1) * self.concurrency), 1)
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        tokens: int = 0,
+        usage: TokenUsage | None = None,
+        priority: Priority | None = None,
+    ) -> AsyncIterator[None]:
+        """
+        Run the block as an admitted call with a prompt of about `tokens`, in
+        the `priority` class (by default the one of the calling context, see
+        `lowered_priority`).
+
+        Raises `Overloaded` when it cannot be admitted in time.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        priority = priority or priority_var.get()
+        await self._admit(tokens, priority)
+        used_before = usage.total_tokens if usage is not None else 0
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if _is_rate_limited(e):
+                ADMISSION_RATE_LIMITED.labels(self.name).inc()
+                self._decrease("rate limited")
+            raise
+        else:
+            latency = time.perf_counter() - started
+            if self.latency_target and latency > self.latency_target:
+                self._decrease(f"{latency:.1f}s call")
+            else:
+                self._increase()
+        finally:
+            if self.tokens is not None and usage is not None:
+                self.tokens.debit(usage.total_tokens - used_before - tokens)
+            self._release(priority)
+
+    async def _admit(self, tokens: int, priority: Priority) -> None:
+        timeout = (
+            self.bulk_queue_timeout if priority == Priority.bulk else self.queue_timeout
+        )
+        started = time.perf_counter()
+        slot = False
+        try:
+            async with asyncio.timeout(timeout or None):
+                await self._acquire(priority)
+                slot = True
+                if self.requests is not None:
+                    await self.requests.take(1)
+                if self.tokens is not None:
+                    await self.tokens.take(tokens)
+        except TimeoutError as e:
+            if slot:
+                self._release(priority)
+            ADMISSION_WAIT.labels(self.name, priority.value, "rejected").observe(
+                time.perf_counter() - started
+            )
+            raise Overloaded(
+                f"{self.name} is overloaded: no capacity within {timeout:g}s.",
+                retry_after=timeout,
+            ) from e
+        except BaseException:
+            if slot:
+                self._release(priority)
+            raise
+        ADMISSION_WAIT.labels(self.name, priority.value, "admitted").observe(
+            time.perf_counter() - started
+        )
+
+    async def _acquire(self, priority: Priority) -> None:
+        self._seq += 1
+        waiter = _Waiter(priority, self._seq, time.monotonic())
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.labels(self.name, priority.value).inc()
+        try:
+            self._dispatch()
+            await waiter.admitted
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif not waiter.admitted.cancelled():
+                # Admitted just as the wait was given up
+                self._release(priority)
+            raise
+        finally:
+            ADMISSION_QUEUE_DEPTH.labels(self.name, priority.value).dec()
+
+    def _release(self, priority: Priority) -> None:
+        self._in_flight[priority] -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name, priority.value).dec()
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Start queued calls while the limit and their class share allow."""
+        while self._waiters and self._in_flight.total() < self.concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._waiters.remove(waiter)
+            if waiter.admitted.done():
+                continue  # Cancelled, leaving the queue
+            self._in_flight[waiter.priority] += 1
+            ADMISSION_IN_FLIGHT.labels(self.name, waiter.priority.value).inc()
+            waiter.admitted.set_result(None)
+
+    def _next_waiter(self) -> _Waiter | None:
+        now = time.monotonic()
+        eligible = [
+            w
+            for w in self._waiters
+            if self._in_flight[w.priority] < self.share(w.priority)
+        ]
+        if not eligible:
+            return None
+        # Starved calls first, then by class, then in arrival order
+        return min(
+            eligible,
+            key=lambda w: (
+                now - w.queued < self.starvation_age,
+                w.priority.rank,
+                w.seq,
+            ),
+        )
+
+    def _increase(self) -> None:
+        # About +1 once every call of the current limit succeeded
+        self.limit = min(self.limit + 1 / self.limit, float(self.max_concurrency))
+        ADMISSION_LIMIT.labels(self.name).set(self.limit)
+        self._dispatch()
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        # The calls in flight see the same congestion: cut once for all of them
+        if now - self._last_decrease < 1:
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit * self.backoff, float(self.min_concurrency))
+        ADMISSION_LIMIT.labels(self.name).set(self.limit)
+        logger.warning(f"{self.name}: {reason}; concurrency limit {self.concurrency}.")
+
+
+def _is_rate_limited(e: BaseException) -> bool:
+    response = getattr(e, "response", None)
+    status = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+    return status == 429 or any(n in type(e).__name__ for n in _RATE_LIMIT_ERRORS)
+
+
+_controllers: dict[str, AdmissionController] = {}
+
+
+def admission_controller(
+    provider: str,
+    model_name: str,
+    requests_per_minute: float | None = None,
+    tokens_per_minute: float | None = None,
+) -> AdmissionController:
+    """
+    The controller of a provider model, shared by every client of it (the
+    first one's rate limits apply).
+    """
+    name = f"{provider}/{model_name}"
+    if name not in _controllers:
+        _controllers[name] = AdmissionController(
+            name,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+    return _controllers[name]
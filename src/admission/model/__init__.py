@@ -0,0 +1 @@
+from .priority import *
@@ -0,0 +1,13 @@
+from enum import Enum
+
+
+class Priority(Enum):
+    """Priority class of model and embedding calls, most urgent first."""
+
+    interactive = "interactive"  # Turns a user is waiting on.
+    background = "background"  # Follow-up work of a turn, like summaries.
+    bulk = "bulk"  # Ingestion and batch work.
+
+    @property
+    def rank(self) -> int:
+        return list(Priority).index(self)
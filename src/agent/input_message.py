@@ -0,0 +1,50 @@
+from typing import Any
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from src.agent.model.input import InputContent
+from src.common.rewrite_messages import rewrite_messages
+
+# Keys only present on content parts that were the full `Input.model_dump()`.
+_LEGACY_INPUT_KEYS = {"data", "chat_interface", "max_retries"}
+
+
+def to_input_message(
+    data: str | dict[str, Any],
+    message_class: type[BaseMessage] = HumanMessage,
+) -> BaseMessage:
+    """
+    Wrap the user payload in a message using the compact `InputContent` encoding.
+    """
+    return message_class(content=[InputContent(data=data).model_dump()])
+
+
+def compact_legacy_inputs(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """
+    Return the `add_messages` update that re-encodes legacy input messages.
+
+    Older checkpoints stored every input with the whole serialized `Input`, so
+    each turn re-sent its defaults and descriptions to the LLM. An empty list
+    means the history is already compact.
+    """
+    replacements: dict[int, BaseMessage | None] = {}
+    for idx, m in enumerate(messages):
+        if not isinstance(m.content, list):
+            continue
+        if not any(_is_legacy_input(part) for part in m.content):
+            continue
+
+        compacted = m.model_copy(deep=True)
+        compacted.content = [
+            InputContent(data=part["data"]).model_dump()
+            if _is_legacy_input(part)
+            else part
+            for part in m.content
+        ]
+        replacements[idx] = compacted
+
+    return rewrite_messages(messages, replacements)
+
+
+def _is_legacy_input(part: Any) -> bool:
+    return isinstance(part, dict) and _LEGACY_INPUT_KEYS <= part.keys()
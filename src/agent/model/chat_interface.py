@@ -5,3 +5,8 @@ class ChatInterface(Enum):
     # whatsapp = "whatsapp"  # Official WhatsApp Cloud API
     api = "api"  # Just send the response back.
     websocket = "websocket"  # Stream deltas via WebSocket
+    sse = "sse"  # Stream deltas as Server-Sent Events
+
+    @property
+    def streams(self) -> bool:
+        return self in (ChatInterface.websocket, ChatInterface.sse)
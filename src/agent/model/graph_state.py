@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field
 from src.agent.model.chat_interface import ChatInterface
 from src.agent.model.steps import Steps
 from src.agent.model.tool_payloads import ToolPayloads
+from src.token_usage.model.token_usage import TokenUsage
 
 
 class GraphState(BaseModel):
@@ -48,8 +49,36 @@ class GraphState(BaseModel):
 If False, this will lead to a summarized history like
 [system instruction messages, summary, keep messages].""",
     )
+    summarize_token_threshold: int | None = Field(
+        default=None,
+        description="""When set, summarize once the history exceeds this many tokens
+        (system messages excluded unless they are summarized too), instead of
+        counting messages with the window and keep settings.""",
+    )
+    summarize_token_keep: int = Field(
+        default=1000,
+        description="""With `summarize_token_threshold`, tokens of the most recent
+        messages always kept verbatim (at least the last message is kept).""",
+    )
 
     top_k: int = Field(
         # default=5,
         description="The number of top k results to return.",
     )
+
+    token_usage: TokenUsage = Field(
+        default_factory=TokenUsage,
+        description="Tokens used by the LLM calls of every run of the thread.",
+    )
+    run_token_usage: TokenUsage = Field(
+        default_factory=TokenUsage,
+        description="Tokens used by the LLM calls of the current run.",
+    )
+    token_budget: int | None = Field(
+        default=None,
+        description="Tokens the current run may use before answering with what it has.",
+    )
+
+    def record_token_usage(self, usage: TokenUsage) -> None:
+        self.token_usage.add(usage)
+        self.run_token_usage.add(usage)
@@ -1,10 +1,17 @@
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
 from src.agent.model.chat_interface import ChatInterface
 
 
+class InputContent(BaseModel):
+    """Compact content part stored on user and system input messages."""
+
+    type: Literal["input"] = "input"
+    data: str | dict[str, Any] = Field(description="Input data from the user.")
+
+
 class Input(BaseModel):
     data: str | dict[str, Any] = Field(description="Input data from the user.")
     chat_interface: ChatInterface = Field(
@@ -44,9 +51,44 @@ class Input(BaseModel):
 If False, this will lead to a summarized history like
 [system instruction messages, summary, keep messages].""",
     )
+    summarize_token_threshold: int | None = Field(
+        default=None,
+        description="""When set, summarize once the history exceeds this many tokens
+        (system messages excluded unless they are summarized too), instead of
+        counting messages with the window and keep settings.""",
+    )
+    summarize_token_keep: int = Field(
+        default=1000,
+        description="""With `summarize_token_threshold`, tokens of the most recent
+        messages always kept verbatim (at least the last message is kept).""",
+    )
+
+    token_budget: int | None = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Tokens this request may use. Once used up, the agent answers with the "
+            "information gathered so far instead of calling more tools."
+        ),
+    )
 
 
 class InputRequest(Input):
     thread_id: str = Field(
         description="The ID of the thread to which this message belongs.",
     )
+    deadline: float | None = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Seconds the agent may take to answer (REQUEST_DEADLINE by default). "
+            "At the deadline, the partial or a fallback answer is returned."
+        ),
+    )
+    profile: bool = Field(
+        default=False,
+        description=(
+            "Profile this run (CPU samples and allocations). "
+            "Ignored unless PROFILING_ENABLED is set."
+        ),
+    )
@@ -14,6 +14,7 @@ class Steps(Enum):
     generate_response = (
         "generate_response"  # Generates response for the given chat interface.
     )
+    prune_tool_data = "prune_tool_data"  # Stubs or drops stale tool results.
     summarize = "summarize"  # Generates summary for the given messages.
 
     # Actions after response generation
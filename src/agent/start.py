@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from typing import Literal
 
 from langchain_core.messages import BaseMessage
@@ -6,6 +8,20 @@ from langchain_core.runnables import RunnableConfig
 from src.agent.model.chat_interface import ChatInterface
 from src.agent.model.graph_state import GraphState
 from src.agent.workflow import Workflow
+from src.cassette.main import cassette
+from src.coalesce import message_coalescer
+from src.config import env
+from src.deadline import remaining_time, with_deadline
+from src.frame_sink import frame_sink
+from src.generate_response.model.response import LLMWebSocketResponse, WebSocketData
+from src.metrics.main import LLM_CALLS_SAVED, RUNS_CANCELLED
+from src.metrics.metrics_callback_handler import run_metrics
+from src.profiling.main import ProfiledRun, run_profiler
+from src.thread_lock import thread_locks
+from src.token_usage import TokenUsage
+from src.tracing.main import tracer
+
+logger = logging.getLogger(__name__)
 
 workflow = Workflow()
 
@@ -23,10 +39,31 @@ async def start(
     summarize_message_window: int = 4,
     summarize_message_keep: int = 6,
     summarize_system_messages: bool = False,
+    summarize_token_threshold: int | None = None,
+    summarize_token_keep: int = 1000,
+    token_budget: int | None = None,
+    deadline: float | None = None,
+    profile: bool = False,
 ):
     """
     Start the agent with the given input.
+
+    The run must answer within `deadline` seconds (`REQUEST_DEADLINE` by
+    default), carried to the nodes in the config.
+
+    Runs of a thread never overlap: the run waits for the thread's run in
+    progress, or raises `ThreadBusy` (see `THREAD_LOCK_POLICY`).
+
+    With `COALESCE_WINDOW`, user messages sent to a thread in a burst are
+    answered together by one run, with the parameters of the latest message;
+    every message of the burst returns its result.
+
+    With `profile` (and `PROFILING_ENABLED`), the run is profiled and the
+    profile stored under its thread and resulting checkpoint id.
     """
+    config = with_deadline(
+        config, deadline if deadline is not None else env.REQUEST_DEADLINE
+    )
     await workflow.ensure_ready()
     assert workflow.compiled_graph is not None
 
@@ -40,8 +77,103 @@ async def start(
         summarize_message_window=summarize_message_window,
         summarize_message_keep=summarize_message_keep,
         summarize_system_messages=summarize_system_messages,
+        summarize_token_threshold=summarize_token_threshold,
+        summarize_token_keep=summarize_token_keep,
+        token_budget=token_budget,
     )
 
-    result = await workflow.compiled_graph.ainvoke(initial_state.model_dump(), config)
+    if profile and not env.PROFILING_ENABLED:
+        logger.warning("Profiling requested but PROFILING_ENABLED is off; ignoring.")
+        profile = False
+
+    thread_id = str(config.get("configurable", {}).get("thread_id", ""))
+    if function != "response_generator" or not message_coalescer.enabled:
+        return await _locked_run(thread_id, initial_state, config, profile)
 
+    async def run_burst(inputs: list[BaseMessage]):
+        state = initial_state.model_copy(update={"input": inputs})
+        result = await _locked_run(thread_id, state, config, profile)
+        return result, config
+
+    result, run_config = await message_coalescer.submit(thread_id, input, run_burst)
+    if run_config is not config:
+        await _answer_coalesced(result, initial_state, config, run_config)
     return result
+
+
+async def _locked_run(
+    thread_id: str, initial_state: GraphState, config: RunnableConfig, profile: bool
+):
+    assert workflow.compiled_graph is not None
+
+    async with thread_locks.hold(thread_id, remaining_time(config)):
+        cassette.record_turn(initial_state.input, config, initial_state.function)
+        if not profile:
+            return await _run(initial_state, config)
+
+        profiled_run: ProfiledRun | None = None
+        try:
+            async with run_profiler.profile(thread_id) as profiled_run:
+                return await _run(initial_state, config)
+        finally:
+            # Failed runs are saved too: they are often the ones to look at
+            if profiled_run is not None:
+                await _save_profile(profiled_run, config)
+
+
+async def _save_profile(profiled_run: ProfiledRun, config: RunnableConfig) -> None:
+    assert workflow.compiled_graph is not None
+
+    try:
+        # Read before the next run of the thread moves the checkpoint on
+        snapshot = await workflow.compiled_graph.aget_state(config)
+        checkpoint_id = snapshot.config.get("configurable", {}).get("checkpoint_id")
+        await run_profiler.save(profiled_run, str(checkpoint_id or ""))
+    except Exception as e:
+        # Diagnostics must not replace the run's own result or error
+        logger.warning(
+            f"Could not save the profile of thread {profiled_run.thread_id}: {e}"
+        )
+
+
+async def _answer_coalesced(
+    result, initial_state: GraphState, config: RunnableConfig, run_config: RunnableConfig
+) -> None:
+    """
+    Account for a message answered by the run of a later message in its burst,
+    and hand the answer to its frame sink unless that run already streamed it
+    there.
+    """
+    run_usage = TokenUsage.model_validate(result.get("run_token_usage") or {})
+    LLM_CALLS_SAVED.inc(run_usage.calls)
+
+    sink = frame_sink(config)
+    if (
+        initial_state.chat_interface.streams
+        and sink is not None
+        and sink is not frame_sink(run_config)
+    ):
+        final_msg = LLMWebSocketResponse(
+            type=WebSocketData.final, data=result["response"].content[0]
+        )
+        await sink.send_json(final_msg.model_dump(mode="json"))
+
+
+async def _run(initial_state: GraphState, config: RunnableConfig):
+    assert workflow.compiled_graph is not None
+    chat_interface = initial_state.chat_interface.value
+
+    with run_metrics(chat_interface):
+        async with tracer.run(config, chat_interface):
+            try:
+                # The thread's usage accumulates in the checkpoint across runs
+                return await workflow.compiled_graph.ainvoke(
+                    initial_state.model_dump(exclude={"token_usage"}), config
+                )
+            except asyncio.CancelledError as e:
+                # The checkpoint stays at the last completed step; the next
+                # run of the thread starts over from it
+                reason = str(e.args[0]) if e.args else "cancelled"
+                RUNS_CANCELLED.labels(reason, chat_interface).inc()
+                logger.info(f"Run cancelled ({reason}).")
+                raise
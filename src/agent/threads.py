@@ -2,6 +2,10 @@ from langchain_core.runnables import RunnableConfig
 from langgraph.pregel.types import StateSnapshot
 
 from src.agent import workflow
+from src.config import env
+from src.token_usage.model.token_usage import ThreadTokenUsage, TokenUsage
+from src.tracing.main import tracer
+from src.tracing.model.run_trace import RunTrace
 
 
 async def get_thread_history(thread_id: str) -> list[StateSnapshot]:
@@ -31,6 +35,30 @@ async def get_latest_thread_state(thread_id: str) -> StateSnapshot:
     return latest_state
 
 
+async def get_thread_traces(thread_id: str, limit: int = 20) -> list[RunTrace]:
+    """
+    Retrieve the execution traces of the latest runs of a thread, newest first.
+    """
+    await workflow.ensure_ready()
+    return await tracer.list(thread_id, limit)
+
+
+async def get_thread_token_usage(thread_id: str) -> ThreadTokenUsage:
+    """
+    Retrieve the tokens used by all runs of a thread, against its budget.
+    """
+    latest_state = await get_latest_thread_state(thread_id)
+    usage = TokenUsage.model_validate(latest_state.values.get("token_usage") or {})
+    budget = env.THREAD_TOKEN_BUDGET
+    return ThreadTokenUsage(
+        thread_id=thread_id,
+        usage=usage,
+        total_tokens=usage.total_tokens,
+        budget=budget,
+        remaining=max(budget - usage.total_tokens, 0) if budget is not None else None,
+    )
+
+
 async def clear_thread(thread_id: str) -> None:
     """
     Clear the state and history of a specific thread.
@@ -44,5 +72,6 @@ async def clear_thread(thread_id: str) -> None:
 
         config = RunnableConfig(configurable={"thread_id": thread_id})
         workflow.compiled_graph.update_state(config=config, values=None)
+        await tracer.delete(thread_id)
     except Exception as e:
         raise RuntimeError(f"Could not clear thread {thread_id}") from e
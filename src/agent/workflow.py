@@ -3,7 +3,7 @@ from collections import Counter
 from collections.abc import Hashable
 from typing import cast
 
-from fastapi import HTTPException
+from fastapi import HTTPException, WebSocketDisconnect
 from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
 from langchain_core.runnables.config import RunnableConfig
 from langgraph.checkpoint.base import BaseCheckpointSaver
@@ -14,6 +14,8 @@ from langgraph.graph.state import CompiledStateGraph
 from psycopg import AsyncConnection
 from psycopg.rows import DictRow, dict_row
 
+from src.admission import Overloaded, Priority, lowered_priority
+from src.agent.input_message import compact_legacy_inputs
 from src.agent.model.chat_interface import ChatInterface
 from src.agent.model.graph_state import GraphState
 from src.agent.model.steps import Steps
@@ -21,6 +23,12 @@ from src.agent.model.tool_data import ToolData
 from src.config import env
 from src.config.env.llm import PARALLEL_GENERATION
 from src.config.env.vector import RAG_AVAILABLE
+from src.deadline import (
+    DeadlineExceeded,
+    deadline_passed,
+    deadline_within,
+    remaining_time,
+)
 from src.error_handler import ErrorHandler
 from src.evaluate_tools.main import EvaluateTools
 from src.evaluate_tools.model.tool_config import (
@@ -28,9 +36,21 @@ from src.evaluate_tools.model.tool_config import (
     ToolConfigWithResponse,
     ToolConfigWithResponseWithoutRAG,
 )
+from src.frame_sink import frame_sink
 from src.generate_response import ResponseGenerator
+from src.generate_response.model.response import (
+    LLMAPIResponse,
+    LLMWebSocketResponse,
+    WebSocketData,
+)
+from src.metrics.instrumented_checkpoint_saver import InstrumentedCheckpointSaver
+from src.metrics.main import ERROR_RETRIES
+from src.prune_tool_data.main import ToolDataPruner
 from src.summarize.main import Summarizer
 from src.system_prompt.main import SystemPromptBuilder
+from src.thread_lock import thread_locks
+from src.token_usage import TokenUsage, exhausted_budget
+from src.tracing.main import record_trace_event, tracer
 from src.vector_manager.main import VectorManager
 
 # from psycopg import Connection  # ⇐ open sync conn
@@ -42,6 +62,11 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
 
+BUDGET_EXHAUSTED_INSTRUCTIONS = (
+    "The time or token budget of this conversation is used up: answer now with "
+    "the information you already have and do not request any tool."
+)
+
 
 class Workflow(SystemPromptBuilder):
     tool_evaluator: EvaluateTools
@@ -51,6 +76,7 @@ class Workflow(SystemPromptBuilder):
     memory: BaseCheckpointSaver | None
     vector_manager: VectorManager
     summarizer: Summarizer
+    tool_data_pruner: ToolDataPruner
 
     def __init__(self) -> None:
         super().__init__()
@@ -60,6 +86,7 @@ class Workflow(SystemPromptBuilder):
             self.vector_manager = VectorManager()
         self.error_handler = ErrorHandler()
         self.summarizer = Summarizer()
+        self.tool_data_pruner = ToolDataPruner()
 
         self.graph = self._load_graph()
         self.memory = None
@@ -73,11 +100,18 @@ class Workflow(SystemPromptBuilder):
         if self.compiled_graph is not None:
             return
         self.memory = await self._load_memory()
+        await tracer.setup(env.POSTGRES_URI)
+        await thread_locks.setup(env.POSTGRES_URI)
         self.compiled_graph = self.graph.compile(checkpointer=self.memory)
 
     def context_incrementer(self, state: GraphState) -> GraphState:
         state.step_history.append(Steps.context_incrementer)
-        state.messages = state.input
+
+        # Lazily migrate threads stored with the legacy input encoding
+        migration = (
+            compact_legacy_inputs(state.messages) if env.MIGRATE_LEGACY_INPUTS else []
+        )
+        state.messages = migration + state.input
 
         if state.function == "context_incrementer":
             state.next_step = Steps.end
@@ -99,6 +133,15 @@ class Workflow(SystemPromptBuilder):
 
         return state
 
+    def prune_tool_data(self, state: GraphState) -> GraphState:
+        state.step_history.append(Steps.prune_tool_data)
+
+        ops = self.tool_data_pruner.prune(state.messages)
+        if ops:
+            state.messages = ops
+
+        return state
+
     async def generate_summary(
         self,
         state: GraphState,
@@ -109,8 +152,18 @@ class Workflow(SystemPromptBuilder):
         if config is None:
             raise ValueError("Graph config unavailable.")
 
+        # The next turn summarizes instead, once the answer is no longer waited on
+        if deadline_passed(config):
+            logger.info("Request deadline passed; summarization deferred.")
+            return state
+
         try:
-            self.summarizer.summarize_conditionally(state, config)
+            # Follow-up work: the turns users are waiting on go first
+            with lowered_priority(Priority.background):
+                await self.summarizer.summarize_conditionally(state, config)
+        except Overloaded as e:
+            # The answer is out already; the next turn summarizes instead
+            logger.warning(f"Summarization deferred: {e}")
         except Exception as e:
             state.error = str(e)
             state.next_step = Steps.error_handler
@@ -127,26 +180,27 @@ class Workflow(SystemPromptBuilder):
         if config is None:
             raise ValueError("Graph config unavailable.")
 
+        usage = TokenUsage()
         try:
             match state.chat_interface:
                 case ChatInterface.api:
-                    response = self.response_generator.generate_response(
+                    response = await self.response_generator.generate_response(
                         config,
                         state.messages,
+                        usage,
                     )
-                case ChatInterface.websocket:
-                    # Retrieve websocket from the config you passed earlier
-                    websocket = config.get("configurable", {}).get("websocket")
-
-                    if websocket is None:
-                        raise ValueError("No WebSocket for WebSocket chat interface.")
-
-                    response = (
-                        await self.response_generator.generate_websocket_response(
-                            websocket,
-                            config,
-                            state.messages,
-                        )
+                case ChatInterface.websocket | ChatInterface.sse:
+                    # Retrieve the sink from the config you passed earlier
+                    sink = frame_sink(config)
+
+                    if sink is None:
+                        raise ValueError("No frame sink for streaming chat interface.")
+
+                    response = await self.response_generator.stream_response(
+                        sink,
+                        config,
+                        state.messages,
+                        usage,
                     )
                 # case ChatInterface.whatsapp:
                 #     response = self.response_generator.generate_whatsapp_response(
@@ -159,9 +213,16 @@ class Workflow(SystemPromptBuilder):
             ai_message = AIMessage(content=[response.model_dump()])
             state.response = ai_message
             state.messages = [ai_message]
+        except DeadlineExceeded:
+            await self._answer_at_deadline(state, config)
+        except (Overloaded, WebSocketDisconnect):
+            # Retrying would only add load, or answer nobody
+            raise
         except Exception as e:
             state.error = str(e)
             state.next_step = Steps.error_handler
+        finally:
+            state.record_token_usage(usage)
 
         return state
 
@@ -175,12 +236,42 @@ class Workflow(SystemPromptBuilder):
         if config is None:
             raise ValueError("Graph config unavailable.")
 
+        usage = TokenUsage()
         try:
+            budget = exhausted_budget(
+                state.run_token_usage,
+                state.token_budget,
+                state.token_usage,
+                env.THREAD_TOKEN_BUDGET,
+            )
+            if budget is None and deadline_within(
+                config, env.DEADLINE_TOOL_LOOP_RESERVE
+            ):
+                # Another tool loop would not end before the deadline
+                budget = "deadline"
+            if budget is not None:
+                record_trace_event(
+                    "budget",
+                    budget=budget,
+                    run_tokens=state.run_token_usage.total_tokens,
+                    thread_tokens=state.token_usage.total_tokens,
+                    remaining_time=remaining_time(config),
+                )
+                if not PARALLEL_GENERATION:
+                    # Answer with what the run has gathered, no more tools
+                    state.next_step = Steps.generate_response
+                    return state
+
             # Preventing double injection of context and loops
             if self._is_looping(
                 state.step_history,
                 state.loop_threshold,
             ):
+                record_trace_event(
+                    "loop",
+                    step_history=",".join(s.value for s in state.step_history),
+                    loop_threshold=state.loop_threshold,
+                )
                 raise ValueError(
                     f"Loop detected in step history: {state.step_history}. "
                     f"The loop threshold ({state.loop_threshold}) was exceeded due to repeated steps."
@@ -189,23 +280,32 @@ class Workflow(SystemPromptBuilder):
             #     state.previous_step = Steps.evaluate_tools
             #     raise ValueError("Loop detected: Tool already used.")
 
+            # With parallel generation the evaluator answers, so it must end here
+            query = state.messages
+            if budget is not None:
+                query = query + [SystemMessage(content=BUDGET_EXHAUSTED_INSTRUCTIONS)]
+
             match state.chat_interface:
                 case ChatInterface.api:
-                    response = self.tool_evaluator.decide_next_step(
+                    response = await self.tool_evaluator.decide_next_step(
                         config,
-                        state.messages,
+                        query,
+                        usage,
+                        force_end=budget is not None,
                     )
-                case ChatInterface.websocket:
-                    # Retrieve websocket from the config you passed earlier
-                    websocket = config.get("configurable", {}).get("websocket")
+                case ChatInterface.websocket | ChatInterface.sse:
+                    # Retrieve the sink from the config you passed earlier
+                    sink = frame_sink(config)
 
-                    if websocket is None:
-                        raise ValueError("No WebSocket for WebSocket chat interface.")
+                    if sink is None:
+                        raise ValueError("No frame sink for streaming chat interface.")
 
-                    response = await self.tool_evaluator.stream_next_step_via_websocket(
-                        websocket,
+                    response = await self.tool_evaluator.stream_next_step(
+                        sink,
                         config,
-                        state.messages,
+                        query,
+                        usage,
+                        force_end=budget is not None,
                     )
 
             if isinstance(response, ToolConfigWithResponse) or isinstance(
@@ -229,13 +329,20 @@ class Workflow(SystemPromptBuilder):
                 rag_query = response.rag_query
                 if rag_query is not None:
                     state.tool_payloads.rag_query = rag_query
+        except DeadlineExceeded:
+            await self._answer_at_deadline(state, config)
+        except (Overloaded, WebSocketDisconnect):
+            # Retrying would only add load, or answer nobody
+            raise
         except Exception as e:
             state.error = str(e)
             state.next_step = Steps.error_handler
+        finally:
+            state.record_token_usage(usage)
 
         return state
 
-    def rag(self, state: GraphState) -> GraphState:
+    async def rag(self, state: GraphState) -> GraphState:
         state.step_history.append(Steps.rag)
         try:
             query = state.tool_payloads.rag_query
@@ -243,7 +350,7 @@ class Workflow(SystemPromptBuilder):
                 raise ValueError("Expected the query to be a string.")
 
             # Retrieve relevant documents from the vectorstore
-            retrieved_docs = self.vector_manager.retrieve(
+            retrieved_docs = await self.vector_manager.retrieve(
                 query=query, top_k=state.top_k
             )
 
@@ -258,12 +365,22 @@ class Workflow(SystemPromptBuilder):
                     )
                 ],
                 type="rag_data",
+                # Kept so the retention policy can cite the lookup later on
+                additional_kwargs={
+                    "rag_query": query,
+                    "document_ids": [
+                        str(doc.id or doc.metadata.get("pk", ""))
+                        for doc in retrieved_docs
+                    ],
+                },
             )
 
             # Update the messages in state
             state.messages = [documents_message]
             state.next_step = Steps.evaluate_tools
 
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Error during RAG retrieval: {str(e)}", exc_info=True)
             state.error = str(e)
@@ -271,15 +388,38 @@ class Workflow(SystemPromptBuilder):
 
         return state
 
-    def handle_error(self, state: GraphState) -> GraphState:
+    async def handle_error(
+        self,
+        state: GraphState,
+        config: RunnableConfig | None = None,
+    ) -> GraphState:
         state.step_history.append(Steps.error_handler)
         if state.error is None:
             raise ValueError("No error to handle.")
 
+        # No time left for a retry
+        if deadline_passed(config):
+            logger.warning(f"Request deadline passed after error: {state.error}")
+            await self._answer_at_deadline(state, config)
+            return state
+
         if state.current_retries >= state.max_retries:
             raise HTTPException(status_code=500, detail=state.error)
 
         state.current_retries += 1
+        ERROR_RETRIES.labels(
+            _failed_provider(state.step_history), state.chat_interface.value
+        ).inc()
+        record_trace_event(
+            "retry",
+            retry=state.current_retries,
+            max_retries=state.max_retries,
+            error=state.error,
+        )
+        logger.warning(
+            f"Retrying after error ({state.current_retries}/{state.max_retries}, "
+            f"{env.STRUCTURED_OUTPUT_MODE} structured output): {state.error}"
+        )
 
         handling_context = self.error_handler.handle(state.error)
 
@@ -289,6 +429,25 @@ class Workflow(SystemPromptBuilder):
 
         return state
 
+    async def _answer_at_deadline(
+        self, state: GraphState, config: RunnableConfig | None
+    ) -> None:
+        """End the run with the fallback answer, sent as the stream's final frame."""
+        record_trace_event("deadline", step=state.step_history[-1].value)
+        response = LLMAPIResponse(response=env.DEADLINE_FALLBACK_RESPONSE)
+
+        sink = frame_sink(config)
+        if state.chat_interface.streams and sink is not None:
+            final_msg = LLMWebSocketResponse(
+                type=WebSocketData.final, data=response.model_dump()
+            )
+            await sink.send_json(final_msg.model_dump(mode="json"))
+
+        ai_message = AIMessage(content=[response.model_dump()])
+        state.response = ai_message
+        state.messages = [ai_message]
+        state.next_step = Steps.end
+
     def _is_looping(self, step_history: list[Steps], threshold: int) -> bool:
         counts = Counter(step_history)
         most_common_step, count = counts.most_common(1)[0]
@@ -303,6 +462,7 @@ class Workflow(SystemPromptBuilder):
         graph.add_node(str(Steps.context_builder), self.context_builder)
         graph.add_node(str(Steps.evaluate_tools), self.decide_next_step)
         graph.add_node(str(Steps.generate_response), self.generate_response)
+        graph.add_node(str(Steps.prune_tool_data), self.prune_tool_data)
         graph.add_node(str(Steps.summarize), self.generate_summary)
         graph.add_node(str(Steps.rag), self.rag)
         graph.add_node(str(Steps.error_handler), self.handle_error)
@@ -322,6 +482,8 @@ class Workflow(SystemPromptBuilder):
         # Setting conditionally the `evaluate_tools` edges considering the parallel runtime
         evaluate_tools_edges: dict[Hashable, str] = {
             Steps.error_handler: str(Steps.error_handler),
+            # Answered by the evaluator, or with the fallback at the deadline
+            Steps.end: str(Steps.prune_tool_data),
         }
         if env.RAG_AVAILABLE:
             rag: Hashable = Steps.rag
@@ -330,10 +492,6 @@ class Workflow(SystemPromptBuilder):
             # Generate the response possibly in the next step
             generate_response: Hashable = Steps.generate_response
             evaluate_tools_edges[generate_response] = str(Steps.generate_response)
-        else:
-            # Generate the response with the tool decision
-            end: Hashable = Steps.end
-            evaluate_tools_edges[end] = str(Steps.summarize)
         graph.add_conditional_edges(
             str(Steps.evaluate_tools),
             lambda x: x.next_step,
@@ -354,10 +512,11 @@ class Workflow(SystemPromptBuilder):
             str(Steps.generate_response),
             lambda x: x.next_step,
             {
-                Steps.end: str(Steps.summarize),
+                Steps.end: str(Steps.prune_tool_data),
                 Steps.error_handler: str(Steps.error_handler),
             },
         )
+        graph.add_edge(str(Steps.prune_tool_data), str(Steps.summarize))
         graph.add_edge(str(Steps.summarize), END)
 
         graph.add_conditional_edges(
@@ -384,7 +543,20 @@ class Workflow(SystemPromptBuilder):
 
             saver = AsyncPostgresSaver(self._db_conn)
             await saver.setup()  # one-time DDL
-            return saver
+            return InstrumentedCheckpointSaver(saver)
 
         # fallback when no PG URI
-        return MemorySaver()
+        return InstrumentedCheckpointSaver(MemorySaver())
+
+
+def _failed_provider(step_history: list[Steps]) -> str:
+    """Provider of the model behind the step that failed, before the error handler."""
+    failed = step_history[-2] if len(step_history) > 1 else None
+    match failed:
+        case Steps.evaluate_tools:
+            return env.TOOL_EVALUATOR_LLM_PROVIDER.value
+        case Steps.generate_response:
+            return env.LLM_PROVIDER.value
+        case Steps.rag:
+            return env.TEXT_EMBEDDING_PROVIDER.value
+    return "none"
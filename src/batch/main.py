@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+from src.admission import Overloaded
+from src.agent.model.input import InputRequest
+from src.batch.model.batch import BatchItemResult
+from src.config import env
+from src.thread_lock import ThreadBusy
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+# Reason of the runs cancelled because the batch's client went away
+DISCONNECTED = "disconnect"
+
+Answer = Callable[[InputRequest], Awaitable[Any]]
+
+
+async def run_batch(
+    requests: list[InputRequest], answer: Answer, max_concurrency: int | None = None
+) -> AsyncIterator[BatchItemResult]:
+    """
+    Answer `requests` with `answer`, at most `max_concurrency` at a time
+    (`BATCH_MAX_CONCURRENCY` at most), yielding each result as it completes.
+
+    Messages to the same thread are answered one after the other, in the
+    order given. A failed message yields an error result and the batch goes
+    on. Leaving the iteration early cancels the messages in progress.
+    """
+    limit = min(max_concurrency or env.BATCH_MAX_CONCURRENCY, env.BATCH_MAX_CONCURRENCY)
+    slots = asyncio.Semaphore(limit)
+    results: asyncio.Queue[BatchItemResult] = asyncio.Queue()
+
+    threads: dict[str, list[tuple[int, InputRequest]]] = {}
+    for index, req in enumerate(requests):
+        threads.setdefault(req.thread_id, []).append((index, req))
+
+    async def answer_thread(items: list[tuple[int, InputRequest]]) -> None:
+        for index, req in items:
+            async with slots:
+                results.put_nowait(await _answer_item(index, req, answer))
+
+    workers = [asyncio.create_task(answer_thread(items)) for items in threads.values()]
+    try:
+        for _ in requests:
+            yield await results.get()
+    finally:
+        for worker in workers:
+            worker.cancel(DISCONNECTED)
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def _answer_item(
+    index: int, req: InputRequest, answer: Answer
+) -> BatchItemResult:
+    result = BatchItemResult(index=index, thread_id=req.thread_id, status_code=200)
+    try:
+        result.response = await answer(req)
+    except ThreadBusy as e:
+        result.status_code, result.detail = 409, str(e)
+    except Overloaded as e:
+        result.status_code, result.detail = 503, str(e)
+    except Exception as e:
+        logger.error(f"Error answering batch message {index}: {e}", exc_info=True)
+        result.status_code, result.detail = 500, f"Could not send chat message: {e}"
+    return result
@@ -0,0 +1,32 @@
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from src.agent.model.input import InputRequest
+
+
+class BatchRequest(BaseModel):
+    """Messages to many threads, answered in one request."""
+
+    requests: list[InputRequest] = Field(
+        min_length=1,
+        description="Messages to answer. Those to the same thread are answered in "
+        "the order given.",
+    )
+    max_concurrency: int | None = Field(
+        default=None,
+        gt=0,
+        description="Messages answered at once, at most `BATCH_MAX_CONCURRENCY`.",
+    )
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one message of a batch, streamed as an NDJSON line."""
+
+    index: int = Field(description="Position of the message in the batch.")
+    thread_id: str = Field(description="The ID of the thread of the message.")
+    status_code: int = Field(description="HTTP status code of the message's answer.")
+    response: Any = Field(default=None, description="The answer, when successful.")
+    detail: str | None = Field(
+        default=None, description="What went wrong, if anything."
+    )
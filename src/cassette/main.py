@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from langchain_core.messages import BaseMessage, messages_to_dict
+from langchain_core.runnables import RunnableConfig
+from pydantic import TypeAdapter
+
+from src.cassette.model.cassette_entry import CassetteCall, CassetteTurn
+from src.cassette.model.cassette_mode import CassetteMode
+from src.config import env
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+_entry_adapter: TypeAdapter[CassetteCall | CassetteTurn] = TypeAdapter(
+    CassetteCall | CassetteTurn
+)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a prompt was never recorded."""
+
+
+class Cassette:
+    """
+    JSONL recording of LLM calls and user turns.
+
+    Calls are keyed by a hash of the model name and the rendered prompt. The
+    same prompt may be recorded several times (e.g. identical turns on different
+    threads); replay serves its recordings in order and then starts over.
+    """
+
+    mode: CassetteMode
+    path: Path
+    emulate_timing: bool
+
+    def __init__(
+        self,
+        mode: CassetteMode | None = None,
+        path: str | Path | None = None,
+        emulate_timing: bool | None = None,
+    ):
+        self.mode = mode or CassetteMode(env.LLM_CASSETTE_MODE)
+        self.path = Path(path or env.LLM_CASSETTE_PATH)
+        self.emulate_timing = (
+            env.LLM_CASSETTE_EMULATE_TIMING if emulate_timing is None else emulate_timing
+        )
+        self._lock = threading.Lock()
+        self._calls: dict[str, list[CassetteCall]] | None = None
+        self._served: dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+
+    def lookup(self, key: str) -> CassetteCall:
+        calls = self._load_calls().get(key)
+        if not calls:
+            raise CassetteMiss(f"No recorded call for prompt {key[:12]} in {self.path}.")
+        with self._lock:
+            served = self._served[key]
+            self._served[key] = served + 1
+        return calls[served % len(calls)]
+
+    def record_call(self, call: CassetteCall) -> None:
+        self._append(call)
+
+    def record_turn(
+        self, input: list[BaseMessage], config: RunnableConfig, function: str
+    ) -> None:
+        """Record a turn sent to the agent when recording; no-op otherwise."""
+        if self.mode != CassetteMode.record:
+            return
+        thread_id = str(config.get("configurable", {}).get("thread_id", ""))
+        self._append(
+            CassetteTurn(
+                thread_id=thread_id, function=function, input=messages_to_dict(input)
+            )
+        )
+
+    def turns(self) -> dict[str, list[CassetteTurn]]:
+        """Recorded turns grouped by thread, in order."""
+        turns: dict[str, list[CassetteTurn]] = defaultdict(list)
+        for entry in self._read():
+            if isinstance(entry, CassetteTurn):
+                turns[entry.thread_id].append(entry)
+        return dict(turns)
+
+    # ---------- internal helpers ---------- #
+    def _append(self, entry: CassetteCall | CassetteTurn) -> None:
+        line = entry.model_dump_json() + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _load_calls(self) -> dict[str, list[CassetteCall]]:
+        if self._calls is None:
+            calls: dict[str, list[CassetteCall]] = defaultdict(list)
+            for entry in self._read():
+                if isinstance(entry, CassetteCall):
+                    calls[entry.key].append(entry)
+            self._calls = dict(calls)
+            logger.info(
+                f"Loaded {sum(map(len, calls.values()))} recorded calls "
+                f"({len(calls)} distinct prompts) from {self.path}."
+            )
+        return self._calls
+
+    def _read(self) -> list[CassetteCall | CassetteTurn]:
+        if not self.path.is_file():
+            return []
+        with self.path.open(encoding="utf-8") as f:
+            return [
+                _entry_adapter.validate_python(json.loads(line))
+                for line in f
+                if line.strip()
+            ]
+
+
+cassette = Cassette()
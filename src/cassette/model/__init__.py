@@ -0,0 +1,2 @@
+from .cassette_mode import *
+from .cassette_entry import *
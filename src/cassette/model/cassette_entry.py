@@ -0,0 +1,33 @@
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field
+
+
+class CassetteChunk(BaseModel):
+    content: str | list = Field(description="Content of the streamed chunk.")
+    offset: float = Field(
+        description="Seconds between the start of the call and this chunk."
+    )
+    usage_metadata: dict[str, Any] | None = None
+
+
+class CassetteCall(BaseModel):
+    kind: Literal["call"] = "call"
+    key: str = Field(description="Hash of the model name and rendered prompt.")
+    model: str
+    prompt: str
+    chunks: list[CassetteChunk]
+    thread_id: str | None = None
+
+
+class CassetteTurn(BaseModel):
+    """A user turn sent to the agent, so whole conversations can be replayed."""
+
+    kind: Literal["turn"] = "turn"
+    thread_id: str
+    function: str = Field(
+        default="response_generator", description="Graph entry function of the turn."
+    )
+    input: list[dict[str, Any]] = Field(
+        description="Input messages, as `messages_to_dict` dumps them."
+    )
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class CassetteMode(Enum):
+    off = "off"  # Call the providers directly.
+    record = "record"  # Call the providers and write every call to the cassette.
+    replay = "replay"  # Serve calls from the cassette, without any provider.
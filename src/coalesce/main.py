@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+from src.config import env
+from src.metrics.main import COALESCED_MESSAGES
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+T = TypeVar("T")
+RunBurst = Callable[[list[Any]], Awaitable[T]]
+
+
+@dataclass
+class _Burst(Generic[T]):
+    # The runs of the senders still waiting, in arrival order
+    runs: list[RunBurst[T]] = field(default_factory=list)
+    inputs: list[Any] = field(default_factory=list)
+    messages: int = 0
+    opened: float = field(default_factory=time.monotonic)
+    last_arrival: float = field(default_factory=time.monotonic)
+    result: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    task: asyncio.Task | None = None
+
+
+class MessageCoalescer:
+    """
+    Merges bursts of messages sent to a thread into a single run.
+
+    A burst stays open until no message arrived for `window` seconds (at most
+    `max_window` after its first message) and while the thread's previous run
+    is in flight. It then runs once with the inputs of all its messages, using
+    the `run` of the latest sender still waiting, and every sender gets that
+    run's result. The run is cancelled once no sender waits for it anymore.
+    """
+
+    def __init__(self, window: float | None = None, max_window: float | None = None):
+        self.window = env.COALESCE_WINDOW if window is None else window
+        self.max_window = env.COALESCE_MAX_WINDOW if max_window is None else max_window
+        self._open: dict[str, _Burst] = {}
+        self._running: dict[str, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, thread_id: str, inputs: list[Any], run: RunBurst[T]) -> T:
+        burst = self._open.get(thread_id)
+        if burst is None:
+            burst = _Burst()
+            self._open[thread_id] = burst
+            burst.task = asyncio.create_task(self._run(thread_id, burst))
+        else:
+            COALESCED_MESSAGES.inc()
+            burst.last_arrival = time.monotonic()
+        burst.runs.append(run)
+        burst.inputs.extend(inputs)
+        burst.messages += 1
+
+        try:
+            # A sender giving up must not cancel the run of the others
+            return await asyncio.shield(burst.result)
+        except asyncio.CancelledError as e:
+            burst.runs.remove(run)
+            if not burst.runs and burst.task is not None:
+                if self._open.get(thread_id) is burst:
+                    del self._open[thread_id]
+                burst.task.cancel(*e.args)
+            raise
+
+    async def _run(self, thread_id: str, burst: _Burst) -> None:
+        current = asyncio.current_task()
+        try:
+            while True:
+                now = time.monotonic()
+                wait = min(
+                    burst.last_arrival + self.window,
+                    burst.opened + self.max_window,
+                )
+                if now >= wait:
+                    break
+                await asyncio.sleep(wait - now)
+
+            # Messages keep joining while the previous run finishes
+            previous = self._running.get(thread_id)
+            if previous is not None:
+                await asyncio.wait([previous])
+
+            del self._open[thread_id]
+            assert current is not None
+            self._running[thread_id] = current
+            if burst.messages > 1:
+                logger.info(
+                    f"Running {burst.messages} messages of thread {thread_id} at once."
+                )
+            burst.result.set_result(await burst.runs[-1](burst.inputs))
+        except asyncio.CancelledError:
+            burst.result.cancel()
+            raise
+        except BaseException as e:
+            burst.result.set_exception(e)
+        finally:
+            if self._open.get(thread_id) is burst:
+                del self._open[thread_id]
+            if self._running.get(thread_id) is current:
+                del self._running[thread_id]
+
+
+message_coalescer = MessageCoalescer()
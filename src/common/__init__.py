@@ -1,3 +1,6 @@
 from .main import *
 from .create_deep_partial import *
 from .normalize_delta import *
+from .rewrite_messages import *
+from .estimate_tokens import *
+from .graph_node import *
@@ -0,0 +1,6 @@
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) for logging and budgets."""
+    return math.ceil(len(text) / 4)
@@ -0,0 +1,13 @@
+from typing import Any
+
+
+def graph_node(metadata: dict[str, Any] | None, kwargs: dict[str, Any]) -> str | None:
+    """
+    Name of the graph node a chain callback reports, when the chain is the node
+    run itself (not a runnable nested inside it, nor a LangGraph `__start__`-like
+    internal node); `None` otherwise.
+    """
+    node = (metadata or {}).get("langgraph_node")
+    if node is None or kwargs.get("name") != node or node.startswith("__"):
+        return None
+    return node
@@ -0,0 +1,60 @@
+from typing import Any
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+
+# Counts the in-place rewrites of a message, so caches keyed by message id
+# (see `message_cache_key`) never serve its previous content
+REVISION_KEY = "revision"
+# Token count of a message's current revision (see `MessageTokenCounter`)
+TOKEN_COUNT_KEY = "token_count"
+
+
+def revise_message(original: BaseMessage, replacement: BaseMessage) -> BaseMessage:
+    """`replacement` under the id of `original`, with its revision bumped."""
+    revised = replacement.model_copy(deep=True)
+    revised.id = original.id
+    revised.additional_kwargs = {
+        **revised.additional_kwargs,
+        REVISION_KEY: original.additional_kwargs.get(REVISION_KEY, 0) + 1,
+    }
+    return revised
+
+
+def annotate_message(m: BaseMessage, **kwargs: Any) -> BaseMessage:
+    """
+    `m` with `kwargs` added to its `additional_kwargs`, under the same id and
+    revision: for facts about its current content, which stay cached.
+    """
+    annotated = m.model_copy(deep=True)
+    annotated.additional_kwargs = {**annotated.additional_kwargs, **kwargs}
+    return annotated
+
+
+def message_cache_key(m: BaseMessage) -> str | None:
+    """Key of the message's current content in per-message caches."""
+    if m.id is None:
+        return None
+    revision = m.additional_kwargs.get(REVISION_KEY)
+    return f"{m.id}@{revision}" if revision else m.id
+
+
+def rewrite_messages(
+    messages: list[BaseMessage],
+    replacements: dict[int, BaseMessage | None],
+) -> list[BaseMessage]:
+    """
+    Build an `add_messages` update replacing or dropping messages in place.
+
+    `replacements` maps indexes of `messages` to their new message (or `None` to
+    drop them). A replacement keeps the id of the message it replaces, which
+    `add_messages` swaps in at the same position, so the rest of the thread
+    keeps its ids (and its cached renders and token counts).
+    """
+    ops: list[BaseMessage] = []
+    for idx, replacement in sorted(replacements.items()):
+        original = messages[idx]
+        if replacement is None:
+            ops.append(RemoveMessage(id=original.id))  # type: ignore[arg-type]
+        else:
+            ops.append(revise_message(original, replacement))
+    return ops
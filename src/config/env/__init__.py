@@ -3,3 +3,4 @@ from .database import *
 from .llm import *
 from .main import *
 from .vector import *
+from .agent import *
@@ -0,0 +1,140 @@
+import os
+
+# Rewrite input messages stored by older versions (which carried the whole
+# serialized `Input`, defaults included) into the compact encoding the first
+# time their thread runs again.
+MIGRATE_LEGACY_INPUTS = (
+    os.getenv(
+        "MIGRATE_LEGACY_INPUTS",
+        "True",
+    ).lower()
+    == "true"
+)
+
+# How the chat history is rendered into the chain prompts. `compact` emits
+# role-tagged turns without ids or metadata, `raw` keeps the Python repr of
+# the messages (previous behaviour).
+TRANSCRIPT_FORMAT = os.getenv("TRANSCRIPT_FORMAT", "compact").lower()
+# Number of rendered messages kept in the per-process transcript cache.
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "4096"))
+# tiktoken encoding used to count the tokens of the history (token-based
+# summarization). Empty estimates tokens from the text length instead.
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+# Record/replay of LLM calls for reproducible performance runs. `record` calls
+# the providers and appends every call to the cassette, `replay` serves calls
+# from it with no provider at all, `off` disables the layer.
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl")
+# Whether replay reproduces the recorded time to first token and chunk pacing.
+LLM_CASSETTE_EMULATE_TIMING = (
+    os.getenv("LLM_CASSETTE_EMULATE_TIMING", "False").lower() == "true"
+)
+
+# Per-run execution traces (node, LLM and retrieval spans, retry/loop events),
+# stored next to the checkpoints and served on /agent/threads/{id}/traces.
+TRACES_ENABLED = os.getenv("TRACES_ENABLED", "True").lower() == "true"
+# Number of traces kept per thread.
+TRACE_RETENTION = int(os.getenv("TRACE_RETENTION", "20"))
+# When set, every trace is also appended to this file as OTLP/JSON.
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+# Finished traces are written in the background, up to this many per batch.
+TRACE_WRITE_BATCH = int(os.getenv("TRACE_WRITE_BATCH", "50"))
+# Traces waiting to be written; further ones are dropped while it is full.
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+
+# Event-loop blocking detector (diagnostics, opt-in). Measures the loop lag
+# every interval and reports stalls above the threshold with the stack of the
+# blocking code, attributed to the graph node and route running it.
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "False").lower() == "true"
+# Seconds between two lag measurements.
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.05"))
+# Lag, in seconds, above which the loop counts as stalled.
+LOOP_MONITOR_THRESHOLD = float(os.getenv("LOOP_MONITOR_THRESHOLD", "0.1"))
+
+# On-demand profiling of single runs (`profile: true` on a message request).
+# Disabled by default, since profiles expose code paths and memory usage.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+# Seconds between two stack samples of a profiled run.
+PROFILING_SAMPLE_INTERVAL = float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.005"))
+# Number of profiles kept under DATA_DIR/profiles (oldest removed first).
+PROFILING_RETENTION = int(os.getenv("PROFILING_RETENTION", "50"))
+
+# Tokens a thread may use across all its runs. Once used up, each run answers
+# with what it has instead of calling further tools. 0 disables the budget.
+THREAD_TOKEN_BUDGET = int(os.getenv("THREAD_TOKEN_BUDGET", "0")) or None
+
+# Seconds a request may take when it sets no `deadline` of its own. 0 disables it.
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "0"))
+# Seconds another tool loop (a retrieval and a new evaluation) is expected to
+# take. With less time left before the deadline, the agent answers right away.
+DEADLINE_TOOL_LOOP_RESERVE = float(os.getenv("DEADLINE_TOOL_LOOP_RESERVE", "10"))
+# Answer sent when the deadline passes before the agent could answer.
+DEADLINE_FALLBACK_RESPONSE = os.getenv(
+    "DEADLINE_FALLBACK_RESPONSE",
+    "Sorry, I could not finish answering in time. Please try again.",
+)
+
+# Serialize the runs of each thread, across workers through Postgres advisory
+# locks when POSTGRES_URI is set.
+THREAD_LOCK_ENABLED = os.getenv("THREAD_LOCK_ENABLED", "True").lower() == "true"
+# `queue` waits for the thread's run in progress, `reject` fails right away.
+THREAD_LOCK_POLICY = os.getenv("THREAD_LOCK_POLICY", "queue").lower()
+# Seconds a queued message waits for the thread before failing.
+THREAD_LOCK_TIMEOUT = float(os.getenv("THREAD_LOCK_TIMEOUT", "60"))
+# Seconds between two attempts at the Postgres advisory lock.
+THREAD_LOCK_POLL_INTERVAL = float(os.getenv("THREAD_LOCK_POLL_INTERVAL", "0.1"))
+
+# Merge bursts of user messages to a thread into one run: a burst closes once
+# no message arrived for this many seconds (and the thread's run in flight has
+# finished). 0 disables coalescing.
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "0"))
+# Longest a burst stays open, in seconds, however often messages arrive.
+COALESCE_MAX_WINDOW = float(os.getenv("COALESCE_MAX_WINDOW", "5"))
+
+# Admission control of the LLM calls to each provider model: an adaptive
+# concurrency limit, rate limits (see *_REQUESTS_PER_MINUTE and
+# *_TOKENS_PER_MINUTE) and a queue-time budget.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+# Bounds of the concurrency limit, which starts at the maximum and is cut on
+# rate limits and slow calls.
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+ADMISSION_MIN_CONCURRENCY = int(os.getenv("ADMISSION_MIN_CONCURRENCY", "1"))
+# Factor applied to the limit on a rate limit or slow call.
+ADMISSION_BACKOFF = float(os.getenv("ADMISSION_BACKOFF", "0.5"))
+# Seconds after which a call counts as slow. 0 reacts to rate limits only.
+ADMISSION_LATENCY_TARGET = float(os.getenv("ADMISSION_LATENCY_TARGET", "0"))
+# Seconds a call may wait for admission before the request fails with a 503.
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+# The same for bulk calls (ingestion). 0 waits as long as it takes.
+ADMISSION_BULK_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_BULK_QUEUE_TIMEOUT", "0"))
+# Fraction of the concurrency limit each priority class may use at once.
+ADMISSION_SHARE_INTERACTIVE = float(os.getenv("ADMISSION_SHARE_INTERACTIVE", "1"))
+ADMISSION_SHARE_BACKGROUND = float(os.getenv("ADMISSION_SHARE_BACKGROUND", "0.5"))
+ADMISSION_SHARE_BULK = float(os.getenv("ADMISSION_SHARE_BULK", "0.25"))
+# Seconds after which a queued call starts before more urgent ones, so
+# background and bulk work cannot starve.
+ADMISSION_STARVATION_AGE = float(os.getenv("ADMISSION_STARVATION_AGE", "30"))
+
+# Runs a multiplexed websocket connection may have in progress at once; further
+# requests wait for one of them to finish.
+WEBSOCKET_MAX_CONCURRENT_RUNS = int(os.getenv("WEBSOCKET_MAX_CONCURRENT_RUNS", "8"))
+
+# Messages of a batch request (/agent/messages/user/batch) answered at once, and
+# messages a batch may hold.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "1000"))
+
+# Streamed deltas are cumulative, so only the latest pending one is sent: at
+# most every STREAM_DELTA_WINDOW seconds, or sooner once its text grew by
+# STREAM_DELTA_MAX_CHARS characters.
+STREAM_DELTA_WINDOW = float(os.getenv("STREAM_DELTA_WINDOW", "0.05"))
+STREAM_DELTA_MAX_CHARS = int(os.getenv("STREAM_DELTA_MAX_CHARS", "256"))
+# Other frames (final, progress) queued for a slow client before the run waits
+# for it, and seconds it waits before giving up on the client.
+STREAM_MAX_QUEUED_FRAMES = int(os.getenv("STREAM_MAX_QUEUED_FRAMES", "64"))
+STREAM_SLOW_CLIENT_TIMEOUT = float(os.getenv("STREAM_SLOW_CLIENT_TIMEOUT", "10"))
+
+# Documents embedded per admitted call when ingesting, so chat turns can
+# interleave with large uploads.
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "16"))
@@ -23,6 +23,9 @@ LLM_API_KEY = SecretStr(os.getenv("LLM_API_KEY") or "")
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0"))
 llm_stop = os.getenv("LLM_STOP", None)
 LLM_STOP = llm_stop.split(",") if llm_stop else None
+# Provider rate limits of the model (0 = none), enforced by admission control
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
 
 # Parse kwargs for different configurations
 LLM_KWARGS = parse_kwargs("LLM_ARG_")
@@ -50,6 +53,12 @@ tool_evaluator_llm_stop = os.getenv("TOOL_EVALUATOR_LLM_STOP", None)
 TOOL_EVALUATOR_LLM_STOP = (
     tool_evaluator_llm_stop.split(",") if tool_evaluator_llm_stop else None
 )
+TOOL_EVALUATOR_LLM_REQUESTS_PER_MINUTE = float(
+    os.getenv("TOOL_EVALUATOR_LLM_REQUESTS_PER_MINUTE") or LLM_REQUESTS_PER_MINUTE
+)
+TOOL_EVALUATOR_LLM_TOKENS_PER_MINUTE = float(
+    os.getenv("TOOL_EVALUATOR_LLM_TOKENS_PER_MINUTE") or LLM_TOKENS_PER_MINUTE
+)
 
 
 TEST_LLM_PROVIDER = LLMProvider(os.getenv("TEST_LLM_PROVIDER") or LLM_PROVIDER)
@@ -97,3 +106,22 @@ SUMMARIZE_LLM_TEMPERATURE = (
 )
 summarize_llm_stop = os.getenv("SUMMARIZE_LLM_STOP", None)
 SUMMARIZE_LLM_STOP = summarize_llm_stop.split(",") if summarize_llm_stop else None
+SUMMARIZE_LLM_REQUESTS_PER_MINUTE = float(
+    os.getenv("SUMMARIZE_LLM_REQUESTS_PER_MINUTE") or LLM_REQUESTS_PER_MINUTE
+)
+SUMMARIZE_LLM_TOKENS_PER_MINUTE = float(
+    os.getenv("SUMMARIZE_LLM_TOKENS_PER_MINUTE") or LLM_TOKENS_PER_MINUTE
+)
+
+STRUCTURED_OUTPUT_MODE = os.getenv("STRUCTURED_OUTPUT_MODE", "parser").lower()
+
+# Fake provider (LLM_PROVIDER=fake) used for offline benchmarks
+#
+# Seconds before the first streamed token.
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+# Streaming rate after the first token. 0 streams instantly.
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+# Whether the fake tool evaluator calls `rag` once per user message.
+FAKE_LLM_USE_RAG = os.getenv("FAKE_LLM_USE_RAG", "False").lower() == "true"
+# Size of the vectors produced by the fake embedding provider.
+FAKE_EMBEDDING_SIZE = int(os.getenv("FAKE_EMBEDDING_SIZE", "256"))
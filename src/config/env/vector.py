@@ -5,5 +5,15 @@ MILVUS_URI = os.getenv("MILVUS_URI")
 MILVUS_USERNAME = os.getenv("MILVUS_USERNAME")
 MILVUS_PASSWORD = os.getenv("MILVUS_PASSWORD")
 MILVUS_COLLECTION = os.getenv("MILVUS_COLLECTION", "lia")
+# `milvus` or `memory` (in-process store, e.g. for offline benchmarks)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "milvus").lower()
 
 RAG_AVAILABLE = os.getenv("RAG_AVAILABLE", "True") == "true"
+
+# Retention of `rag_data` messages once the turn that produced them ends.
+# `keep` leaves them untouched, `stub` replaces them with a short citation and
+# `drop` removes them from the thread history.
+RAG_DATA_RETENTION = os.getenv("RAG_DATA_RETENTION", "keep").lower()
+# Number of further turns a `rag_data` message is kept verbatim before the
+# retention policy is applied to it.
+RAG_DATA_RETENTION_TURNS = int(os.getenv("RAG_DATA_RETENTION_TURNS", "0"))
@@ -0,0 +1,66 @@
+import asyncio
+import math
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from langchain_core.runnables import RunnableConfig
+
+# Key of the absolute deadline (epoch seconds) in the config's `configurable`
+DEADLINE_KEY = "deadline"
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed while waiting on an LLM call."""
+
+
+def with_deadline(config: RunnableConfig, timeout: float | None) -> RunnableConfig:
+    """`config` carrying a deadline `timeout` seconds from now, if any."""
+    if not timeout or timeout <= 0:
+        return config
+    configurable = {
+        **config.get("configurable", {}),
+        DEADLINE_KEY: time.time() + timeout,
+    }
+    return {**config, "configurable": configurable}
+
+
+def remaining_time(config: RunnableConfig | None) -> float | None:
+    """Seconds left before the deadline (negative once passed), `None` without one."""
+    deadline = (config or {}).get("configurable", {}).get(DEADLINE_KEY)
+    if deadline is None:
+        return None
+    return float(deadline) - time.time()
+
+
+def call_timeout(config: RunnableConfig | None) -> int:
+    """Seconds left before the deadline as an LLM client timeout, 0 without one."""
+    remaining = remaining_time(config)
+    if remaining is None:
+        return 0
+    return max(math.ceil(remaining), 1)
+
+
+def deadline_passed(config: RunnableConfig | None) -> bool:
+    remaining = remaining_time(config)
+    return remaining is not None and remaining <= 0
+
+
+def deadline_within(config: RunnableConfig | None, seconds: float) -> bool:
+    """Whether the deadline falls within the next `seconds`."""
+    remaining = remaining_time(config)
+    return remaining is not None and remaining < seconds
+
+
+@asynccontextmanager
+async def within_deadline(config: RunnableConfig | None) -> AsyncIterator[None]:
+    """Cancel the block when the deadline passes, raising `DeadlineExceeded`."""
+    remaining = remaining_time(config)
+    timeout = asyncio.timeout(None if remaining is None else max(remaining, 0))
+    try:
+        async with timeout:
+            yield
+    except TimeoutError as e:
+        if timeout.expired():
+            raise DeadlineExceeded("The request deadline passed.") from e
+        raise
@@ -2,16 +2,15 @@ import logging
 import os
 from typing import Any
 
-from fastapi import WebSocket
 from langchain.llms.base import BaseLLM
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableConfig, RunnableSerializable
 
-from src.common import normalize_delta
+from src.admission import AdmissionController, admission_controller
+from src.common import estimate_tokens, normalize_delta
 from src.config import env
 from src.config.env.llm import PARALLEL_GENERATION
+from src.deadline import within_deadline
 from src.evaluate_tools.model import ToolConfig
 from src.evaluate_tools.model.tool_config import (
     ToolConfigWebSocketResponse,
@@ -19,8 +18,11 @@ from src.evaluate_tools.model.tool_config import (
     ToolConfigWithResponse,
     ToolConfigWithResponseWithoutRAG,
 )
+from src.frame_sink import BufferedSink, FrameSink
 from src.generate_response.model.response import WebSocketData
-from src.llm.service import load_model
+from src.llm.service import DeadlineChains, load_chain, load_model
+from src.token_usage import TokenUsage, with_usage
+from src.transcript import render_transcript
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -30,9 +32,9 @@ logging.basicConfig(
 
 
 class EvaluateTools:
-    model: BaseLLM | BaseChatModel
     prompt: str
-    chain: RunnableSerializable
+    chains: DeadlineChains
+    admission: AdmissionController
     output_class = ToolConfig
 
     def __init__(self):
@@ -44,41 +46,58 @@ class EvaluateTools:
             )
         elif not env.RAG_AVAILABLE:
             self.output_class = ToolConfigWithoutRAG
-        self.model = load_model(
-            env.TOOL_EVALUATOR_LLM_PROVIDER,
+        self.admission = admission_controller(
+            env.TOOL_EVALUATOR_LLM_PROVIDER.value,
             env.TOOL_EVALUATOR_LLM_MODEL_NAME,
-            env.TOOL_EVALUATOR_LLM_API_KEY,
-            model_stop=env.TOOL_EVALUATOR_LLM_STOP,
-            model_temperature=env.TOOL_EVALUATOR_LLM_TEMPERATURE,
-            **env.TOOL_EVALUATOR_LLM_KWARGS,
+            env.TOOL_EVALUATOR_LLM_REQUESTS_PER_MINUTE,
+            env.TOOL_EVALUATOR_LLM_TOKENS_PER_MINUTE,
         )
         self.prompt = self._load_prompt()
-        self.chain = self._load_chain()
+        self.chains = DeadlineChains(self._load_chain)
 
-    def decide_next_step(
+    async def decide_next_step(
         self,
         config: RunnableConfig | None = None,
         query: list | None = None,
+        usage: TokenUsage | None = None,
+        force_end: bool = False,
     ) -> (
         ToolConfig
         | ToolConfigWithResponse
         | ToolConfigWithoutRAG
         | ToolConfigWithResponseWithoutRAG
     ):
-        response = self.chain.invoke(
-            {
-                "query": query,
-            },
-            config=config,
-        )
+        """
+        With `force_end` (parallel generation only), the decision is taken as
+        the final answer whatever tool it picked.
+
+        Raises `DeadlineExceeded` when the request deadline in `config` passes
+        and `Overloaded` when the model admits no more calls.
+        """
+        prompt = render_transcript(query)
+        async with (
+            within_deadline(config),
+            self.admission.admit(estimate_tokens(prompt), usage),
+        ):
+            chain = self.chains.for_config(config)
+            response = await with_usage(chain, usage).ainvoke(
+                {
+                    "query": prompt,
+                },
+                config=config,
+            )
+        if force_end:
+            response = {**response, "tool": "end"}
 
         return self.output_class.model_validate(response)
 
-    async def stream_next_step_via_websocket(
+    async def stream_next_step(
         self,
-        websocket: WebSocket,
+        sink: FrameSink,
         config: RunnableConfig | None = None,
         query: list | None = None,
+        usage: TokenUsage | None = None,
+        force_end: bool = False,
     ) -> (
         ToolConfig
         | ToolConfigWithResponse
@@ -86,40 +105,53 @@ class EvaluateTools:
         | ToolConfigWithResponseWithoutRAG
     ):
         """
-        Streams LLM response deltas and final message via websocket.
+        Streams LLM response deltas and final message to `sink`.
+
+        Raises `DeadlineExceeded` when the request deadline in `config` passes
+        and `Overloaded` when the model admits no more calls.
         """
 
         # Accumulate a sensible "final" shape; adjust keys as your client expects
         final_data: dict[str, Any] = {"response": ""}
 
-        # Stream deltas
-        async for delta in self.chain.astream({"query": query}, config=config):
-            payload = normalize_delta(delta)
-
-            # Merge text if present; otherwise just include the latest fields
-            txt = payload.get("text")
-            if isinstance(txt, str):
-                final_data["response"] = txt
-            else:
-                # Non-text fields—up to you how to merge; here we keep latest
-                for k, v in payload.items():
-                    if k != "text":
-                        final_data[k] = v
-
-            # Send the delta frame as JSON (DICT) — not a JSON string
-            tool_config = ToolConfigWebSocketResponse(
-                type=WebSocketData.delta, data=payload
-            )
-            json_dump = tool_config.model_dump(mode="json")
-            await websocket.send_json(json_dump)
-
-        # Send the final frame with the accumulated data
-        final_tool_config = ToolConfigWithResponse.model_validate(final_data)
-        if final_tool_config.tool == "end":
-            final_msg = ToolConfigWebSocketResponse(
-                type=WebSocketData.final, data=final_tool_config
-            )
-            await websocket.send_json(final_msg.model_dump(mode="json"))
+        # Deltas are batched and sent by a writer task (see `BufferedSink`)
+        async with BufferedSink(sink) as frames:
+            # Stream deltas
+            prompt = render_transcript(query)
+            async with (
+                within_deadline(config),
+                self.admission.admit(estimate_tokens(prompt), usage),
+            ):
+                chain = self.chains.for_config(config)
+                async for delta in with_usage(chain, usage).astream(
+                    {"query": prompt}, config=config
+                ):
+                    payload = normalize_delta(delta)
+
+                    # Merge text if present; otherwise just include the latest fields
+                    txt = payload.get("text")
+                    if isinstance(txt, str):
+                        final_data["response"] = txt
+                    else:
+                        # Non-text fields—up to you how to merge; here we keep latest
+                        for k, v in payload.items():
+                            if k != "text":
+                                final_data[k] = v
+
+                    # A plain dict: no model per delta, the writer encodes it
+                    await frames.send_json(
+                        {"type": WebSocketData.delta.value, "data": payload}
+                    )
+
+            # Send the final frame with the accumulated data
+            if force_end:
+                final_data["tool"] = "end"
+            final_tool_config = self.output_class.model_validate(final_data)
+            if final_tool_config.tool == "end":
+                final_msg = ToolConfigWebSocketResponse(
+                    type=WebSocketData.final, data=final_tool_config
+                )
+                await frames.send_json(final_msg.model_dump(mode="json"))
 
         # Return an API response validated from the final accumulated data
         return final_tool_config
@@ -144,15 +176,21 @@ class EvaluateTools:
                 f"Neither prompts/evaluate_tools.md nor prompts/${fallback_file} found."
             )
 
-    def _load_chain(self):
-        parser = JsonOutputParser(pydantic_object=self.output_class)
-        prompt = PromptTemplate(
-            template=f"{self.prompt}",
-            input_variables=[
-                "query",
-            ],
-            output_parser=parser,
-            partial_variables={"format_instructions": parser.get_format_instructions()},
+    def _load_model(self, timeout: int) -> BaseLLM | BaseChatModel:
+        return load_model(
+            env.TOOL_EVALUATOR_LLM_PROVIDER,
+            env.TOOL_EVALUATOR_LLM_MODEL_NAME,
+            env.TOOL_EVALUATOR_LLM_API_KEY,
+            model_stop=env.TOOL_EVALUATOR_LLM_STOP,
+            model_temperature=env.TOOL_EVALUATOR_LLM_TEMPERATURE,
+            model_timeout=timeout,
+            **env.TOOL_EVALUATOR_LLM_KWARGS,
+        )
+
+    def _load_chain(self, timeout: int) -> RunnableSerializable:
+        return load_chain(
+            self.prompt,
+            self._load_model(timeout),
+            env.TOOL_EVALUATOR_LLM_PROVIDER,
+            self.output_class,
         )
-        chain = prompt | self.model | parser
-        return chain
@@ -0,0 +1,344 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from types import TracebackType
+from typing import Any, Protocol
+from uuid import UUID
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+
+from src.common import graph_node
+from src.config import env
+from src.metrics.main import (
+    STREAM_DELTAS_SKIPPED,
+    STREAM_FRAMES,
+    chat_interface_label,
+    observe_first_delta,
+)
+
+# Key of the run's frame sink in the config's `configurable`
+FRAME_SINK_KEY = "sink"
+
+
+class FrameSink(Protocol):
+    """Where a streaming run sends its frames: a websocket or any stand-in."""
+
+    async def send_json(self, data: Any) -> None: ...
+
+
+def frame_sink(config: RunnableConfig | None) -> FrameSink | None:
+    return (config or {}).get("configurable", {}).get(FRAME_SINK_KEY)
+
+
+def encode_frame(frame: Any) -> str:
+    return orjson.dumps(frame).decode()
+
+
+class SlowConsumer(WebSocketDisconnect):
+    """The client did not read the frames of its answer in time."""
+
+
+class BufferedSink:
+    """
+    Sends the frames of one streamed answer to `sink` from a writer task, so
+    the generation loop does not wait on the client.
+
+    Deltas are cumulative (each carries the whole answer so far), so only the
+    latest pending one is kept: it is sent `window` seconds after the previous
+    delta, or sooner once its text grew by `max_chars`. A slow client gets
+    fewer, larger deltas, never stale ones. Other frames are all sent, in
+    order; with `max_frames` of them queued the run waits for the client, and
+    after `timeout` seconds gives up on it with `SlowConsumer`.
+
+    Leaving the block sends what is pending (a `final` frame supersedes the
+    pending delta) and waits for the writer.
+    """
+
+    def __init__(
+        self,
+        sink: FrameSink,
+        window: float | None = None,
+        max_chars: int | None = None,
+        max_frames: int | None = None,
+        timeout: float | None = None,
+    ):
+        self.sink = sink
+        self.window = env.STREAM_DELTA_WINDOW if window is None else window
+        self.max_chars = max_chars or env.STREAM_DELTA_MAX_CHARS
+        self.max_frames = max_frames or env.STREAM_MAX_QUEUED_FRAMES
+        self.timeout = env.STREAM_SLOW_CLIENT_TIMEOUT if timeout is None else timeout
+        self._frames: deque[dict[str, Any]] = deque()
+        self._delta: dict[str, Any] | None = None
+        # Text size and time of the last delta sent
+        self._sent_size = 0
+        self._sent_at = 0.0
+        self._closed = False
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._writer: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "BufferedSink":
+        self._writer = asyncio.create_task(self._write())
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        assert self._writer is not None
+        if exc_type is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            return
+
+        self._closed = True
+        if self._delta is not None:
+            self._frames.append(self._delta)
+            self._delta = None
+        self._wakeup.set()
+        try:
+            async with asyncio.timeout(self.timeout or None):
+                await self._writer
+        except TimeoutError as e:
+            raise SlowConsumer(1008, "Client too slow to read its answer.") from e
+
+    async def send_json(self, data: Any) -> None:
+        self._raise_if_writer_failed()
+        kind = data.get("type") if isinstance(data, dict) else None
+        if kind == "delta":
+            if self._delta is not None:
+                STREAM_DELTAS_SKIPPED.labels(chat_interface_label()).inc()
+            # Wake the writer to time the first pending delta, or for a big one
+            grown = self._delta is None or (
+                _text_size(data) - self._sent_size >= self.max_chars
+            )
+            if grown:
+                self._wakeup.set()
+            self._delta = data
+            return
+
+        if self._delta is not None:
+            if kind == "final":
+                STREAM_DELTAS_SKIPPED.labels(chat_interface_label()).inc()
+            else:
+                self._frames.append(self._delta)
+            self._delta = None
+        await self._wait_for_space()
+        self._frames.append(data)
+        self._wakeup.set()
+
+    # ---------- internal helpers ---------- #
+    async def _wait_for_space(self) -> None:
+        try:
+            async with asyncio.timeout(self.timeout or None):
+                while len(self._frames) >= self.max_frames:
+                    self._space.clear()
+                    await self._space.wait()
+                    self._raise_if_writer_failed()
+        except TimeoutError as e:
+            raise SlowConsumer(1008, "Client too slow to read its answer.") from e
+
+    def _raise_if_writer_failed(self) -> None:
+        # The client went away: surface it to the run
+        if self._writer is not None and self._writer.done():
+            self._writer.result()
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                if self._frames:
+                    frame = self._frames.popleft()
+                    self._space.set()
+                elif self._delta is not None and self._delta_wait() <= 0:
+                    frame, self._delta = self._delta, None
+                    self._sent_size = _text_size(frame)
+                    self._sent_at = time.monotonic()
+                elif self._closed:
+                    return
+                else:
+                    self._wakeup.clear()
+                    wait = self._delta_wait() if self._delta is not None else None
+                    try:
+                        async with asyncio.timeout(wait):
+                            await self._wakeup.wait()
+                    except TimeoutError:
+                        pass
+                    continue
+                await self._send(frame)
+        finally:
+            # Unblock a run waiting for space after the writer failed
+            self._space.set()
+
+    def _delta_wait(self) -> float:
+        assert self._delta is not None
+        if _text_size(self._delta) - self._sent_size >= self.max_chars:
+            return 0
+        return self._sent_at + self.window - time.monotonic()
+
+    async def _send(self, frame: dict[str, Any]) -> None:
+        if isinstance(self.sink, WebSocket):
+            await self.sink.send_text(encode_frame(frame))
+        else:
+            await self.sink.send_json(frame)
+        kind = str(frame.get("type", "unknown"))
+        STREAM_FRAMES.labels(kind, chat_interface_label()).inc()
+        if kind == "delta":
+            observe_first_delta()
+
+
+def _text_size(frame: dict[str, Any]) -> int:
+    data = frame.get("data")
+    if not isinstance(data, dict):
+        return 0
+    return sum(len(v) for v in data.values() if isinstance(v, str))
+
+
+class QueueSink:
+    """
+    Queues the frames of a run for a transport reading them on the event
+    loop it was created on. `send_nowait` may be called from any thread.
+
+    Like `BufferedSink`, a queued delta not read yet is replaced by the next
+    delta (or dropped for the `final` frame), and with `max_frames` queued the
+    run waits for the reader, giving up on it after `timeout` seconds with
+    `SlowConsumer`. Frames from `send_nowait` cannot wait: they are queued past
+    the bound, unless the reader took nothing for `timeout` seconds, which
+    gives up on it too. Once given up on, `frames` raises `SlowConsumer`.
+    """
+
+    def __init__(self, max_frames: int | None = None, timeout: float | None = None):
+        self.max_frames = max_frames or env.STREAM_MAX_QUEUED_FRAMES
+        self.timeout = env.STREAM_SLOW_CLIENT_TIMEOUT if timeout is None else timeout
+        self._frames: deque[dict[str, Any]] = deque()
+        self._closed = False
+        self._failed = False
+        # Time the reader last took a frame, or found none to take
+        self._read_at = time.monotonic()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+    async def send_json(self, data: Any) -> None:
+        self._raise_if_failed()
+        if self._conflate(data):
+            return
+        try:
+            async with asyncio.timeout(self.timeout or None):
+                while len(self._frames) >= self.max_frames:
+                    self._space.clear()
+                    await self._space.wait()
+                    self._raise_if_failed()
+        except TimeoutError as e:
+            self._fail()
+            raise SlowConsumer(1008, "Client too slow to read its answer.") from e
+        self._put(data)
+
+    def send_nowait(self, data: dict[str, Any]) -> None:
+        self._loop.call_soon_threadsafe(self._put_nowait, data)
+
+    def close(self) -> None:
+        """End `frames` after the frames sent so far."""
+        self._loop.call_soon_threadsafe(self._close)
+
+    async def frames(self) -> AsyncIterator[dict[str, Any]]:
+        while True:
+            self._raise_if_failed()
+            if self._frames:
+                frame = self._frames.popleft()
+                self._read_at = time.monotonic()
+                self._space.set()
+                yield frame
+            elif self._closed:
+                return
+            else:
+                self._ready.clear()
+                await self._ready.wait()
+
+    # ---------- internal helpers ---------- #
+    def _conflate(self, data: Any) -> bool:
+        """Replace the delta queued last with `data`, if it supersedes it."""
+        kind = data.get("type") if isinstance(data, dict) else None
+        if kind not in ("delta", "final"):
+            return False
+        if not self._frames or self._frames[-1].get("type") != "delta":
+            return False
+        STREAM_DELTAS_SKIPPED.labels(chat_interface_label()).inc()
+        self._frames[-1] = data
+        return True
+
+    def _put(self, data: dict[str, Any]) -> None:
+        if not self._frames:
+            self._read_at = time.monotonic()
+        self._frames.append(data)
+        self._ready.set()
+
+    def _put_nowait(self, data: dict[str, Any]) -> None:
+        if self._failed:
+            return
+        stalled = time.monotonic() - self._read_at >= self.timeout > 0
+        if len(self._frames) >= self.max_frames and stalled:
+            self._fail()
+            return
+        self._put(data)
+
+    def _close(self) -> None:
+        self._closed = True
+        self._ready.set()
+
+    def _fail(self) -> None:
+        # Pending frames are dropped: the reader gets the failure next
+        self._failed = True
+        self._frames.clear()
+        self._ready.set()
+        self._space.set()
+
+    def _raise_if_failed(self) -> None:
+        if self._failed:
+            raise SlowConsumer(1008, "Client too slow to read its answer.")
+
+
+class ProgressCallbackHandler(BaseCallbackHandler):
+    """Sends a `progress` frame when each graph node of the run starts and ends."""
+
+    run_inline = True
+
+    def __init__(self, sink: QueueSink) -> None:
+        self.sink = sink
+        self._nodes: dict[UUID, str] = {}
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        node = graph_node(metadata, kwargs)
+        if node is not None:
+            self._nodes[run_id] = node
+            self._send(node, "start")
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        node = self._nodes.pop(run_id, None)
+        if node is not None:
+            self._send(node, "end")
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        node = self._nodes.pop(run_id, None)
+        if node is not None:
+            self._send(node, "error")
+
+    def _send(self, node: str, status: str) -> None:
+        self.sink.send_nowait(
+            {"type": "progress", "data": {"node": node, "status": status}}
+        )
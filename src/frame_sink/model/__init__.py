@@ -0,0 +1 @@
+from .stream_error import *
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class StreamError(BaseModel):
+    """Data of the frame ending a streamed answer that failed."""
+
+    status_code: int = Field(description="HTTP status code matching the failure.")
+    detail: str = Field(description="What went wrong.")
@@ -1,21 +1,23 @@
 import logging
 from typing import Any
 
-from fastapi.websockets import WebSocket
 from langchain.llms.base import BaseLLM
 from langchain_core.language_models import BaseChatModel
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableConfig, RunnableSerializable
 
-from src.common import normalize_delta
+from src.admission import AdmissionController, admission_controller
+from src.common import estimate_tokens, normalize_delta
 from src.config import env
+from src.deadline import DeadlineExceeded, within_deadline
+from src.frame_sink import BufferedSink, FrameSink
 from src.generate_response.model.response import (
     LLMAPIResponse,
     LLMWebSocketResponse,
     WebSocketData,
 )
-from src.llm.service import load_model
+from src.llm.service import DeadlineChains, load_chain, load_model
+from src.token_usage import TokenUsage, with_usage
+from src.transcript import render_transcript
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -25,89 +27,123 @@ logging.basicConfig(
 
 
 class ResponseGenerator:
-    model: BaseLLM | BaseChatModel
-    chain: RunnableSerializable
+    chains: DeadlineChains
     whatsapp_chain: RunnableSerializable
+    admission: AdmissionController
 
     def __init__(self):
-        self.model = load_model(
-            env.LLM_PROVIDER,
+        self.admission = admission_controller(
+            env.LLM_PROVIDER.value,
             env.LLM_MODEL_NAME,
-            env.LLM_API_KEY,
-            model_stop=env.LLM_STOP,
-            model_temperature=env.LLM_TEMPERATURE,
-            **env.LLM_KWARGS,
+            env.LLM_REQUESTS_PER_MINUTE,
+            env.LLM_TOKENS_PER_MINUTE,
         )
-        self.chain = self._load_chain()
+        self.chains = DeadlineChains(self._load_chain)
 
-    def generate_response(
+    async def generate_response(
         self,
         # data: Any,
         config: RunnableConfig | None = None,
         query: list | None = None,
+        usage: TokenUsage | None = None,
     ) -> LLMAPIResponse:
-        response = self.chain.invoke(
-            {
-                "query": query,
-            },
-            config=config,
-        )
+        """
+        Raises `DeadlineExceeded` when the request deadline in `config` passes
+        and `Overloaded` when the model admits no more calls.
+        """
+        prompt = render_transcript(query)
+        async with (
+            within_deadline(config),
+            self.admission.admit(estimate_tokens(prompt), usage),
+        ):
+            chain = self.chains.for_config(config)
+            response = await with_usage(chain, usage).ainvoke(
+                {
+                    "query": prompt,
+                },
+                config=config,
+            )
         return LLMAPIResponse.model_validate(response)
 
-    async def generate_websocket_response(
+    async def stream_response(
         self,
-        websocket: WebSocket,
+        sink: FrameSink,
         config: RunnableConfig | None = None,
         query: list | None = None,
+        usage: TokenUsage | None = None,
     ) -> LLMAPIResponse:
         """
-        Streams LLM response deltas and final message via websocket.
+        Streams LLM response deltas and final message to `sink`.
+
+        When the request deadline in `config` passes mid-answer, the text
+        streamed so far is sent as the final answer; with no text yet,
+        `DeadlineExceeded` is raised. Raises `Overloaded` when the model admits
+        no more calls.
         """
 
         # Accumulate a sensible "final" shape; adjust keys as your client expects
         final_data: dict[str, Any] = {"response": ""}
 
-        # Stream deltas
-        async for delta in self.chain.astream({"query": query}, config=config):
-            payload = normalize_delta(delta)
-
-            # Merge text if present; otherwise just include the latest fields
-            txt = payload.get("text")
-            if isinstance(txt, str):
-                final_data["response"] = txt
-            else:
-                # Non-text fields—up to you how to merge; here we keep latest
-                for k, v in payload.items():
-                    if k != "text":
-                        final_data[k] = v
-
-            # Send the delta frame as JSON (DICT) — not a JSON string
-            json_dump = LLMWebSocketResponse(
-                type=WebSocketData.delta, data=payload
-            ).model_dump(mode="json")
-            await websocket.send_json(json_dump)
-
-        # Send the final frame with the accumulated data
-        final_msg = LLMWebSocketResponse(type=WebSocketData.final, data=final_data)
-        await websocket.send_json(final_msg.model_dump(mode="json"))
+        # Deltas are batched and sent by a writer task (see `BufferedSink`)
+        async with BufferedSink(sink) as frames:
+            # Stream deltas
+            try:
+                prompt = render_transcript(query)
+                async with (
+                    within_deadline(config),
+                    self.admission.admit(estimate_tokens(prompt), usage),
+                ):
+                    chain = self.chains.for_config(config)
+                    async for delta in with_usage(chain, usage).astream(
+                        {"query": prompt}, config=config
+                    ):
+                        payload = normalize_delta(delta)
+
+                        # Merge text if present; otherwise just include the latest fields
+                        txt = payload.get("text")
+                        if isinstance(txt, str):
+                            final_data["response"] = txt
+                        else:
+                            # Non-text fields—up to you how to merge; here we keep latest
+                            for k, v in payload.items():
+                                if k != "text":
+                                    final_data[k] = v
+
+                        # A plain dict: no model per delta, the writer encodes it
+                        await frames.send_json(
+                            {"type": WebSocketData.delta.value, "data": payload}
+                        )
+            except DeadlineExceeded:
+                if not final_data["response"]:
+                    raise
+                logger.warning("Request deadline passed; sending the partial answer.")
+
+            # Send the final frame with the accumulated data
+            final_msg = LLMWebSocketResponse(type=WebSocketData.final, data=final_data)
+            await frames.send_json(final_msg.model_dump(mode="json"))
 
         # Return an API response validated from the final accumulated data
         return LLMAPIResponse.model_validate(final_data)
 
-    def _load_chain(self):
-        parser = JsonOutputParser(pydantic_object=LLMAPIResponse)
-        prompt = PromptTemplate(
-            template="""Based on the chat history
+    def _load_model(self, timeout: int) -> BaseLLM | BaseChatModel:
+        return load_model(
+            env.LLM_PROVIDER,
+            env.LLM_MODEL_NAME,
+            env.LLM_API_KEY,
+            model_stop=env.LLM_STOP,
+            model_temperature=env.LLM_TEMPERATURE,
+            model_timeout=timeout,
+            **env.LLM_KWARGS,
+        )
+
+    def _load_chain(self, timeout: int) -> RunnableSerializable:
+        return load_chain(
+            """Based on the chat history
 {query}
 generate a response to the user considering the data retrieved from the tools.
 
 {format_instructions}""",
-            input_variables=[
-                "query",
-                # "data",
-            ],
-            output_parser=parser,
-            partial_variables={"format_instructions": parser.get_format_instructions()},
+            self._load_model(timeout),
+            env.LLM_PROVIDER,
+            LLMAPIResponse,
         )
-        chain = prompt | self.model | parser
-        return chain
@@ -0,0 +1,2 @@
+from .fake_chat_model import *
+from .cassette_chat_model import *
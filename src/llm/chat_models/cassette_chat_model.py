@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from langchain.llms.base import BaseLLM
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import (
+    agenerate_from_stream,
+    generate_from_stream,
+)
+from langchain_core.messages import AIMessageChunk, BaseMessage, get_buffer_string
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from src.cassette.main import Cassette
+from src.cassette.model.cassette_entry import CassetteCall, CassetteChunk
+from src.cassette.model.cassette_mode import CassetteMode
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Records the calls of the wrapped model to a cassette, or replays them.
+
+    Every call goes through streaming, so the recording keeps each chunk and
+    its offset from the start of the call; non-streaming calls are the merged
+    stream. In replay mode `model` is not needed and no provider is contacted.
+    """
+
+    model: BaseLLM | BaseChatModel | None = None
+    model_name: str
+    cassette: Cassette
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name, "mode": self.cassette.mode.value}
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(
+            self._astream(messages, stop, run_manager, **kwargs)
+        )
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = get_buffer_string(messages)
+        key = Cassette.key(self.model_name, prompt)
+
+        if self.cassette.mode == CassetteMode.replay:
+            elapsed = 0.0
+            for recorded in self.cassette.lookup(key).chunks:
+                if self.cassette.emulate_timing:
+                    time.sleep(max(recorded.offset - elapsed, 0))
+                    elapsed = recorded.offset
+                chunk = self._generation_chunk(recorded)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            return
+
+        started = time.perf_counter()
+        recorded_chunks: list[CassetteChunk] = []
+        for raw in self._wrapped().stream(messages, stop=stop, **kwargs):
+            recorded = self._cassette_chunk(raw, time.perf_counter() - started)
+            recorded_chunks.append(recorded)
+            chunk = self._generation_chunk(recorded)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        self._record(key, prompt, recorded_chunks, run_manager)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = get_buffer_string(messages)
+        key = Cassette.key(self.model_name, prompt)
+
+        if self.cassette.mode == CassetteMode.replay:
+            elapsed = 0.0
+            for recorded in self.cassette.lookup(key).chunks:
+                if self.cassette.emulate_timing:
+                    await asyncio.sleep(max(recorded.offset - elapsed, 0))
+                    elapsed = recorded.offset
+                chunk = self._generation_chunk(recorded)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            return
+
+        started = time.perf_counter()
+        recorded_chunks: list[CassetteChunk] = []
+        async for raw in self._wrapped().astream(messages, stop=stop, **kwargs):
+            recorded = self._cassette_chunk(raw, time.perf_counter() - started)
+            recorded_chunks.append(recorded)
+            chunk = self._generation_chunk(recorded)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        self._record(key, prompt, recorded_chunks, run_manager)
+
+    # ---------- internal helpers ---------- #
+    def _wrapped(self) -> BaseLLM | BaseChatModel:
+        if self.model is None:
+            raise ValueError(
+                f"Cassette for {self.model_name} has no model to record from."
+            )
+        return self.model
+
+    def _cassette_chunk(self, raw: Any, offset: float) -> CassetteChunk:
+        # Chat models stream message chunks, completion models plain strings
+        if isinstance(raw, AIMessageChunk):
+            return CassetteChunk(
+                content=raw.content,
+                offset=offset,
+                usage_metadata=dict(raw.usage_metadata) if raw.usage_metadata else None,
+            )
+        return CassetteChunk(content=str(raw), offset=offset)
+
+    def _generation_chunk(self, recorded: CassetteChunk) -> ChatGenerationChunk:
+        return ChatGenerationChunk(
+            message=AIMessageChunk(
+                content=recorded.content,
+                usage_metadata=recorded.usage_metadata,  # type: ignore[arg-type]
+            )
+        )
+
+    def _record(
+        self,
+        key: str,
+        prompt: str,
+        chunks: list[CassetteChunk],
+        run_manager: CallbackManagerForLLMRun | AsyncCallbackManagerForLLMRun | None,
+    ) -> None:
+        if self.cassette.mode != CassetteMode.record:
+            return
+        # LangGraph copies the thread id from the configurable into the metadata
+        metadata = run_manager.metadata if run_manager else {}
+        thread_id = metadata.get("thread_id")
+        self.cassette.record_call(
+            CassetteCall(
+                key=key,
+                model=self.model_name,
+                prompt=prompt,
+                chunks=chunks,
+                thread_id=str(thread_id) if thread_id is not None else None,
+            )
+        )
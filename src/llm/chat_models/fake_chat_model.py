@@ -0,0 +1,181 @@
+import asyncio
+import json
+import re
+import time
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.common import estimate_tokens
+
+# JsonOutputParser format instructions end with the schema in a fenced block
+_SCHEMA_PATTERN = re.compile(r"output schema[^`]*```\s*(\{.*?\})\s*```", re.DOTALL)
+# Tools that end the evaluator loop, in order of preference
+_TERMINAL_TOOLS = ("generate_response", "end")
+# Size of the streamed chunks, in characters (~1 token)
+_CHUNK_SIZE = 4
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model for benchmarks.
+
+    Replies with the smallest JSON instance of the schema found in the prompt's
+    format instructions, after `latency` seconds and streaming at
+    `tokens_per_second`. The evaluator picks a terminal tool, or `rag` once per
+    user message when `use_rag` is set.
+    """
+
+    model_name: str = "fake"
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    use_rag: bool = False
+    response_text: str = "This is a deterministic answer from the fake model."
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = self._prompt(messages)
+        reply = self._reply(prompt)
+        time.sleep(self._total_delay(reply))
+        return self._result(prompt, reply)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = self._prompt(messages)
+        reply = self._reply(prompt)
+        await asyncio.sleep(self._total_delay(reply))
+        return self._result(prompt, reply)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        reply = self._reply(prompt)
+        time.sleep(self.latency)
+        for chunk in self._chunks(prompt, reply):
+            time.sleep(self._token_delay())
+            if run_manager:
+                run_manager.on_llm_new_token(str(chunk.message.content), chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        reply = self._reply(prompt)
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(prompt, reply):
+            await asyncio.sleep(self._token_delay())
+            if run_manager:
+                await run_manager.on_llm_new_token(
+                    str(chunk.message.content), chunk=chunk
+                )
+            yield chunk
+
+    # ---------- internal helpers ---------- #
+    def _prompt(self, messages: list[BaseMessage]) -> str:
+        return "\n".join(
+            m.content if isinstance(m.content, str) else json.dumps(m.content)
+            for m in messages
+        )
+
+    def _reply(self, prompt: str) -> str:
+        match = _SCHEMA_PATTERN.search(prompt)
+        if match is None:
+            return json.dumps({"response": self.response_text})
+
+        properties = json.loads(match.group(1)).get("properties", {})
+        reply: dict[str, Any] = {}
+        for name, prop in properties.items():
+            choices = prop.get("enum") or ([prop["const"]] if "const" in prop else None)
+            if choices:
+                reply[name] = self._pick(choices, prompt)
+            else:
+                reply[name] = self.response_text
+        if "rag_query" in reply:
+            reply["rag_query"] = self._last_user_text(prompt) or self.response_text
+        return json.dumps(reply)
+
+    def _pick(self, choices: list[str], prompt: str) -> str:
+        if self.use_rag and "rag" in choices and self._awaits_retrieval(prompt):
+            return "rag"
+        for tool in _TERMINAL_TOOLS:
+            if tool in choices:
+                return tool
+        return choices[0]
+
+    def _awaits_retrieval(self, prompt: str) -> bool:
+        """Whether the last turn in the transcript is a user message."""
+        last_user = max(prompt.rfind("[user]"), prompt.rfind("HumanMessage("))
+        last_rag = max(prompt.rfind("[rag_data]"), prompt.rfind("'rag_data'"))
+        return last_user > last_rag
+
+    def _last_user_text(self, prompt: str) -> str:
+        idx = prompt.rfind("[user]")
+        if idx == -1:
+            return ""
+        return prompt[idx + len("[user]") :].split("\n", 1)[0].strip()
+
+    def _usage(self, prompt: str, reply: str) -> UsageMetadata:
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(reply)
+        return UsageMetadata(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+        )
+
+    def _result(self, prompt: str, reply: str) -> ChatResult:
+        message = AIMessage(content=reply, usage_metadata=self._usage(prompt, reply))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, prompt: str, reply: str) -> Iterator[ChatGenerationChunk]:
+        pieces = [
+            reply[i : i + _CHUNK_SIZE] for i in range(0, len(reply), _CHUNK_SIZE)
+        ]
+        for i, piece in enumerate(pieces):
+            usage = self._usage(prompt, reply) if i == len(pieces) - 1 else None
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=piece, usage_metadata=usage)
+            )
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+    def _total_delay(self, reply: str) -> float:
+        chunks = -(-len(reply) // _CHUNK_SIZE)
+        return self.latency + chunks * self._token_delay()
@@ -1 +1,2 @@
 from .llm_provider import *
+from .structured_output_mode import *
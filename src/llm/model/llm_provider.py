@@ -8,5 +8,6 @@ class LLMProvider(Enum):
     ollama = "ollama"
     gemini = "gemini"
     vertex = "vertex"
+    fake = "fake"  # Deterministic offline provider for benchmarks.
     # huggingface = "huggingface"
     # llamacpp = "llamacpp"
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class StructuredOutputMode(Enum):
+    parser = "parser"  # JSON schema in the prompt, parsed with `JsonOutputParser`.
+    native = "native"  # Provider structured output / tool calling (JSON mode on Ollama).
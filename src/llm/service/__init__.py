@@ -1,2 +1,4 @@
 from .load_model import *
 from .load_embedding import *
+from .load_chain import *
+from .deadline_chains import *
@@ -0,0 +1,27 @@
+from collections.abc import Callable
+from functools import lru_cache
+
+from langchain_core.runnables import RunnableConfig, RunnableSerializable
+
+from src.deadline import call_timeout
+
+
+class DeadlineChains:
+    """
+    A chain per LLM client timeout, so each provider call is cut off when its
+    request's deadline passes rather than at a fixed timeout.
+
+    `build` makes the chain for a timeout in whole seconds (0 = none); the
+    latest `maxsize` of them are kept. The chain without a timeout is built
+    right away, so a misconfigured model fails at startup.
+    """
+
+    def __init__(
+        self, build: Callable[[int], RunnableSerializable], maxsize: int = 32
+    ):
+        self._build = lru_cache(maxsize=maxsize)(build)
+        self._build(0)
+
+    def for_config(self, config: RunnableConfig | None) -> RunnableSerializable:
+        """The chain timing out at the deadline in `config`, if it has one."""
+        return self._build(call_timeout(config))
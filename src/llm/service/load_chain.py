@@ -0,0 +1,121 @@
+import logging
+
+from langchain.llms.base import BaseLLM
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnableSerializable
+from pydantic import BaseModel
+
+from src.common import estimate_tokens
+from src.config import env
+from src.llm.chat_models.cassette_chat_model import CassetteChatModel
+from src.llm.model.llm_provider import LLMProvider
+from src.llm.model.structured_output_mode import StructuredOutputMode
+from src.metrics.main import STRUCTURED_OUTPUT_FALLBACKS
+from src.repair_json.main import RepairingJsonOutputParser
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+# Replaces the JSON schema dump when the provider enforces the schema itself
+NATIVE_FORMAT_INSTRUCTIONS = "Reply only through the structured output you are given."
+
+
+def load_chain(
+    template: str,
+    model: BaseLLM | BaseChatModel,
+    provider: LLMProvider,
+    output_class: type[BaseModel],
+    mode: StructuredOutputMode | None = None,
+) -> RunnableSerializable:
+    """
+    Build `prompt | model | parser` for a template exposing `{query}` and
+    `{format_instructions}`.
+
+    In `native` mode chat models use provider structured output (tool calling
+    or JSON schema), so the schema dump is left out of the prompt, and fall back
+    to the parser chain if the native call fails. Ollama has no schema
+    enforcement, so it keeps the instructions and runs in JSON mode instead.
+    """
+    mode = mode or StructuredOutputMode(env.STRUCTURED_OUTPUT_MODE)
+
+    parser = RepairingJsonOutputParser(
+        pydantic_object=output_class, provider=provider.value
+    )
+    format_instructions = parser.get_format_instructions()
+    parser_chain = _load_prompt(template, format_instructions) | model | parser
+
+    if mode == StructuredOutputMode.parser:
+        return parser_chain
+
+    if provider == LLMProvider.ollama:
+        json_model = _json_mode(model)
+        logger.info(f"Using Ollama JSON mode for {output_class.__name__}.")
+        return _load_prompt(template, format_instructions) | json_model | parser
+
+    if not isinstance(model, BaseChatModel):
+        logger.warning(
+            f"{provider.value} has no native structured output; "
+            f"parsing {output_class.__name__} from the prompt instead."
+        )
+        return parser_chain
+
+    try:
+        # A JSON schema (not the class) keeps outputs as dicts, like the parser,
+        # and lets tool-calling providers stream partial objects.
+        structured_model = model.with_structured_output(
+            output_class.model_json_schema()
+        )
+    except NotImplementedError:
+        logger.warning(
+            f"{provider.value} does not support structured output; "
+            f"parsing {output_class.__name__} from the prompt instead."
+        )
+        return parser_chain
+
+    logger.info(
+        f"Using {provider.value} native structured output for "
+        f"{output_class.__name__} (~{estimate_tokens(format_instructions)} prompt "
+        f"tokens of format instructions saved per call)."
+    )
+    native_chain = _load_prompt(template, NATIVE_FORMAT_INSTRUCTIONS) | structured_model
+    return native_chain.with_fallbacks(
+        [_count_fallback(provider, output_class) | parser_chain]
+    )
+
+
+def _count_fallback(
+    provider: LLMProvider, output_class: type[BaseModel]
+) -> RunnableLambda:
+    """Passes the chain input through, counting the fallback to the parser chain."""
+
+    def count(inputs: dict) -> dict:
+        STRUCTURED_OUTPUT_FALLBACKS.labels(provider.value, output_class.__name__).inc()
+        logger.warning(
+            f"{provider.value} native structured output failed for "
+            f"{output_class.__name__}; falling back to the parser chain."
+        )
+        return inputs
+
+    return RunnableLambda(count)
+
+
+def _json_mode(model: BaseLLM | BaseChatModel) -> BaseLLM | BaseChatModel:
+    if isinstance(model, CassetteChatModel):
+        # Switch the recorded model; the cassette key only covers the prompt
+        inner = model.model and _json_mode(model.model)
+        return model.model_copy(update={"model": inner})
+    return model.model_copy(update={"format": "json"})
+
+
+def _load_prompt(template: str, format_instructions: str) -> PromptTemplate:
+    return PromptTemplate(
+        template=template,
+        input_variables=[
+            "query",
+        ],
+        partial_variables={"format_instructions": format_instructions},
+    )
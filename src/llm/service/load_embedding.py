@@ -2,11 +2,12 @@ from langchain_community.embeddings import (
     CohereEmbeddings,
     OllamaEmbeddings,
 )
-from langchain_core.embeddings import Embeddings
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_openai import OpenAIEmbeddings
 from pydantic import SecretStr
 
+from src.config import env
 from src.llm.model import LLMProvider
 
 
@@ -32,6 +33,8 @@ def load_embedding(
             return GoogleGenerativeAIEmbeddings(
                 google_api_key=api_key, model=model_name
             )
+        case LLMProvider.fake:
+            return DeterministicFakeEmbedding(size=env.FAKE_EMBEDDING_SIZE)
         # case LLMProvider.huggingface:
         #     return HuggingFaceHub
         #
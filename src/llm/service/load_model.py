@@ -8,7 +8,11 @@ from langchain_ollama import OllamaLLM
 from langchain_openai import ChatOpenAI
 from pydantic import SecretStr
 
+from src.cassette.main import cassette
+from src.cassette.model.cassette_mode import CassetteMode
 from src.config import env
+from src.llm.chat_models.cassette_chat_model import CassetteChatModel
+from src.llm.chat_models.fake_chat_model import FakeChatModel
 from src.llm.model.llm_provider import LLMProvider
 
 
@@ -20,6 +24,48 @@ def load_model(
     model_timeout: int = 0,
     model_stop: list[str] | None = None,
     **kwargs,  # Add this line to accept additional keyword arguments
+) -> BaseLLM | BaseChatModel:
+    """
+    Load the provider's model, wrapped in the LLM cassette when recording or
+    replaying (see `LLM_CASSETTE_MODE`).
+    """
+    if cassette.mode == CassetteMode.off:
+        return _load_provider_model(
+            provider,
+            model_name,
+            api_key,
+            model_temperature,
+            model_timeout,
+            model_stop,
+            **kwargs,
+        )
+
+    model = None
+    if cassette.mode == CassetteMode.record:
+        model = _load_provider_model(
+            provider,
+            model_name,
+            api_key,
+            model_temperature,
+            model_timeout,
+            model_stop,
+            **kwargs,
+        )
+    return CassetteChatModel(
+        model=model,
+        model_name=f"{provider.value}/{model_name}",
+        cassette=cassette,
+    )
+
+
+def _load_provider_model(
+    provider: LLMProvider,
+    model_name: str,
+    api_key: SecretStr,
+    model_temperature: float,
+    model_timeout: int,
+    model_stop: list[str] | None,
+    **kwargs,
 ) -> BaseLLM | BaseChatModel:
     match provider:
         case LLMProvider.openai:
@@ -75,6 +121,15 @@ def load_model(
                 **kwargs,  # Pass kwargs to the VertexAI constructor
             )
 
+        case LLMProvider.fake:
+            return FakeChatModel(
+                model_name=model_name,
+                latency=env.FAKE_LLM_LATENCY,
+                tokens_per_second=env.FAKE_LLM_TOKENS_PER_SECOND,
+                use_rag=env.FAKE_LLM_USE_RAG,
+                **kwargs,
+            )
+
         # case LLMProvider.huggingface:
         #     return HuggingFaceHub(
         #         repo_id=model_name,
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from collections.abc import Callable
+from pathlib import Path
+
+from src.config import env
+from src.loop_monitor.model.loop_stall import LoopStall
+from src.metrics.main import LOOP_LAG, LOOP_STALL_DURATION, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+_SRC_DIR = Path(__file__).resolve().parents[1]
+_WORKFLOW_FILE = str(_SRC_DIR / "agent" / "workflow.py")
+_ROUTES_DIR = str(_SRC_DIR / "rest")
+
+
+class LoopMonitor:
+    """
+    Detects event loop blocking.
+
+    A heartbeat task measures how late each `interval` sleep wakes up (the loop
+    lag). A watchdog thread notices when the heartbeat is overdue by more than
+    `threshold` and captures the loop thread's stack while it is still blocked,
+    so the stall is reported with the code that caused it, attributed to the
+    graph node and route in that stack.
+    """
+
+    def __init__(
+        self,
+        interval: float | None = None,
+        threshold: float | None = None,
+    ):
+        self.interval = interval or env.LOOP_MONITOR_INTERVAL
+        self.threshold = threshold or env.LOOP_MONITOR_THRESHOLD
+        self._loop_thread_id: int | None = None
+        self._last_beat = time.monotonic()
+        self._snapshot: LoopStall | None = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat_task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        # Latest stalls, for inspection
+        self.stalls: deque[LoopStall] = deque(maxlen=100)
+
+    async def start(self) -> None:
+        if self._heartbeat_task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            f"Event loop monitor started (interval {self.interval}s, "
+            f"threshold {self.threshold}s)."
+        )
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is None:
+            return
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+
+            lag = max(now - before - self.interval, 0)
+            LOOP_LAG.observe(lag)
+            if lag > self.threshold:
+                self._report(lag)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.threshold / 2):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue <= self.threshold:
+                continue
+            with self._lock:
+                # One snapshot per stall, taken while the loop is still blocked
+                if self._snapshot is None:
+                    self._snapshot = self._capture()
+
+    def _capture(self) -> LoopStall | None:
+        frame = sys._current_frames().get(self._loop_thread_id or -1)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        return LoopStall(
+            duration=0,
+            node=_innermost(stack, lambda path: path == _WORKFLOW_FILE),
+            route=_innermost(stack, lambda path: path.startswith(_ROUTES_DIR)),
+            stack=traceback.format_list(stack),
+        )
+
+    def _report(self, lag: float) -> None:
+        with self._lock:
+            stall, self._snapshot = self._snapshot, None
+        # The watchdog may miss stalls shorter than its polling period
+        stall = stall or LoopStall(duration=0, node="unknown", route="unknown")
+        stall.duration = lag
+        self.stalls.append(stall)
+
+        LOOP_STALLS.labels(stall.node, stall.route).inc()
+        LOOP_STALL_DURATION.labels(stall.node, stall.route).observe(lag)
+        logger.warning(
+            f"Event loop blocked for {lag * 1000:.0f}ms (node: {stall.node}, "
+            f"route: {stall.route})."
+            + (f"\n{''.join(stall.stack)}" if stall.stack else "")
+        )
+
+
+def _innermost(stack: traceback.StackSummary, match: Callable[[str], bool]) -> str:
+    """Name of the innermost function whose file path matches."""
+    for frame in reversed(stack):
+        if match(os.path.abspath(frame.filename)):
+            return frame.name
+    return "unknown"
+
+
+loop_monitor = LoopMonitor()
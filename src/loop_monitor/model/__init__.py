@@ -0,0 +1 @@
+from .loop_stall import *
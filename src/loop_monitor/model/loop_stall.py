@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+
+class LoopStall(BaseModel):
+    duration: float = Field(description="Seconds the event loop was blocked.")
+    node: str = Field(description="Graph node running the blocking code.")
+    route: str = Field(description="Route running the blocking code.")
+    stack: list[str] = Field(
+        default_factory=list,
+        description="Stack of the event loop thread, captured during the stall.",
+    )
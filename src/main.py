@@ -1,13 +1,20 @@
 import logging
+from contextlib import asynccontextmanager
 from textwrap import dedent
 
 from fastapi import APIRouter, FastAPI
 
+from src.config import env
 from src.config.env import main
+from src.loop_monitor import loop_monitor
 from src.rest.graph import router as graph_router
 from src.rest.messages import router as messages_router
+from src.rest.metrics import router as metrics_router
+from src.rest.profiles import router as profiles_router
 from src.rest.threads import router as threads_router
 from src.rest.vectorstore import router as vectorstore_router
+from src.thread_lock import thread_locks
+from src.tracing import tracer
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -16,6 +23,17 @@ logging.basicConfig(
 )
 logging.info(f"Initializing {__name__} for environment {main.ENV}...")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if env.LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    await tracer.close()
+    await thread_locks.close()
+
+
 # --- Metadata taken from README ------------------------------------------------
 
 app = FastAPI(
@@ -49,6 +67,7 @@ app = FastAPI(
     },
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # --- Tag metadata (shows up as sections in the docs) ---------------------------
@@ -69,6 +88,14 @@ tags_metadata = [
         "name": "Vectorstore",
         "description": "Handle vectorstore data.",
     },
+    {
+        "name": "Metrics",
+        "description": "Prometheus metrics.",
+    },
+    {
+        "name": "Profiles",
+        "description": "Download on-demand run profiles.",
+    },
 ]
 app.openapi_tags = tags_metadata
 
@@ -85,3 +112,5 @@ app.include_router(agent_router)
 
 # Other routes
 app.include_router(vectorstore_router, prefix="/vectorstore", tags=["Vectorstore"])
+app.include_router(metrics_router, tags=["Metrics"])
+app.include_router(profiles_router, prefix="/profiles", tags=["Profiles"])
@@ -0,0 +1,3 @@
+from .main import *
+from .metrics_callback_handler import *
+from .instrumented_checkpoint_saver import *
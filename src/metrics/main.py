@@ -0,0 +1,218 @@
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# LLM calls and whole nodes routinely take seconds, unlike the default buckets
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+NODE_DURATION = Histogram(
+    "lia_node_duration_seconds",
+    "Duration of graph node runs.",
+    ["node", "chat_interface"],
+    buckets=_SLOW_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "lia_llm_latency_seconds",
+    "Latency of LLM calls.",
+    ["model", "chat_interface"],
+    buckets=_SLOW_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "lia_llm_tokens",
+    "LLM tokens, from the providers' usage metadata.",
+    ["provider", "model", "direction", "chat_interface"],
+)
+RETRIEVAL_LATENCY = Histogram(
+    "lia_retrieval_latency_seconds",
+    "Latency of vectorstore retrievals.",
+    ["chat_interface"],
+    buckets=_FAST_BUCKETS,
+)
+RETRIEVED_DOCUMENTS = Histogram(
+    "lia_retrieved_documents",
+    "Documents returned per vectorstore retrieval.",
+    ["chat_interface"],
+    buckets=_COUNT_BUCKETS,
+)
+CHECKPOINT_LATENCY = Histogram(
+    "lia_checkpoint_latency_seconds",
+    "Latency of checkpointer reads and writes.",
+    ["operation", "chat_interface"],
+    buckets=_FAST_BUCKETS,
+)
+WEBSOCKET_FIRST_DELTA = Histogram(
+    "lia_websocket_first_delta_seconds",
+    "Time from the start of a websocket turn to its first delta frame.",
+    ["chat_interface"],
+    buckets=_SLOW_BUCKETS,
+)
+LOOP_LAG = Histogram(
+    "lia_event_loop_lag_seconds",
+    "Event loop lag measured by the blocking detector.",
+    buckets=_FAST_BUCKETS,
+)
+LOOP_STALLS = Counter(
+    "lia_event_loop_stalls",
+    "Event loop stalls above the blocking detector threshold.",
+    ["node", "route"],
+)
+LOOP_STALL_DURATION = Histogram(
+    "lia_event_loop_stall_seconds",
+    "Duration of event loop stalls above the blocking detector threshold.",
+    ["node", "route"],
+    buckets=_SLOW_BUCKETS,
+)
+THREAD_LOCK_WAIT = Histogram(
+    "lia_thread_lock_wait_seconds",
+    "Time waited for the lock of a thread before running a message.",
+    ["outcome"],
+    buckets=_SLOW_BUCKETS,
+)
+COALESCED_MESSAGES = Counter(
+    "lia_coalesced_messages",
+    "Messages merged into the run of an earlier message of the same burst.",
+)
+LLM_CALLS_SAVED = Counter(
+    "lia_coalescing_llm_calls_saved",
+    "LLM calls the merged messages would have made in runs of their own.",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "lia_admission_queue_depth",
+    "Model and embedding calls waiting for admission to their provider model.",
+    ["model", "priority"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "lia_admission_in_flight",
+    "Admitted model and embedding calls in progress.",
+    ["model", "priority"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_LIMIT = Gauge(
+    "lia_admission_concurrency_limit",
+    "Adaptive concurrency limit of a provider model.",
+    ["model"],
+    multiprocess_mode="liveall",
+)
+ADMISSION_WAIT = Histogram(
+    "lia_admission_wait_seconds",
+    "Time model and embedding calls waited for admission, by outcome.",
+    ["model", "priority", "outcome"],
+    buckets=_SLOW_BUCKETS,
+)
+ADMISSION_RATE_LIMITED = Counter(
+    "lia_admission_rate_limited",
+    "LLM calls the provider rejected with a rate limit.",
+    ["model"],
+)
+RUNS_CANCELLED = Counter(
+    "lia_runs_cancelled",
+    "Graph runs cancelled before they finished, by reason.",
+    ["reason", "chat_interface"],
+)
+LLM_CALLS_CANCELLED = Counter(
+    "lia_llm_calls_cancelled",
+    "LLM calls cancelled mid-flight, by reason.",
+    ["model", "reason"],
+)
+CANCELLED_TOKENS_SAVED = Counter(
+    "lia_cancelled_output_tokens_saved",
+    "Output tokens cancelled LLM calls were not billed for, estimated from the "
+    "average output of the model's completed calls.",
+    ["model", "reason"],
+)
+STREAM_FRAMES = Counter(
+    "lia_stream_frames",
+    "Frames sent to streaming clients, by type.",
+    ["type", "chat_interface"],
+)
+STREAM_DELTAS_SKIPPED = Counter(
+    "lia_stream_deltas_skipped",
+    "Streamed deltas superseded by a later one before they were sent.",
+    ["chat_interface"],
+)
+ERROR_RETRIES = Counter(
+    "lia_error_handler_retries",
+    "Retries performed by the error handler, by provider of the failed step.",
+    ["provider", "chat_interface"],
+)
+STRUCTURED_OUTPUT_FALLBACKS = Counter(
+    "lia_structured_output_fallbacks",
+    "Native structured output calls that fell back to the parser chain.",
+    ["provider", "output"],
+)
+# `repaired` outputs are error-handler LLM round trips avoided
+JSON_REPAIRS = Counter(
+    "lia_json_repairs",
+    "Malformed LLM JSON outputs through local repair, by outcome.",
+    ["provider", "outcome"],
+)
+
+
+@dataclass
+class RunClock:
+    """Timing state of the graph run in progress."""
+
+    chat_interface: str
+    started: float = field(default_factory=time.perf_counter)
+    first_delta_sent: bool = False
+
+
+# Set by `start()` for the duration of a run; `None` outside graph runs
+run_clock_var: ContextVar[RunClock | None] = ContextVar("run_clock", default=None)
+
+
+def chat_interface_label() -> str:
+    clock = run_clock_var.get()
+    return clock.chat_interface if clock else "none"
+
+
+def observe_first_delta() -> None:
+    """Record the time to the run's first websocket delta (once per run)."""
+    clock = run_clock_var.get()
+    if clock is None or clock.first_delta_sent:
+        return
+    clock.first_delta_sent = True
+    WEBSOCKET_FIRST_DELTA.labels(clock.chat_interface).observe(
+        time.perf_counter() - clock.started
+    )
+
+
+@contextmanager
+def observe_duration(histogram: Histogram, *labels: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Exposition of every metric, and its content type.
+
+    Under gunicorn each worker is a process with its own registry, so when
+    `PROMETHEUS_MULTIPROC_DIR` is set the workers write their samples there and
+    the exposition aggregates all of them.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
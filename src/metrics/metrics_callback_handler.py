@@ -0,0 +1,202 @@
+import asyncio
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from src.common import graph_node
+from src.metrics.main import (
+    CANCELLED_TOKENS_SAVED,
+    LLM_CALLS_CANCELLED,
+    LLM_LATENCY,
+    LLM_TOKENS,
+    NODE_DURATION,
+    RunClock,
+    run_clock_var,
+)
+
+# Weight of the latest call in the average output of a model
+_OUTPUT_AVERAGE_WEIGHT = 0.1
+# Average output tokens of the completed calls of each model
+_average_output_tokens: dict[str, float] = {}
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records graph node durations, LLM latencies and token usage of one run,
+    and the output tokens saved by LLM calls cancelled mid-flight.
+    """
+
+    run_inline = True
+
+    def __init__(self, chat_interface: str) -> None:
+        self.chat_interface = chat_interface
+        self._nodes: dict[UUID, tuple[str, float]] = {}
+        self._llm_calls: dict[UUID, tuple[str, str, float]] = {}
+        self._streamed_tokens: dict[UUID, int] = {}
+
+    # ---------- graph nodes ---------- #
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        node = graph_node(metadata, kwargs)
+        if node is not None:
+            self._nodes[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_node(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_node(run_id)
+
+    # ---------- LLM calls ---------- #
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, serialized, metadata)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, serialized, metadata)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        # Providers stream about a token per chunk
+        if run_id in self._llm_calls:
+            self._streamed_tokens[run_id] = self._streamed_tokens.get(run_id, 0) + 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._llm_calls.pop(run_id, None)
+        streamed = self._streamed_tokens.pop(run_id, 0)
+        if started is None:
+            return
+        provider, model, start = started
+        LLM_LATENCY.labels(model, self.chat_interface).observe(
+            time.perf_counter() - start
+        )
+
+        input_tokens, output_tokens = token_usage(response)
+        for direction, tokens in (("input", input_tokens), ("output", output_tokens)):
+            if tokens:
+                LLM_TOKENS.labels(provider, model, direction, self.chat_interface).inc(
+                    tokens
+                )
+        _record_output(model, output_tokens or streamed)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        started = self._llm_calls.pop(run_id, None)
+        streamed = self._streamed_tokens.pop(run_id, 0)
+        if started is None or not isinstance(error, asyncio.CancelledError):
+            return
+        _, model, _ = started
+        # Set by the canceller (`Task.cancel(reason)`); deadlines give none
+        reason = str(error.args[0]) if error.args else "cancelled"
+        LLM_CALLS_CANCELLED.labels(model, reason).inc()
+        saved = _average_output_tokens.get(model, 0) - streamed
+        if saved > 0:
+            CANCELLED_TOKENS_SAVED.labels(model, reason).inc(saved)
+
+    # ---------- internal helpers ---------- #
+    def _end_node(self, run_id: UUID) -> None:
+        started = self._nodes.pop(run_id, None)
+        if started is not None:
+            node, start = started
+            NODE_DURATION.labels(node, self.chat_interface).observe(
+                time.perf_counter() - start
+            )
+
+    def _start_llm(
+        self,
+        run_id: UUID,
+        serialized: dict[str, Any] | None,
+        metadata: dict[str, Any] | None,
+    ) -> None:
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or (serialized or {}).get(
+            "name", "unknown"
+        )
+        provider = metadata.get("ls_provider", "unknown")
+        self._llm_calls[run_id] = (str(provider), str(model), time.perf_counter())
+
+
+def _record_output(model: str, output_tokens: int) -> None:
+    if not output_tokens:
+        return
+    average = _average_output_tokens.get(model)
+    _average_output_tokens[model] = (
+        float(output_tokens)
+        if average is None
+        else average + _OUTPUT_AVERAGE_WEIGHT * (output_tokens - average)
+    )
+
+
+def token_usage(response: LLMResult) -> tuple[int, int]:
+    """Input and output tokens of an LLM call, from its usage metadata."""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            if not isinstance(generation, ChatGeneration):
+                continue
+            usage = getattr(generation.message, "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+
+    # Completion models only report usage in `llm_output`
+    if not input_tokens and not output_tokens and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+metrics_handler_var: ContextVar[MetricsCallbackHandler | None] = ContextVar(
+    "metrics_handler", default=None
+)
+# Attach the run's handler to every runnable configured while it is set
+register_configure_hook(metrics_handler_var, inheritable=True)
+
+
+@contextmanager
+def run_metrics(chat_interface: str) -> Iterator[RunClock]:
+    """
+    Record the metrics of the graph run within the block, labelled with
+    `chat_interface`.
+    """
+    clock = RunClock(chat_interface)
+    clock_token = run_clock_var.set(clock)
+    handler_token = metrics_handler_var.set(MetricsCallbackHandler(chat_interface))
+    try:
+        yield clock
+    finally:
+        metrics_handler_var.reset(handler_token)
+        run_clock_var.reset(clock_token)
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from fastapi import WebSocket
+from pydantic import ValidationError
+
+from src.config import env
+from src.frame_sink.main import SlowConsumer
+from src.frame_sink.model import StreamError
+from src.metrics.main import STREAM_DELTAS_SKIPPED, chat_interface_label
+from src.multiplex.model.multiplex_frame import (
+    MultiplexCancel,
+    MultiplexFrame,
+    MultiplexFrameType,
+    MultiplexRequest,
+)
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+# Reasons the runs of a multiplexed connection are cancelled with
+CANCELLED_BY_CLIENT = "client_cancel"
+DISCONNECTED = "disconnect"
+
+
+class RequestChannel:
+    """
+    Frame sink of one request's run: the frames the run sends are tagged with
+    the request ID and queued on the connection, waiting for room in the
+    request's outbox.
+    """
+
+    def __init__(self, connection: "MultiplexedConnection", request_id: str):
+        self.connection = connection
+        self.request_id = request_id
+
+    async def send_json(self, data: Any) -> None:
+        frame = data if isinstance(data, dict) else {"type": "final", "data": data}
+        await self.connection.put(
+            MultiplexFrame(
+                request_id=self.request_id,
+                type=frame.get("type", "final"),
+                data=frame.get("data"),
+            )
+        )
+
+    def send_error(self, status_code: int, detail: str) -> None:
+        self.connection.send(
+            MultiplexFrame(
+                request_id=self.request_id,
+                type=MultiplexFrameType.error.value,
+                data=StreamError(status_code=status_code, detail=detail),
+            )
+        )
+
+
+Answer = Callable[[MultiplexRequest, RequestChannel], Awaitable[None]]
+
+
+class MultiplexedConnection:
+    """
+    Runs the requests of one websocket concurrently, at most `max_concurrency`
+    at a time (the others wait their turn), and interleaves their frames
+    fairly: the writer sends one frame of each request with frames pending in
+    turn, so a long answer does not hold back the others.
+
+    Each request's outbox holds at most `max_frames` frames: a run sending
+    more waits for the client, and after `timeout` seconds gives up on it with
+    `SlowConsumer`, which closes the connection. Deltas are cumulative, so a
+    pending delta is replaced by the next one (or by the `final` frame)
+    instead of queueing behind it.
+
+    Client frames are `MultiplexRequest`s and `MultiplexCancel`s. A request
+    ends with its `final` frame, or with an `error` or `cancelled` frame.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_concurrency: int | None = None,
+        max_frames: int | None = None,
+        timeout: float | None = None,
+    ):
+        self.websocket = websocket
+        self.max_concurrency = max_concurrency or env.WEBSOCKET_MAX_CONCURRENT_RUNS
+        self.max_frames = max_frames or env.STREAM_MAX_QUEUED_FRAMES
+        self.timeout = env.STREAM_SLOW_CLIENT_TIMEOUT if timeout is None else timeout
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._runs: dict[str, asyncio.Task] = {}
+        self._outboxes: dict[str, deque[MultiplexFrame]] = {}
+        # Requests with frames to send, in the order they get their next turn
+        self._turns: deque[str] = deque()
+        self._frames_pending = asyncio.Event()
+        self._space = asyncio.Event()
+
+    async def serve(self, answer: Answer) -> None:
+        """
+        Answer the requests received until the client disconnects, which
+        cancels the runs still in progress.
+        """
+        writer = asyncio.create_task(self._write())
+        try:
+            while True:
+                self._receive(await self.websocket.receive_json(), answer)
+        finally:
+            runs = list(self._runs.values())
+            for task in runs:
+                task.cancel(DISCONNECTED)
+            await asyncio.gather(*runs, return_exceptions=True)
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+
+    async def put(self, frame: MultiplexFrame) -> None:
+        """Queue a frame of a run, waiting for room in its request's outbox."""
+        if self._collapse(frame):
+            return
+        try:
+            async with asyncio.timeout(self.timeout or None):
+                while len(self._outboxes.get(frame.request_id, ())) >= self.max_frames:
+                    self._space.clear()
+                    await self._space.wait()
+        except TimeoutError as e:
+            raise SlowConsumer(1008, "Client too slow to read its answers.") from e
+        self.send(frame)
+
+    def send(self, frame: MultiplexFrame) -> None:
+        """Queue a frame right away, whatever the size of its request's outbox."""
+        outbox = self._outboxes.setdefault(frame.request_id, deque())
+        if not outbox:
+            self._turns.append(frame.request_id)
+        outbox.append(frame)
+        self._frames_pending.set()
+
+    # ---------- internal helpers ---------- #
+    def _collapse(self, frame: MultiplexFrame) -> bool:
+        """Whether `frame` replaced the delta pending at the end of its outbox."""
+        outbox = self._outboxes.get(frame.request_id)
+        if frame.type not in ("delta", "final") or not outbox:
+            return False
+        if outbox[-1].type != "delta":
+            return False
+        outbox[-1] = frame
+        STREAM_DELTAS_SKIPPED.labels(chat_interface_label()).inc()
+        return True
+
+    def _receive(self, data: Any, answer: Answer) -> None:
+        request_id = str(data.get("request_id", "")) if isinstance(data, dict) else ""
+        try:
+            if isinstance(data, dict) and data.get("type") == "cancel":
+                self._cancel(MultiplexCancel.model_validate(data).request_id)
+                return
+            request = MultiplexRequest.model_validate(data)
+        except ValidationError as e:
+            RequestChannel(self, request_id).send_error(422, str(e))
+            return
+
+        if request.request_id in self._runs:
+            RequestChannel(self, request.request_id).send_error(
+                409, f"Request {request.request_id} is already in progress."
+            )
+            return
+        channel = RequestChannel(self, request.request_id)
+        self._runs[request.request_id] = asyncio.create_task(
+            self._run(request, channel, answer)
+        )
+
+    def _cancel(self, request_id: str) -> None:
+        task = self._runs.get(request_id)
+        if task is not None:
+            task.cancel(CANCELLED_BY_CLIENT)
+
+    async def _run(
+        self, request: MultiplexRequest, channel: RequestChannel, answer: Answer
+    ) -> None:
+        try:
+            async with self._slots:
+                await answer(request, channel)
+        except asyncio.CancelledError as e:
+            if e.args and e.args[0] == CANCELLED_BY_CLIENT:
+                self.send(
+                    MultiplexFrame(
+                        request_id=request.request_id,
+                        type=MultiplexFrameType.cancelled.value,
+                    )
+                )
+                return
+            raise
+        except SlowConsumer as e:
+            # The client reads none of its answers: drop the whole connection
+            logger.warning(str(e.reason))
+            await self.websocket.close(code=e.code, reason=e.reason)
+        except Exception as e:
+            logger.error(f"Error answering {request.request_id}: {e}", exc_info=True)
+            channel.send_error(500, f"Could not send chat message: {e}")
+        finally:
+            self._runs.pop(request.request_id, None)
+
+    async def _write(self) -> None:
+        while True:
+            await self._frames_pending.wait()
+            while self._turns:
+                request_id = self._turns.popleft()
+                outbox = self._outboxes[request_id]
+                frame = outbox.popleft()
+                self._space.set()
+                if outbox:
+                    self._turns.append(request_id)
+                else:
+                    del self._outboxes[request_id]
+                await self.websocket.send_text(frame.model_dump_json())
+            self._frames_pending.clear()
@@ -0,0 +1 @@
+from .multiplex_frame import *
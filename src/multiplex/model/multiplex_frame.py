@@ -0,0 +1,47 @@
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from src.agent.model.chat_interface import ChatInterface
+from src.agent.model.input import InputRequest
+
+
+class MultiplexFrameType(Enum):
+    # Sent by the client
+    request = "request"
+    cancel = "cancel"
+    # Sent by the server, besides the `delta` and `final` frames of the runs
+    error = "error"
+    cancelled = "cancelled"
+
+
+class MultiplexRequest(InputRequest):
+    """A message sent over a multiplexed websocket."""
+
+    type: MultiplexFrameType = Field(default=MultiplexFrameType.request)
+    request_id: str = Field(
+        description="Client-chosen ID tagging every frame of this request's answer."
+    )
+    chat_interface: ChatInterface = Field(
+        default=ChatInterface.websocket,
+        description="Chat interface through which the input was received.",
+    )
+
+
+class MultiplexCancel(BaseModel):
+    """Cancels the run of a request sent over a multiplexed websocket."""
+
+    type: MultiplexFrameType = Field(default=MultiplexFrameType.cancel)
+    request_id: str = Field(description="ID of the request to cancel.")
+
+
+class MultiplexFrame(BaseModel):
+    """A frame sent by the server over a multiplexed websocket."""
+
+    request_id: str = Field(description="ID of the request the frame belongs to.")
+    type: str = Field(
+        description="`delta` and `final` as on the plain websocket, or `error` and "
+        "`cancelled` ending a request that did not complete."
+    )
+    data: Any = Field(default=None, description="Frame data.")
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import re
+import shutil
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+
+from src.config import env
+from src.profiling.model.run_profile import AllocationStats, FunctionStats, RunProfile
+from src.profiling.stack_sampler import StackSampler, profiled_run_var
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+PROFILE_FILE = "profile.json"
+STACKS_FILE = "stacks.txt"  # Collapsed stacks, for flamegraph.pl or speedscope
+ALLOCATIONS_FILE = "allocations.txt"
+ARTIFACTS = (PROFILE_FILE, STACKS_FILE, ALLOCATIONS_FILE)
+
+_TOP = 30
+# Thread and checkpoint ids become directory names
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class ProfiledRun:
+    """A graph run being profiled."""
+
+    def __init__(self, thread_id: str, sample_interval: float):
+        self.thread_id = thread_id
+        self.started_at = datetime.now(UTC)
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.sampler = StackSampler(object(), sample_interval)
+        self.snapshot_before: tracemalloc.Snapshot | None = None
+        self.snapshot_after: tracemalloc.Snapshot | None = None
+
+
+class RunProfiler:
+    """
+    Profiles single graph runs on demand: a stack sampler restricted to the
+    run's tasks for CPU time, and tracemalloc snapshots taken around the run
+    for allocations. Results are stored under `DATA_DIR/profiles`, keyed by
+    thread and checkpoint id.
+
+    tracemalloc traces the whole process while any profiled run is active, so
+    allocations of concurrent requests show up in the allocation diff as well.
+    """
+
+    def __init__(self, root: Path | None = None):
+        self.root = root or env.DATA_DIR / "profiles"
+        self._tracing_runs = 0
+        self._started_tracemalloc = False
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def profile(self, thread_id: str) -> AsyncIterator[ProfiledRun]:
+        run = ProfiledRun(thread_id, env.PROFILING_SAMPLE_INTERVAL)
+        run.snapshot_before = self._start_tracemalloc()
+        token = profiled_run_var.set(run.sampler.marker)
+        run.sampler.start()
+        try:
+            yield run
+        finally:
+            run.duration = time.perf_counter() - run.started
+            profiled_run_var.reset(token)
+            await asyncio.to_thread(run.sampler.stop)
+            run.snapshot_after = self._stop_tracemalloc()
+
+    async def save(self, run: ProfiledRun, checkpoint_id: str) -> RunProfile:
+        return await asyncio.to_thread(self._save, run, checkpoint_id)
+
+    def list(self, thread_id: str | None = None, limit: int = 20) -> list[RunProfile]:
+        """Latest profiles, newest first."""
+        thread_dir = _safe(thread_id) if thread_id else "*"
+        paths = sorted(
+            self.root.glob(f"{thread_dir}/*/{PROFILE_FILE}"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        return [
+            RunProfile.model_validate_json(p.read_text(encoding="utf-8"))
+            for p in paths[:limit]
+        ]
+
+    def artifact_path(self, thread_id: str, checkpoint_id: str, artifact: str) -> Path:
+        if artifact not in ARTIFACTS:
+            raise FileNotFoundError(f"Unknown profile artifact: {artifact}")
+        path = self.root / _safe(thread_id) / _safe(checkpoint_id) / artifact
+        if not path.is_file():
+            raise FileNotFoundError(f"No profile artifact at {path}")
+        return path
+
+    # ---------- internal helpers ---------- #
+    def _start_tracemalloc(self) -> tracemalloc.Snapshot:
+        with self._lock:
+            if self._tracing_runs == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            self._tracing_runs += 1
+        return tracemalloc.take_snapshot()
+
+    def _stop_tracemalloc(self) -> tracemalloc.Snapshot:
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            self._tracing_runs -= 1
+            if self._tracing_runs == 0 and self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        return snapshot
+
+    def _save(self, run: ProfiledRun, checkpoint_id: str) -> RunProfile:
+        directory = self.root / _safe(run.thread_id) / _safe(checkpoint_id)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        stacks = run.sampler.stacks
+        (directory / STACKS_FILE).write_text(
+            "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.items()),
+            encoding="utf-8",
+        )
+
+        allocations = self._allocations(run)
+        (directory / ALLOCATIONS_FILE).write_text(
+            "".join(
+                f"{a.location}: {a.size_kib:+.1f} KiB, {a.count:+d} blocks\n"
+                for a in allocations
+            ),
+            encoding="utf-8",
+        )
+
+        profile = RunProfile(
+            thread_id=run.thread_id,
+            checkpoint_id=checkpoint_id,
+            started_at=run.started_at,
+            duration=run.duration,
+            sample_interval=run.sampler.interval,
+            samples=run.sampler.samples,
+            top_functions=_top_functions(stacks),
+            top_allocations=allocations[:_TOP],
+            artifacts=list(ARTIFACTS),
+        )
+        (directory / PROFILE_FILE).write_text(
+            profile.model_dump_json(indent=2), encoding="utf-8"
+        )
+        logger.info(
+            f"Saved profile of thread {run.thread_id} at checkpoint {checkpoint_id} "
+            f"({profile.samples} samples) to {directory}."
+        )
+        self._apply_retention()
+        return profile
+
+    def _allocations(self, run: ProfiledRun) -> list[AllocationStats]:
+        if run.snapshot_before is None or run.snapshot_after is None:
+            return []
+        snapshot_filter = tracemalloc.Filter(False, tracemalloc.__file__)
+        before = run.snapshot_before.filter_traces([snapshot_filter])
+        after = run.snapshot_after.filter_traces([snapshot_filter])
+        return [
+            AllocationStats(
+                location=str(stat.traceback),
+                size_kib=stat.size_diff / 1024,
+                count=stat.count_diff,
+            )
+            for stat in after.compare_to(before, "lineno")[:200]
+            if stat.size_diff
+        ]
+
+    def _apply_retention(self) -> None:
+        profiles = sorted(
+            self.root.glob(f"*/*/{PROFILE_FILE}"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for stale in profiles[env.PROFILING_RETENTION :]:
+            shutil.rmtree(stale.parent, ignore_errors=True)
+
+
+def _top_functions(stacks: Counter[tuple[str, ...]]) -> list[FunctionStats]:
+    self_samples: Counter[str] = Counter()
+    total_samples: Counter[str] = Counter()
+    for stack, count in stacks.items():
+        if stack:
+            self_samples[stack[-1]] += count
+        # Recursion must not count a sample twice
+        for function in set(stack):
+            total_samples[function] += count
+    return [
+        FunctionStats(
+            function=function,
+            self_samples=self_samples[function],
+            total_samples=total_samples[function],
+        )
+        for function, _ in self_samples.most_common(_TOP)
+    ]
+
+
+def _safe(name: str) -> str:
+    return _SAFE_NAME.sub("_", name) or "_"
+
+
+run_profiler = RunProfiler()
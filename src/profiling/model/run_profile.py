@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class FunctionStats(BaseModel):
+    function: str = Field(description="`name (file:first line)` of the function.")
+    self_samples: int = Field(description="Samples with the function on top.")
+    total_samples: int = Field(description="Samples with the function on the stack.")
+
+
+class AllocationStats(BaseModel):
+    location: str = Field(description="`file:line` of the allocation.")
+    size_kib: float = Field(description="Net memory allocated during the run.")
+    count: int = Field(description="Net number of blocks allocated during the run.")
+
+
+class RunProfile(BaseModel):
+    """CPU samples and allocations of one profiled graph run."""
+
+    thread_id: str
+    checkpoint_id: str
+    started_at: datetime
+    duration: float = Field(description="Wall time of the run, in seconds.")
+    sample_interval: float = Field(description="Seconds between two stack samples.")
+    samples: int
+    top_functions: list[FunctionStats] = Field(default_factory=list)
+    top_allocations: list[AllocationStats] = Field(default_factory=list)
+    artifacts: list[str] = Field(
+        default_factory=list, description="Files downloadable for this profile."
+    )
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from types import CodeType, FrameType
+
+# Marks the tasks of a profiled run: they inherit it, other requests do not
+profiled_run_var: ContextVar[object | None] = ContextVar("profiled_run", default=None)
+
+
+class StackSampler:
+    """
+    Samples the event loop thread's stack every `interval` seconds, keeping
+    only the samples taken while a task of the profiled run (`marker`) runs.
+
+    Unlike a deterministic profiler, this attributes time to the run even
+    though its coroutines interleave with other requests on the same loop.
+    """
+
+    def __init__(self, marker: object, interval: float):
+        self.marker = marker
+        self.interval = interval
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="run-profiler", daemon=True
+        )
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if not self._in_profiled_run():
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+    def _in_profiled_run(self) -> bool:
+        # Looked up by loop, so it may be asked from another thread
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return False
+        get_context = getattr(task, "get_context", None)
+        if get_context is None:  # Python < 3.12: any busy loop counts
+            return True
+        return get_context().get(profiled_run_var) is self.marker
+
+
+def _collapse(frame: FrameType | None) -> tuple[str, ...]:
+    stack: list[str] = []
+    while frame is not None:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+@lru_cache(maxsize=4096)
+def _label(code: CodeType) -> str:
+    filename = code.co_filename
+    try:
+        filename = os.path.relpath(filename)
+    except ValueError:
+        pass
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
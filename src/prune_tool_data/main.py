@@ -0,0 +1,109 @@
+import logging
+import re
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from src.agent.model.tool_data import ToolData
+from src.common.rewrite_messages import rewrite_messages
+from src.config import env
+from src.prune_tool_data.model.retention_policy import RetentionPolicy
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+TOOL_DATA_TYPE = "rag_data"
+
+# Matches the label written by `Workflow.rag` for messages stored before the
+# query was kept in `additional_kwargs`.
+_LEGACY_QUERY_PATTERN = re.compile(r"retrieved for: '(.*?)':", re.DOTALL)
+
+
+class ToolDataPruner:
+    """
+    Applies the retention policy to tool-result (`rag_data`) messages once the
+    turns that produced them are over, so they stop being re-sent to the LLM.
+    """
+
+    policy: RetentionPolicy
+    turns: int
+
+    def __init__(
+        self,
+        policy: RetentionPolicy | None = None,
+        turns: int | None = None,
+    ):
+        self.policy = policy or RetentionPolicy(env.RAG_DATA_RETENTION)
+        self.turns = max(0, env.RAG_DATA_RETENTION_TURNS if turns is None else turns)
+
+    def prune(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """
+        Return the reducer update that stubs or drops stale tool results.
+
+        An empty list means nothing has to change.
+        """
+        if self.policy == RetentionPolicy.keep:
+            return []
+
+        stale = self._stale_indexes(messages)
+        if not stale:
+            return []
+
+        ops = rewrite_messages(
+            messages,
+            {
+                idx: self._stub(messages[idx])
+                if self.policy == RetentionPolicy.stub
+                else None
+                for idx in stale
+            },
+        )
+
+        logger.info(
+            f"Applied `{self.policy.value}` retention to {len(stale)} tool messages."
+        )
+        return ops
+
+    def _stale_indexes(self, messages: list[BaseMessage]) -> set[int]:
+        """Indexes of tool messages older than the configured number of turns."""
+        stale: set[int] = set()
+        turns_after = 0
+        for idx in range(len(messages) - 1, -1, -1):
+            m = messages[idx]
+            if isinstance(m, HumanMessage):
+                turns_after += 1
+                continue
+            if m.type != TOOL_DATA_TYPE or turns_after < self.turns:
+                continue
+            if self.policy == RetentionPolicy.stub and m.additional_kwargs.get("stub"):
+                continue  # Already a stub.
+            stale.add(idx)
+        return stale
+
+    def _stub(self, m: BaseMessage) -> BaseMessage:
+        query = m.additional_kwargs.get("rag_query") or self._legacy_query(m)
+        document_ids = m.additional_kwargs.get("document_ids") or []
+
+        label = "Knowledge base documents previously retrieved"
+        if query:
+            label += f" for: '{query}'"
+        label += " (content pruned, document ids)"
+
+        return BaseMessage(
+            content=[str(ToolData(data=document_ids, label=label))],
+            type=TOOL_DATA_TYPE,
+            additional_kwargs={
+                "rag_query": query,
+                "document_ids": document_ids,
+                "stub": True,
+            },
+        )
+
+    def _legacy_query(self, m: BaseMessage) -> str | None:
+        content = m.content if isinstance(m.content, str) else " ".join(
+            str(c) for c in m.content
+        )
+        match = _LEGACY_QUERY_PATTERN.search(content)
+        return match.group(1) if match else None
@@ -0,0 +1 @@
+from .retention_policy import *
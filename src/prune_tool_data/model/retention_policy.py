@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class RetentionPolicy(Enum):
+    keep = "keep"  # Keep tool results verbatim forever.
+    stub = "stub"  # Replace tool results with a short citation stub.
+    drop = "drop"  # Remove tool results from the history.
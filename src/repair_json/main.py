@@ -0,0 +1,144 @@
+import ast
+import json
+import logging
+import re
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import Generation
+from langchain_core.utils.json import parse_partial_json
+
+from src.metrics.main import JSON_REPAIRS
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+def repair_json(text: str) -> Any:
+    """
+    Deterministically repair common LLM JSON mistakes.
+
+    Handles markdown fences, prose around the object, smart quotes, trailing
+    commas, single-quoted (Python literal) objects and unterminated strings or
+    brackets, in that order.
+
+    Raises:
+        ValueError: If no strategy yields a JSON object or array.
+    """
+    fenced = _FENCE_PATTERN.search(text)
+    candidate = (fenced.group(1) if fenced else text).translate(_SMART_QUOTES)
+
+    start = min(
+        (i for i in (candidate.find("{"), candidate.find("[")) if i != -1),
+        default=-1,
+    )
+    if start == -1:
+        raise ValueError("No JSON object or array found in the output.")
+    candidate = candidate[start:]
+
+    closing = "}" if candidate[0] == "{" else "]"
+    end = candidate.rfind(closing)
+    bounded = candidate[: end + 1] if end != -1 else candidate
+
+    for attempt in (
+        lambda: json.loads(bounded),
+        lambda: json.loads(_TRAILING_COMMA_PATTERN.sub(r"\1", bounded)),
+        lambda: ast.literal_eval(bounded),
+        lambda: parse_partial_json(_TRAILING_COMMA_PATTERN.sub(r"\1", candidate)),
+    ):
+        try:
+            parsed = attempt()
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            continue
+        if isinstance(parsed, (dict, list)):
+            return parsed
+
+    raise ValueError("Could not repair the JSON output.")
+
+
+class RepairingJsonOutputParser(JsonOutputParser):
+    """
+    `JsonOutputParser` that tries `repair_json` before giving up, so slightly
+    malformed outputs never reach the LLM error-handler loop.
+
+    Repairs are counted on `JSON_REPAIRS` under `provider`, the provider of
+    the model whose output is parsed.
+
+    Streaming only parses partial output, which is never repaired, so once the
+    stream ends the whole output is parsed (and repaired if need be) and
+    yielded when it differs from the last partial object.
+    """
+
+    provider: str = "unknown"
+
+    def _transform(self, input: Iterator[str | BaseMessage]) -> Iterator[Any]:
+        chunks: list[str | BaseMessage] = []
+
+        def collect() -> Iterator[str | BaseMessage]:
+            for chunk in input:
+                chunks.append(chunk)
+                yield chunk
+
+        last = None
+        for parsed in super()._transform(collect()):
+            last = parsed
+            yield parsed
+        final = self._parse_streamed(chunks)
+        if final is not None and final != last:
+            yield final
+
+    async def _atransform(
+        self, input: AsyncIterator[str | BaseMessage]
+    ) -> AsyncIterator[Any]:
+        chunks: list[str | BaseMessage] = []
+
+        async def collect() -> AsyncIterator[str | BaseMessage]:
+            async for chunk in input:
+                chunks.append(chunk)
+                yield chunk
+
+        last = None
+        async for parsed in super()._atransform(collect()):
+            last = parsed
+            yield parsed
+        final = self._parse_streamed(chunks)
+        if final is not None and final != last:
+            yield final
+
+    def _parse_streamed(self, chunks: list[str | BaseMessage]) -> Any:
+        # Diffs of the partial objects cannot carry a replaced whole
+        if self.diff or not chunks:
+            return None
+        text = "".join(c if isinstance(c, str) else c.text() for c in chunks)
+        try:
+            return self.parse_result([Generation(text=text)])
+        except OutputParserException:
+            # Left to the caller, as with the partial objects
+            return None
+
+    def parse_result(self, result: list[Generation], *, partial: bool = False) -> Any:
+        try:
+            return super().parse_result(result, partial=partial)
+        except OutputParserException as e:
+            if partial:
+                raise
+
+            try:
+                repaired = repair_json(result[0].text)
+            except ValueError:
+                JSON_REPAIRS.labels(self.provider, "failed").inc()
+                raise e from None
+
+            JSON_REPAIRS.labels(self.provider, "repaired").inc()
+            logger.info("Repaired malformed JSON output locally.")
+            return repaired
+
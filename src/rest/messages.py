@@ -1,4 +1,8 @@
+import asyncio
 import logging
+import math
+from collections.abc import AsyncIterator, Awaitable, Coroutine
+from typing import Any
 
 from fastapi import (
     APIRouter,
@@ -6,96 +10,318 @@ from fastapi import (
     WebSocket,
     WebSocketDisconnect,
 )
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import BaseMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 
+from src.admission import Overloaded, Priority, lowered_priority
 from src.agent import start
+from src.agent.input_message import to_input_message
+from src.agent.model.chat_interface import ChatInterface
 from src.agent.model.graph_state import GraphState
-from src.agent.model.input import Input, InputRequest
-from src.generate_response.model.response import LLMResponse
+from src.agent.model.input import InputRequest
+from src.batch import run_batch
+from src.batch.model import BatchRequest
+from src.coalesce import message_coalescer
+from src.config import env
+from src.frame_sink import (
+    FRAME_SINK_KEY,
+    ProgressCallbackHandler,
+    QueueSink,
+    SlowConsumer,
+    encode_frame,
+)
+from src.frame_sink.model import StreamError
+from src.generate_response.model.response import (
+    LLMResponse,
+    LLMWebSocketResponse,
+    WebSocketData,
+)
+from src.multiplex import MultiplexedConnection, RequestChannel
+from src.multiplex.model import MultiplexRequest
+from src.thread_lock import ThreadBusy
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Reason of the runs cancelled because their client went away
+_DISCONNECTED = "disconnect"
+
 
 @router.websocket("/user/websocket")
 async def send_message_ws(
     websocket: WebSocket,
 ):
     await websocket.accept()
+    # Messages are answered in tasks while the socket keeps being read, so a
+    # disconnect is noticed right away and cancels their runs
+    runs: set[asyncio.Task] = set()
+    previous: asyncio.Task | None = None
+    previous_thread: str | None = None
+    # The task the latest message waits for before starting
+    waits_for: asyncio.Task | None = None
     try:
         while True:
             data = await websocket.receive_json()
             req = InputRequest(**data)
 
             config: RunnableConfig = {
-                "configurable": {"thread_id": req.thread_id, "websocket": websocket},
+                "configurable": {"thread_id": req.thread_id, FRAME_SINK_KEY: websocket},
             }
-            input: list[BaseMessage] = [
-                HumanMessage(
-                    content=[
-                        Input.model_validate(
-                            {
-                                "data": req.data,
-                            }
-                        ).model_dump()
-                    ]
+            input: list[BaseMessage] = [to_input_message(req.data)]
+
+            run = _answer_ws(
+                websocket,
+                start(
+                    input,
+                    config,
+                    "response_generator",
+                    req.chat_interface,
+                    **_start_kwargs(req),
                 ),
-            ]
-
-            await start(
-                input,
-                config,
-                "response_generator",
-                req.chat_interface,
-                req.max_retries,
-                req.loop_threshold,
-                req.top_k,
-                summarize_message_window=req.summarize_message_window,
-                summarize_message_keep=req.summarize_message_keep,
-                summarize_system_messages=req.summarize_system_messages,
             )
+            # One message at a time, in the order received. Consecutive messages
+            # of a thread start together instead, so the coalescer can merge
+            # them; it runs the bursts of a thread one after the other.
+            if not (message_coalescer.enabled and req.thread_id == previous_thread):
+                waits_for = previous
+            previous = asyncio.create_task(_after(waits_for, run))
+            previous_thread = req.thread_id
+            runs.add(previous)
+            previous.add_done_callback(runs.discard)
     except WebSocketDisconnect:
         logger.info("Client disconnected.")
+    except Exception as e:
+        logger.error(f"Error receiving chat message: {e}", exc_info=True)
+    finally:
+        for task in runs:
+            task.cancel(_DISCONNECTED)
+        await asyncio.gather(*runs, return_exceptions=True)
+
+
+async def _after(previous: asyncio.Task | None, run: Coroutine[Any, Any, None]) -> None:
+    """Await `run` once the previous message of the socket is answered."""
+    try:
+        if previous is not None:
+            await asyncio.wait([previous])
+    except BaseException:
+        run.close()
+        raise
+    await run
+
+
+async def _answer_ws(websocket: WebSocket, run: Awaitable) -> None:
+    """Await the run answering a websocket message, handling its failures."""
+    try:
+        await run
+    except SlowConsumer as e:
+        logger.warning(str(e.reason))
+        await websocket.close(code=e.code, reason=e.reason)
+    except WebSocketDisconnect:
+        logger.info("Client disconnected.")
+    except (ThreadBusy, Overloaded) as e:
+        logger.warning(str(e))
+        # 1013: Try Again Later
+        await websocket.close(code=1013, reason=str(e))
     except Exception as e:
         logger.error(f"Error sending chat message: {e}", exc_info=True)
 
 
+@router.websocket("/user/websocket/multiplex")
+async def send_messages_multiplexed(
+    websocket: WebSocket,
+):
+    """
+    Several conversations over one websocket: every frame carries the
+    `request_id` of the message it belongs to, and the messages are answered
+    concurrently (see `MultiplexedConnection`).
+    """
+    await websocket.accept()
+    try:
+        await MultiplexedConnection(websocket).serve(_answer_multiplexed)
+    except WebSocketDisconnect:
+        logger.info("Client disconnected.")
+    except Exception as e:
+        logger.error(f"Error receiving chat message: {e}", exc_info=True)
+
+
+async def _answer_multiplexed(req: MultiplexRequest, channel: RequestChannel) -> None:
+    config: RunnableConfig = {
+        "configurable": {"thread_id": req.thread_id, FRAME_SINK_KEY: channel},
+    }
+    input: list[BaseMessage] = [to_input_message(req.data)]
+
+    try:
+        agent_response = await start(
+            input,
+            config,
+            "response_generator",
+            req.chat_interface,
+            **_start_kwargs(req),
+        )
+    except ThreadBusy as e:
+        channel.send_error(409, str(e))
+        return
+    except Overloaded as e:
+        channel.send_error(503, str(e))
+        return
+
+    if not req.chat_interface.streams:
+        # Nothing was streamed: answer in one frame
+        final_msg = LLMWebSocketResponse(
+            type=WebSocketData.final, data=agent_response["response"].content[0]
+        )
+        await channel.send_json(final_msg.model_dump(mode="json"))
+
+
+@router.post("/user/sse")
+async def send_message_sse(
+    req: InputRequest,
+) -> StreamingResponse:
+    """
+    Answers a message as Server-Sent Events: `progress` events as the graph
+    nodes start and end, the `delta` events of the evaluator and generator, and
+    the `final` event. The stream closes when the run ends, with an `error`
+    event if it failed; closing it first cancels the run. A client too slow to
+    read its events (see `QueueSink`) gets an `error` event and its run is
+    cancelled.
+    """
+    return StreamingResponse(
+        _stream_sse(req),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_sse(req: InputRequest) -> AsyncIterator[str]:
+    sink = QueueSink()
+    config: RunnableConfig = {
+        "configurable": {"thread_id": req.thread_id, FRAME_SINK_KEY: sink},
+        "callbacks": [ProgressCallbackHandler(sink)],
+    }
+    # Started with the stream, so a client gone before it opens runs nothing
+    run = asyncio.create_task(_answer_sse(req, config, sink))
+    try:
+        async for frame in sink.frames():
+            yield _sse_event(frame.get("type", "message"), frame.get("data"))
+    except SlowConsumer as e:
+        logger.warning(str(e.reason))
+        # 408: the client timed out reading its answer; the run is cancelled below
+        error = StreamError(status_code=408, detail=str(e.reason))
+        yield _sse_event("error", error.model_dump(mode="json"))
+    finally:
+        run.cancel(_DISCONNECTED)
+        await asyncio.gather(run, return_exceptions=True)
+
+
+async def _answer_sse(
+    req: InputRequest, config: RunnableConfig, sink: QueueSink
+) -> None:
+    input: list[BaseMessage] = [to_input_message(req.data)]
+
+    try:
+        await start(
+            input,
+            config,
+            "response_generator",
+            ChatInterface.sse,
+            **_start_kwargs(req),
+        )
+    except SlowConsumer:
+        # The stream ends with its own error event
+        pass
+    except ThreadBusy as e:
+        await _send_error(sink, 409, str(e))
+    except Overloaded as e:
+        await _send_error(sink, 503, str(e))
+    except Exception as e:
+        logger.error(f"Error sending chat message: {e}", exc_info=True)
+        await _send_error(sink, 500, f"Could not send chat message: {e}")
+    finally:
+        sink.close()
+
+
+async def _send_error(sink: QueueSink, status_code: int, detail: str) -> None:
+    error = StreamError(status_code=status_code, detail=detail)
+    await sink.send_json({"type": "error", "data": error.model_dump(mode="json")})
+
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {encode_frame(data)}\n\n"
+
+
+@router.post("/user/batch")
+async def send_chat_messages_batch(
+    req: BatchRequest,
+) -> StreamingResponse:
+    """
+    Answers messages to many threads in one request, concurrently but in
+    order within each thread, as NDJSON: one `BatchItemResult` line per
+    message, in the order they complete. A failed message gets an error line
+    and does not fail the batch.
+
+    The calls of a batch have bulk priority, so they yield to chat traffic.
+    """
+    if len(req.requests) > env.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch holds at most {env.BATCH_MAX_REQUESTS} messages.",
+        )
+    return StreamingResponse(_stream_batch(req), media_type="application/x-ndjson")
+
+
+async def _stream_batch(req: BatchRequest) -> AsyncIterator[str]:
+    async for result in run_batch(
+        req.requests, _answer_batch_item, req.max_concurrency
+    ):
+        yield result.model_dump_json() + "\n"
+
+
+async def _answer_batch_item(req: InputRequest) -> Any:
+    config: RunnableConfig = {"configurable": {"thread_id": req.thread_id}}
+    input: list[BaseMessage] = [to_input_message(req.data)]
+
+    with lowered_priority(Priority.bulk):
+        agent_response = await start(
+            input,
+            config,
+            "response_generator",
+            # Nothing to stream to
+            ChatInterface.api,
+            **_start_kwargs(req),
+        )
+    return agent_response["response"].content[0]
+
+
 @router.post("/user", response_model=LLMResponse)
 async def send_chat_message(
     req: InputRequest,
 ):
     try:
         config: RunnableConfig = {"configurable": {"thread_id": req.thread_id}}
-        input: list[BaseMessage] = [
-            HumanMessage(
-                content=[
-                    Input.model_validate(
-                        {
-                            "data": req.data,
-                        }
-                    ).model_dump()
-                ]
-            ),
-        ]
+        input: list[BaseMessage] = [to_input_message(req.data)]
 
         agent_response = await start(
             input,
             config,
             "response_generator",
             req.chat_interface,
-            req.max_retries,
-            req.loop_threshold,
-            req.top_k,
-            summarize_message_window=req.summarize_message_window,
-            summarize_message_keep=req.summarize_message_keep,
-            summarize_system_messages=req.summarize_system_messages,
+            **_start_kwargs(req),
         )
 
         message = agent_response["response"]
 
         return message.content[0]
+    except ThreadBusy as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        ) from e
     except Exception as e:
         logger.error(f"Error sending chat message: {e}", exc_info=True)
         raise HTTPException(
@@ -109,32 +335,44 @@ async def send_system_instructions(
 ):
     try:
         config: RunnableConfig = {"configurable": {"thread_id": req.thread_id}}
-        input: list[BaseMessage] = [
-            SystemMessage(
-                content=[
-                    Input.model_validate(
-                        {
-                            "data": req.data,
-                        }
-                    ).model_dump()
-                ]
-            ),
-        ]
+        input: list[BaseMessage] = [to_input_message(req.data, SystemMessage)]
 
         agent_response = await start(
             input,
             config,
             "context_incrementer",
             req.chat_interface,
-            req.top_k,
-            summarize_message_window=req.summarize_message_window,
-            summarize_message_keep=req.summarize_message_keep,
-            summarize_system_messages=req.summarize_system_messages,
+            **_start_kwargs(req),
         )
 
         return agent_response
+    except ThreadBusy as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        ) from e
     except Exception as e:
         logger.error(f"Error sending system instructions: {e}", exc_info=True)
         raise HTTPException(
             status_code=500, detail=f"Could not send system instructions: {e}"
         ) from e
+
+
+def _start_kwargs(req: InputRequest) -> dict[str, Any]:
+    """The run settings of a message, as keyword arguments of `start`."""
+    return {
+        "max_retries": req.max_retries,
+        "loop_threshold": req.loop_threshold,
+        "top_k": req.top_k,
+        "summarize_message_window": req.summarize_message_window,
+        "summarize_message_keep": req.summarize_message_keep,
+        "summarize_system_messages": req.summarize_system_messages,
+        "summarize_token_threshold": req.summarize_token_threshold,
+        "summarize_token_keep": req.summarize_token_keep,
+        "token_budget": req.token_budget,
+        "deadline": req.deadline,
+        "profile": req.profile,
+    }
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Response
+
+from src.metrics.main import render_metrics
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    summary="Expose Prometheus metrics",
+    response_class=Response,
+)
+async def get_metrics():
+    """
+    Node durations, LLM latency and tokens, retrieval, checkpoint and websocket
+    timings and error-handler retries, labelled by chat interface.
+    """
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
@@ -0,0 +1,58 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from src.config import env
+from src.profiling.main import run_profiler
+from src.profiling.model.run_profile import RunProfile
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="List the latest run profiles",
+    response_model=list[RunProfile],
+)
+async def list_profiles(
+    thread_id: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    """
+    Profiles of runs sent with `profile: true`, newest first, optionally for a
+    single thread.
+    """
+    _ensure_enabled()
+    try:
+        return run_profiler.list(thread_id, limit)
+    except Exception as e:
+        logger.error(f"Error listing profiles: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500, detail=f"Could not list profiles: {e}"
+        ) from e
+
+
+@router.get(
+    "/{thread_id}/{checkpoint_id}/{artifact}",
+    summary="Download a run profile artifact",
+    response_class=FileResponse,
+)
+async def download_profile_artifact(thread_id: str, checkpoint_id: str, artifact: str):
+    """
+    Download `profile.json`, `stacks.txt` (collapsed stacks, for flame graphs)
+    or `allocations.txt` of a profiled run.
+    """
+    _ensure_enabled()
+    try:
+        path = run_profiler.artifact_path(thread_id, checkpoint_id, artifact)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    return FileResponse(path, filename=f"{thread_id}-{checkpoint_id}-{artifact}")
+
+
+def _ensure_enabled() -> None:
+    if not env.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled.")
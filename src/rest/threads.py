@@ -1,6 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
-from src.agent.threads import clear_thread, get_latest_thread_state, get_thread_history
+from src.agent.threads import (
+    clear_thread,
+    get_latest_thread_state,
+    get_thread_history,
+    get_thread_token_usage,
+    get_thread_traces,
+)
+from src.token_usage.model.token_usage import ThreadTokenUsage
+from src.tracing.model.run_trace import RunTrace
 
 router = APIRouter()
 
@@ -50,6 +58,37 @@ async def get_thread_history_endpoint(thread_id: str):
         ) from e
 
 
+@router.get("/{thread_id}/traces", response_model=list[RunTrace])
+async def get_thread_traces_endpoint(
+    thread_id: str,
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    """
+    API endpoint to retrieve the execution traces of the latest runs of a thread
+    (node, LLM call and retrieval spans, retry and loop events), newest first.
+    """
+    try:
+        return await get_thread_traces(thread_id, limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Could not retrieve thread traces: {e}"
+        ) from e
+
+
+@router.get("/{thread_id}/usage", response_model=ThreadTokenUsage)
+async def get_thread_usage_endpoint(thread_id: str):
+    """
+    API endpoint to retrieve the tokens used by the LLM calls of all runs of a
+    thread, and what is left of its budget.
+    """
+    try:
+        return await get_thread_token_usage(thread_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Could not retrieve thread usage: {e}"
+        ) from e
+
+
 @router.delete("/{thread_id}")
 async def delete_thread_data(thread_id: str):
     try:
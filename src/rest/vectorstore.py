@@ -1,9 +1,11 @@
 import logging
+import math
 from typing import Annotated
 
 from fastapi import APIRouter, File, HTTPException, UploadFile
 from langchain_core.documents import Document
 
+from src.admission import Overloaded
 from src.agent import workflow
 
 logger = logging.getLogger(__name__)
@@ -65,12 +67,18 @@ async def upload_documents_to_vectorstore(
         if not documents:
             raise ValueError("No valid documents extracted from uploaded files.")
 
-        workflow.vector_manager.add_documents(documents)
+        await workflow.vector_manager.add_documents(documents)
 
         logger.info(
             f"Successfully added {len(documents)} documents to the vectorstore."
         )
         return f"Successfully added {len(documents)} documents."
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        ) from e
     except Exception as e:
         logger.error(
             f"Error uploading documents to vectorstore: {str(e)}", exc_info=True
@@ -4,15 +4,17 @@ from uuid import uuid4
 
 from langchain.llms.base import BaseLLM
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import BaseMessage, RemoveMessage, SystemMessage
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
+from langchain_core.messages import BaseMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig, RunnableSerializable
 
+from src.admission import AdmissionController, admission_controller
 from src.agent.model.graph_state import GraphState
+from src.common import estimate_tokens, rewrite_messages
 from src.config import env
-from src.llm.service import load_model
+from src.llm.service import DeadlineChains, load_chain, load_model
 from src.summarize.model.output import SummarizeOutput
+from src.token_usage import TokenUsage, with_usage
+from src.transcript import MessageTokenCounter, message_token_counter, render_transcript
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -33,44 +35,38 @@ def _ensure_ids(msgs: list[BaseMessage]) -> None:
             m.id = str(uuid4())
 
 
-def _clone_with_new_id(m: BaseMessage) -> BaseMessage:
-    mc = m.model_copy(deep=True)  # pydantic copy
-    mc.id = str(uuid4())
-    return mc
-
-
 class Summarizer:
-    model: BaseLLM | BaseChatModel
     prompt: str
-    chain: RunnableSerializable
+    chains: DeadlineChains
+    token_counter: MessageTokenCounter
+    admission: AdmissionController
 
     def __init__(self):
-        self.model = load_model(
-            env.SUMMARIZE_LLM_PROVIDER,
+        self.token_counter = message_token_counter
+        self.admission = admission_controller(
+            env.SUMMARIZE_LLM_PROVIDER.value,
             env.SUMMARIZE_LLM_MODEL_NAME,
-            env.SUMMARIZE_LLM_API_KEY,
-            model_stop=env.SUMMARIZE_LLM_STOP,
-            model_temperature=env.SUMMARIZE_LLM_TEMPERATURE,
-            **env.SUMMARIZE_LLM_KWARGS,
+            env.SUMMARIZE_LLM_REQUESTS_PER_MINUTE,
+            env.SUMMARIZE_LLM_TOKENS_PER_MINUTE,
         )
         # make sure prompt is loaded before building the chain
         self.prompt = self._load_prompt()
-        self.chain = self._load_chain()
+        self.chains = DeadlineChains(self._load_chain)
 
-    def summarize_conditionally(
+    async def summarize_conditionally(
         self, state: GraphState, config: RunnableConfig | None = None
     ):
-        total = len(state.messages)
-        keep = state.summarize_message_keep
-        window = state.summarize_message_window
-
-        pre_keep = max(0, total - keep)
-        if pre_keep < window:
-            return  # don’t summarize until there’s enough history
+        if state.summarize_token_threshold is not None:
+            pre_keep = self._token_keep_start(state, state.summarize_token_threshold)
+        else:
+            pre_keep = self._message_keep_start(state)
+        if pre_keep is None:
+            # don’t summarize until there’s enough history
+            self._store_token_counts(state)
+            return
 
         # 1) Split: everything before the keep-tail will be summarized (subject to the flag)
         pre_region = state.messages[:pre_keep]
-        keep_tail = state.messages[pre_keep:]
 
         # 2) Ensure every message has an id (so RemoveMessage can match)
         _ensure_ids(state.messages)
@@ -85,51 +81,92 @@ class Summarizer:
 
         # If there’s nothing to summarize (e.g., only system messages), skip work
         if not to_summarize:
+            self._store_token_counts(state)
             return
 
         # 4) Produce the summary text/object ONLY from the chosen set
-        summary = self.summarize(to_summarize, config)
-
-        # 5) Build a single reducer update:
-        #    - remove ALL current messages (so we control final order deterministically)
-        ops: list[BaseMessage] = [RemoveMessage(id=m.id) for m in state.messages]  # type: ignore[assignment]
-
-        #    - re-add preserved system messages (fresh ids to avoid clashes with RemoveMessage)
-        system_head_fresh = []
-        for m in system_head:
-            mc = m.model_copy(deep=True)
-            mc.id = str(uuid4())
-            system_head_fresh.append(mc)
-
-        #    - append synthetic summary as a SystemMessage (fresh id)
-        # summary_msg = AIMessage(
-        #     content=summary.summary,  # or summary.text if you prefer plain text
-        # )
+        usage = TokenUsage()
+        try:
+            summary = await self.summarize(to_summarize, config, usage)
+        finally:
+            state.record_token_usage(usage)
+
+        # 5) Collapse the pre-region into the preserved system messages followed
+        #    by the summary, in place: `add_messages` leaves the keep-tail (and its
+        #    ids, so its cached renders and token counts) untouched
         summary_msg = BaseMessage(
             content=summary.summary,  # or summary.text if you prefer plain text
             type="summary",
         )
-
-        #    - re-add keep-tail (fresh ids)
-        keep_tail_fresh = []
-        for m in keep_tail:
-            mc = m.model_copy(deep=True)
-            mc.id = str(uuid4())
-            keep_tail_fresh.append(mc)
-
-        ops.extend(system_head_fresh)
-        ops.append(summary_msg)
-        ops.extend(keep_tail_fresh)
+        collapsed = [*system_head, summary_msg]
+        replacements: dict[int, BaseMessage | None] = {
+            idx: collapsed[idx] if idx < len(collapsed) else None
+            for idx, m in enumerate(pre_region)
+            if idx >= len(collapsed) or collapsed[idx] is not m
+        }
 
         # 6) One assignment so downstream reducers see a single atomic rewrite
+        kept = [m for idx, m in enumerate(state.messages) if idx not in replacements]
+        ops = rewrite_messages(state.messages, replacements)
+        if state.summarize_token_threshold is not None:
+            ops += self.token_counter.with_stored_counts(kept)
         state.messages = ops
 
-    def summarize(
+    def _store_token_counts(self, state: GraphState) -> None:
+        """
+        Keep the token counts of the history with the thread, so the token
+        trigger never tokenizes its messages again (on any worker).
+        """
+        if state.summarize_token_threshold is None:
+            return
+        ops = self.token_counter.with_stored_counts(state.messages)
+        if ops:
+            state.messages = ops
+
+    def _message_keep_start(self, state: GraphState) -> int | None:
+        """Start of the keep tail, once a full window precedes it."""
+        pre_keep = max(0, len(state.messages) - state.summarize_message_keep)
+        if pre_keep < state.summarize_message_window:
+            return None
+        return pre_keep
+
+    def _token_keep_start(self, state: GraphState, threshold: int) -> int | None:
+        """
+        Start of the keep tail, once the history is over the token threshold.
+        The tail holds the latest messages fitting in `summarize_token_keep`.
+        """
+        # Preserved system messages never shrink, so they must not trigger it
+        counted = [
+            m
+            for m in state.messages
+            if state.summarize_system_messages or not _is_system(m)
+        ]
+        if self.token_counter.count(counted) <= threshold:
+            return None
+
+        pre_keep = len(state.messages) - 1  # Always keep the last message
+        kept = self.token_counter.count_message(state.messages[-1])
+        while pre_keep > 0:
+            tokens = self.token_counter.count_message(state.messages[pre_keep - 1])
+            if kept + tokens > state.summarize_token_keep:
+                break
+            kept += tokens
+            pre_keep -= 1
+        return pre_keep if pre_keep > 0 else None
+
+    async def summarize(
         self,
         query: list,
         config: RunnableConfig | None = None,
+        usage: TokenUsage | None = None,
     ) -> SummarizeOutput:
-        response = self.chain.invoke({"query": query}, config=config)
+        """Raises `Overloaded` when the model admits no more calls."""
+        prompt = render_transcript(query)
+        async with self.admission.admit(estimate_tokens(prompt), usage):
+            chain = self.chains.for_config(config)
+            response = await with_usage(chain, usage).ainvoke(
+                {"query": prompt}, config=config
+            )
         return SummarizeOutput.model_validate(response)
 
     def _load_prompt(self) -> str:
@@ -150,15 +187,21 @@ class Summarizer:
                 f"Neither prompts/summarize.md nor prompts/{fallback_file} found."
             )
 
-    def _load_chain(self):
-        parser = JsonOutputParser(pydantic_object=SummarizeOutput)
-        prompt = PromptTemplate(
-            template=f"{self.prompt}",
-            input_variables=[
-                "query",
-            ],
-            output_parser=parser,
-            partial_variables={"format_instructions": parser.get_format_instructions()},
+    def _load_model(self, timeout: int) -> BaseLLM | BaseChatModel:
+        return load_model(
+            env.SUMMARIZE_LLM_PROVIDER,
+            env.SUMMARIZE_LLM_MODEL_NAME,
+            env.SUMMARIZE_LLM_API_KEY,
+            model_stop=env.SUMMARIZE_LLM_STOP,
+            model_temperature=env.SUMMARIZE_LLM_TEMPERATURE,
+            model_timeout=timeout,
+            **env.SUMMARIZE_LLM_KWARGS,
+        )
+
+    def _load_chain(self, timeout: int) -> RunnableSerializable:
+        return load_chain(
+            self.prompt,
+            self._load_model(timeout),
+            env.SUMMARIZE_LLM_PROVIDER,
+            SummarizeOutput,
         )
-        chain = prompt | self.model | parser
-        return chain
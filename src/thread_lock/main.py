@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import cast
+
+from psycopg import AsyncConnection
+from psycopg.rows import DictRow, dict_row
+
+from src.config import env
+from src.metrics.main import THREAD_LOCK_WAIT
+from src.thread_lock.model.thread_lock_policy import ThreadLockPolicy
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+# Namespaces the advisory lock keys, which share one space with other apps
+_ADVISORY_KEY_PREFIX = "lia:thread:"
+
+
+class ThreadBusy(Exception):
+    """Another run of the thread is in progress."""
+
+
+class ThreadLocks:
+    """
+    Serializes the runs of each thread: an asyncio lock within the worker and,
+    with Postgres, an advisory lock across workers and nodes.
+
+    Advisory locks are held on a connection of their own, apart from the
+    checkpointer's, since they belong to the session that took them: they are
+    released if the worker dies. They are taken with `pg_try_advisory_lock`
+    and polled, since that one connection serves every thread and must not
+    block on a single lock.
+    """
+
+    def __init__(
+        self,
+        policy: ThreadLockPolicy | None = None,
+        timeout: float | None = None,
+        poll_interval: float | None = None,
+    ):
+        self.enabled = env.THREAD_LOCK_ENABLED
+        self.policy = policy or ThreadLockPolicy(env.THREAD_LOCK_POLICY)
+        self.timeout = env.THREAD_LOCK_TIMEOUT if timeout is None else timeout
+        self.poll_interval = poll_interval or env.THREAD_LOCK_POLL_INTERVAL
+        self._conn: AsyncConnection[DictRow] | None = None
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._users: Counter[str] = Counter()
+
+    async def setup(self, uri: str | None) -> None:
+        """Lock across workers through Postgres, when available."""
+        if not uri or self._conn is not None:
+            return
+        conn = await AsyncConnection.connect(uri, autocommit=True, prepare_threshold=0)
+        conn.row_factory = dict_row  # type: ignore[assignment]
+        self._conn = cast(AsyncConnection[DictRow], conn)
+
+    async def close(self) -> None:
+        """Close the lock connection, which releases the locks still held."""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    @asynccontextmanager
+    async def hold(
+        self, thread_id: str, max_wait: float | None = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold the thread's lock within the block, waiting at most `max_wait`
+        seconds (or the lock timeout) under the `queue` policy.
+
+        Raises `ThreadBusy` when it cannot be acquired.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        timeout = 0.0 if self.policy == ThreadLockPolicy.reject else self.timeout
+        if max_wait is not None:
+            timeout = max(min(timeout, max_wait), 0)
+        started = time.perf_counter()
+
+        lock = self._locks.setdefault(thread_id, asyncio.Lock())
+        self._users[thread_id] += 1
+        try:
+            await self._acquire_local(thread_id, lock, timeout, started)
+            try:
+                advisory = await self._acquire_advisory(thread_id, timeout, started)
+                THREAD_LOCK_WAIT.labels("acquired").observe(
+                    time.perf_counter() - started
+                )
+                try:
+                    yield
+                finally:
+                    if advisory:
+                        await self._release_advisory(thread_id)
+            finally:
+                lock.release()
+        finally:
+            self._users[thread_id] -= 1
+            if not self._users[thread_id]:
+                del self._users[thread_id]
+                self._locks.pop(thread_id, None)
+
+    # ---------- internal helpers ---------- #
+    async def _acquire_local(
+        self, thread_id: str, lock: asyncio.Lock, timeout: float, started: float
+    ) -> None:
+        if timeout <= 0:
+            if lock.locked():
+                self._busy(thread_id, started)
+            await lock.acquire()
+            return
+        try:
+            async with asyncio.timeout(timeout):
+                await lock.acquire()
+        except TimeoutError:
+            self._busy(thread_id, started)
+
+    async def _acquire_advisory(
+        self, thread_id: str, timeout: float, started: float
+    ) -> bool:
+        """Whether the advisory lock was taken (`False` without Postgres)."""
+        if self._conn is None:
+            return False
+        while True:
+            try:
+                cursor = await self._conn.execute(
+                    "SELECT pg_try_advisory_lock(hashtextextended(%s, 0)) AS locked",
+                    (_ADVISORY_KEY_PREFIX + thread_id,),
+                )
+                row = await cursor.fetchone()
+            except Exception as e:
+                # The worker's own lock still holds; do not fail the message
+                logger.warning(f"Could not lock thread {thread_id} in Postgres: {e}")
+                return False
+            if row is not None and row["locked"]:
+                return True
+            if time.perf_counter() - started + self.poll_interval > timeout:
+                self._busy(thread_id, started)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _release_advisory(self, thread_id: str) -> None:
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(
+                "SELECT pg_advisory_unlock(hashtextextended(%s, 0))",
+                (_ADVISORY_KEY_PREFIX + thread_id,),
+            )
+        except Exception as e:
+            # Released with the session anyway if the connection is gone
+            logger.warning(f"Could not release the lock of thread {thread_id}: {e}")
+
+    def _busy(self, thread_id: str, started: float) -> None:
+        outcome = "rejected" if self.policy == ThreadLockPolicy.reject else "timeout"
+        THREAD_LOCK_WAIT.labels(outcome).observe(time.perf_counter() - started)
+        raise ThreadBusy(f"Thread {thread_id} is busy with another message.")
+
+
+thread_locks = ThreadLocks()
@@ -0,0 +1 @@
+from .thread_lock_policy import *
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class ThreadLockPolicy(Enum):
+    queue = "queue"  # Wait for the thread's run in progress (up to a timeout)
+    reject = "reject"  # Fail right away while the thread is busy
@@ -0,0 +1,88 @@
+from typing import Any, Literal
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable
+
+from src.common.estimate_tokens import estimate_tokens
+from src.metrics.metrics_callback_handler import token_usage
+from src.token_usage.model.token_usage import TokenUsage
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Adds the tokens of every LLM call it sees to `usage`. Providers that report
+    no usage (e.g. some streaming APIs) are counted with `estimate_tokens`.
+    """
+
+    run_inline = True
+
+    def __init__(self, usage: TokenUsage) -> None:
+        self.usage = usage
+        self._estimated_inputs: dict[UUID, int] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        self._estimated_inputs[run_id] = sum(
+            estimate_tokens(get_buffer_string(m)) for m in messages
+        )
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        self._estimated_inputs[run_id] = sum(estimate_tokens(p) for p in prompts)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        estimated_input = self._estimated_inputs.pop(run_id, 0)
+        input_tokens, output_tokens = token_usage(response)
+        if not input_tokens and not output_tokens:
+            input_tokens = estimated_input
+            output_tokens = sum(
+                estimate_tokens(generation.text)
+                for generations in response.generations
+                for generation in generations
+            )
+            self.usage.estimated_calls += 1
+
+        self.usage.input_tokens += input_tokens
+        self.usage.output_tokens += output_tokens
+        self.usage.calls += 1
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._estimated_inputs.pop(run_id, None)
+
+
+def with_usage(chain: Runnable, usage: TokenUsage | None) -> Runnable:
+    """`chain`, adding the tokens of its LLM calls to `usage` when given."""
+    if usage is None:
+        return chain
+    return chain.with_config(callbacks=[UsageCallbackHandler(usage)])
+
+
+def exhausted_budget(
+    run_usage: TokenUsage,
+    run_budget: int | None,
+    thread_usage: TokenUsage,
+    thread_budget: int | None,
+) -> Literal["run", "thread"] | None:
+    """Which token budget, if any, has been used up."""
+    if run_budget is not None and run_usage.total_tokens >= run_budget:
+        return "run"
+    if thread_budget is not None and thread_usage.total_tokens >= thread_budget:
+        return "thread"
+    return None
@@ -0,0 +1 @@
+from .token_usage import *
@@ -0,0 +1,35 @@
+from pydantic import BaseModel, Field
+
+
+class TokenUsage(BaseModel):
+    """Tokens used by LLM calls, as reported by the providers."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    calls: int = Field(default=0, description="Number of LLM calls.")
+    estimated_calls: int = Field(
+        default=0,
+        description="Calls whose provider reported no usage, counted with an estimate.",
+    )
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, other: "TokenUsage") -> None:
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.calls += other.calls
+        self.estimated_calls += other.estimated_calls
+
+
+class ThreadTokenUsage(BaseModel):
+    thread_id: str
+    usage: TokenUsage = Field(description="Usage of every run of the thread.")
+    total_tokens: int
+    budget: int | None = Field(
+        default=None, description="Token budget of the thread (`THREAD_TOKEN_BUDGET`)."
+    )
+    remaining: int | None = Field(
+        default=None, description="Tokens left in the budget, if there is one."
+    )
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, cast
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tracers.context import register_configure_hook
+from psycopg import AsyncConnection
+from psycopg.rows import DictRow, dict_row
+
+from src.config import env
+from src.tracing.model.run_trace import RunTrace, Span, SpanKind, TraceEvent
+from src.tracing.otlp_json_exporter import OtlpJsonFileExporter
+from src.tracing.trace_callback_handler import TraceCallbackHandler
+from src.tracing.trace_store import InMemoryTraceStore, PostgresTraceStore, TraceStore
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+# Trace of the graph run in progress; `None` outside runs or with tracing off
+current_trace_var: ContextVar[RunTrace | None] = ContextVar(
+    "current_trace", default=None
+)
+trace_handler_var: ContextVar[TraceCallbackHandler | None] = ContextVar(
+    "trace_handler", default=None
+)
+# Attach the run's handler to every runnable configured while it is set
+register_configure_hook(trace_handler_var, inheritable=True)
+
+
+class Tracer:
+    """
+    Records a compact trace of every graph run: node and LLM call spans (from
+    callbacks), retrieval spans and retry/loop events (from the nodes).
+
+    Finished traces are queued and written in batches by a background task, on
+    a connection of their own, so storing them never delays the response.
+    """
+
+    enabled: bool
+    store: TraceStore
+    exporter: OtlpJsonFileExporter | None
+
+    def __init__(self):
+        self.enabled = env.TRACES_ENABLED
+        self.store = InMemoryTraceStore(env.TRACE_RETENTION)
+        self.exporter = (
+            OtlpJsonFileExporter(env.TRACE_EXPORT_PATH)
+            if env.TRACE_EXPORT_PATH
+            else None
+        )
+        self._conn: AsyncConnection[DictRow] | None = None
+        self._pending: asyncio.Queue[RunTrace] | None = None
+        self._writer: asyncio.Task[None] | None = None
+
+    async def setup(self, uri: str | None) -> None:
+        """Keep traces in Postgres, next to the checkpoints, when available."""
+        if not uri or self._conn is not None:
+            return
+        conn = await AsyncConnection.connect(uri, autocommit=True, prepare_threshold=0)
+        conn.row_factory = dict_row  # type: ignore[assignment]
+        self._conn = cast(AsyncConnection[DictRow], conn)
+        store = PostgresTraceStore(self._conn, env.TRACE_RETENTION)
+        await store.setup()
+        self.store = store
+
+    @asynccontextmanager
+    async def run(
+        self, config: RunnableConfig, chat_interface: str
+    ) -> AsyncIterator[RunTrace | None]:
+        """Trace the graph run within the block, then queue it for storage."""
+        if not self.enabled:
+            yield None
+            return
+
+        thread_id = str(config.get("configurable", {}).get("thread_id", ""))
+        trace = RunTrace(thread_id=thread_id, chat_interface=chat_interface)
+        trace_token = current_trace_var.set(trace)
+        handler_token = trace_handler_var.set(TraceCallbackHandler(trace))
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = str(e) or type(e).__name__
+            raise
+        finally:
+            trace_handler_var.reset(handler_token)
+            current_trace_var.reset(trace_token)
+            trace.end_time = time.time()
+            self._queue(trace)
+
+    async def list(self, thread_id: str, limit: int) -> list[RunTrace]:
+        # Include the runs that finished but were not written yet
+        await self.flush()
+        return await self.store.list(thread_id, limit)
+
+    async def delete(self, thread_id: str) -> None:
+        # Otherwise a queued trace would bring the thread back
+        await self.flush()
+        await self.store.delete(thread_id)
+
+    async def flush(self) -> None:
+        """Wait until every queued trace is written."""
+        if self._pending is not None and self._writer_running():
+            await self._pending.join()
+
+    async def close(self) -> None:
+        """Write the queued traces, then stop the writer and close the connection."""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    # ---------- internal helpers ---------- #
+    def _queue(self, trace: RunTrace) -> None:
+        if self._pending is None or not self._writer_running():
+            self._pending = asyncio.Queue(maxsize=env.TRACE_QUEUE_SIZE)
+            self._writer = asyncio.create_task(self._write_pending(self._pending))
+        try:
+            self._pending.put_nowait(trace)
+        except asyncio.QueueFull:
+            # A trace is diagnostics: drop it rather than hold the run
+            logger.warning(f"Trace queue full, dropping trace {trace.trace_id}.")
+
+    def _writer_running(self) -> bool:
+        # The writer belongs to the loop it was started on
+        return (
+            self._writer is not None
+            and not self._writer.done()
+            and self._writer.get_loop() is asyncio.get_running_loop()
+        )
+
+    async def _write_pending(self, pending: asyncio.Queue[RunTrace]) -> None:
+        while True:
+            batch = [await pending.get()]
+            while len(batch) < env.TRACE_WRITE_BATCH and not pending.empty():
+                batch.append(pending.get_nowait())
+            try:
+                await self._save(batch)
+            finally:
+                for _ in batch:
+                    pending.task_done()
+
+    async def _save(self, traces: list[RunTrace]) -> None:
+        # A trace is diagnostics: losing one must not stop the writer
+        try:
+            await self.store.save(traces)
+            if self.exporter is not None:
+                for trace in traces:
+                    await self.exporter.export(trace)
+        except Exception as e:
+            logger.warning(f"Could not save {len(traces)} trace(s): {e}")
+
+
+tracer = Tracer()
+
+
+@contextmanager
+def trace_span(kind: SpanKind, name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    Add a span to the current run's trace, nested under the node running it.
+    Yields `None` outside traced runs.
+    """
+    trace = current_trace_var.get()
+    if trace is None:
+        yield None
+        return
+
+    span = Span(
+        kind=kind,
+        name=name,
+        parent_span_id=_open_node_span_id(trace),
+        attributes=attributes,
+    )
+    trace.spans.append(span)
+    try:
+        yield span
+    except Exception as e:
+        span.error = str(e)
+        raise
+    finally:
+        span.end_time = time.time()
+
+
+def record_trace_event(name: str, **attributes: Any) -> None:
+    """Add a `retry`, `loop` or `budget` event to the current run's trace, if any."""
+    trace = current_trace_var.get()
+    if trace is not None:
+        trace.events.append(TraceEvent(name=name, attributes=attributes))
+
+
+def _open_node_span_id(trace: RunTrace) -> str | None:
+    # Nodes of a run execute one at a time, so the open one is the caller's
+    for span in reversed(trace.spans):
+        if span.kind == SpanKind.node and span.end_time is None:
+            return span.span_id
+    return None
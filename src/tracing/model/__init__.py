@@ -0,0 +1 @@
+from .run_trace import *
@@ -0,0 +1,61 @@
+import secrets
+import time
+import uuid
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel, Field, computed_field
+
+
+class SpanKind(Enum):
+    node = "node"  # A graph node run.
+    llm = "llm"  # A call to an LLM.
+    retrieval = "retrieval"  # A vectorstore lookup.
+
+
+class Span(BaseModel):
+    span_id: str = Field(default_factory=lambda: secrets.token_hex(8))
+    parent_span_id: str | None = None
+    kind: SpanKind
+    name: str
+    start_time: float = Field(
+        default_factory=time.time, description="Unix time, in seconds."
+    )
+    end_time: float | None = None
+    error: str | None = None
+    attributes: dict[str, Any] = Field(default_factory=dict)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def duration_ms(self) -> float | None:
+        if self.end_time is None:
+            return None
+        return round((self.end_time - self.start_time) * 1000, 3)
+
+
+class TraceEvent(BaseModel):
+    name: str = Field(description="`retry` or `loop`.")
+    time: float = Field(default_factory=time.time, description="Unix time, in seconds.")
+    attributes: dict[str, Any] = Field(default_factory=dict)
+
+
+class RunTrace(BaseModel):
+    """Timeline of one graph run on a thread."""
+
+    trace_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    thread_id: str
+    chat_interface: str
+    start_time: float = Field(
+        default_factory=time.time, description="Unix time, in seconds."
+    )
+    end_time: float | None = None
+    error: str | None = None
+    spans: list[Span] = Field(default_factory=list)
+    events: list[TraceEvent] = Field(default_factory=list)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def duration_ms(self) -> float | None:
+        if self.end_time is None:
+            return None
+        return round((self.end_time - self.start_time) * 1000, 3)
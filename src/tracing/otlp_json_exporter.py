@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Any
+
+from src.tracing.model.run_trace import RunTrace, Span, SpanKind
+
+_SCOPE = {"name": "lia.tracing"}
+# OTLP span kinds
+_SPAN_KIND_INTERNAL = 1
+_SPAN_KIND_CLIENT = 3
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+def to_otlp_json(trace: RunTrace, service_name: str = "lia") -> dict[str, Any]:
+    """
+    Encode `trace` as an OTLP/JSON `ExportTraceServiceRequest`, with the run as
+    the root span and its retry/loop events attached to it.
+    """
+    root = {
+        "traceId": trace.trace_id,
+        "spanId": trace.trace_id[:16],
+        "name": "graph_run",
+        "kind": _SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": _nanos(trace.start_time),
+        "endTimeUnixNano": _nanos(trace.end_time or trace.start_time),
+        "attributes": _attributes(
+            {"thread_id": trace.thread_id, "chat_interface": trace.chat_interface}
+        ),
+        "events": [
+            {
+                "timeUnixNano": _nanos(event.time),
+                "name": event.name,
+                "attributes": _attributes(event.attributes),
+            }
+            for event in trace.events
+        ],
+        "status": _status(trace.error),
+    }
+    spans = [root] + [_span(trace, span, root["spanId"]) for span in trace.spans]
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _attributes({"service.name": service_name})},
+                "scopeSpans": [{"scope": _SCOPE, "spans": spans}],
+            }
+        ]
+    }
+
+
+class OtlpJsonFileExporter:
+    """Appends each trace as one OTLP/JSON line, like the collector's file exporter."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    async def export(self, trace: RunTrace) -> None:
+        line = json.dumps(to_otlp_json(trace), separators=(",", ":")) + "\n"
+        await asyncio.to_thread(self._write, line)
+
+    def _write(self, line: str) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def _span(trace: RunTrace, span: Span, root_span_id: str) -> dict[str, Any]:
+    return {
+        "traceId": trace.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_span_id or root_span_id,
+        "name": span.name,
+        "kind": _SPAN_KIND_INTERNAL if span.kind == SpanKind.node else _SPAN_KIND_CLIENT,
+        "startTimeUnixNano": _nanos(span.start_time),
+        "endTimeUnixNano": _nanos(span.end_time or span.start_time),
+        "attributes": _attributes({"kind": span.kind.value, **span.attributes}),
+        "status": _status(span.error),
+    }
+
+
+def _status(error: str | None) -> dict[str, Any]:
+    if error is None:
+        return {"code": _STATUS_OK}
+    return {"code": _STATUS_ERROR, "message": error}
+
+
+def _nanos(seconds: float) -> str:
+    # 64-bit integers are strings in OTLP/JSON
+    return str(int(seconds * 1_000_000_000))
+
+
+def _attributes(values: dict[str, Any]) -> list[dict[str, Any]]:
+    return [
+        {"key": key, "value": _any_value(value)}
+        for key, value in values.items()
+        if value is not None
+    ]
+
+
+def _any_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
@@ -0,0 +1,128 @@
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from src.common import graph_node
+from src.metrics.metrics_callback_handler import token_usage
+from src.tracing.model.run_trace import RunTrace, Span, SpanKind
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Adds node and LLM call spans to the trace of one run."""
+
+    run_inline = True
+
+    def __init__(self, trace: RunTrace) -> None:
+        self.trace = trace
+        self._parents: dict[UUID, UUID | None] = {}
+        self._spans: dict[UUID, Span] = {}
+
+    # ---------- graph nodes ---------- #
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._parents[run_id] = parent_run_id
+        node = graph_node(metadata, kwargs)
+        if node is not None:
+            step = (metadata or {}).get("langgraph_step")
+            self._start(run_id, SpanKind.node, node, {"step": step})
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id, error)
+
+    # ---------- LLM calls ---------- #
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, parent_run_id, serialized, metadata)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, parent_run_id, serialized, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None:
+            input_tokens, output_tokens = token_usage(response)
+            span.attributes["input_tokens"] = input_tokens
+            span.attributes["output_tokens"] = output_tokens
+        self._end(run_id)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id, error)
+
+    # ---------- internal helpers ---------- #
+    def _start_llm(
+        self,
+        run_id: UUID,
+        parent_run_id: UUID | None,
+        serialized: dict[str, Any] | None,
+        metadata: dict[str, Any] | None,
+    ) -> None:
+        self._parents[run_id] = parent_run_id
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get(
+            "name", "unknown"
+        )
+        self._start(run_id, SpanKind.llm, "llm", {"model": str(model)})
+
+    def _start(
+        self, run_id: UUID, kind: SpanKind, name: str, attributes: dict[str, Any]
+    ) -> None:
+        span = Span(
+            kind=kind,
+            name=name,
+            parent_span_id=self._enclosing_span_id(run_id),
+            attributes=attributes,
+        )
+        self._spans[run_id] = span
+        self.trace.spans.append(span)
+
+    def _end(self, run_id: UUID, error: BaseException | None = None) -> None:
+        self._parents.pop(run_id, None)
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end_time = time.time()
+            if error is not None:
+                span.error = str(error)
+
+    def _enclosing_span_id(self, run_id: UUID) -> str | None:
+        parent = self._parents.get(run_id)
+        while parent is not None:
+            span = self._spans.get(parent)
+            if span is not None:
+                return span.span_id
+            parent = self._parents.get(parent)
+        return None
@@ -0,0 +1,124 @@
+import json
+from collections import defaultdict, deque
+from typing import Protocol
+
+from psycopg import AsyncConnection
+from psycopg.rows import DictRow
+from psycopg.types.json import Jsonb
+
+from src.tracing.model.run_trace import RunTrace
+
+
+class TraceStore(Protocol):
+    async def save(self, traces: list[RunTrace]) -> None: ...
+
+    async def list(self, thread_id: str, limit: int) -> list[RunTrace]: ...
+
+    async def delete(self, thread_id: str) -> None: ...
+
+
+class InMemoryTraceStore:
+    """Keeps the last `retention` traces of each thread in this process."""
+
+    def __init__(self, retention: int):
+        self._traces: dict[str, deque[RunTrace]] = defaultdict(
+            lambda: deque(maxlen=retention)
+        )
+
+    async def save(self, traces: list[RunTrace]) -> None:
+        for trace in traces:
+            self._traces[trace.thread_id].append(trace)
+
+    async def list(self, thread_id: str, limit: int) -> list[RunTrace]:
+        traces = self._traces.get(thread_id, ())
+        return list(reversed(traces))[:limit]
+
+    async def delete(self, thread_id: str) -> None:
+        self._traces.pop(thread_id, None)
+
+
+class PostgresTraceStore:
+    """
+    Stores traces next to the checkpoints, keeping the last `retention` per
+    thread. Owns its connection, so trace writes never queue behind (or
+    interleave with) the checkpointer's.
+    """
+
+    def __init__(self, conn: AsyncConnection[DictRow], retention: int):
+        self.conn = conn
+        self.retention = retention
+
+    async def setup(self) -> None:
+        await self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS run_traces (
+                trace_id TEXT PRIMARY KEY,
+                thread_id TEXT NOT NULL,
+                start_time DOUBLE PRECISION NOT NULL,
+                trace JSONB NOT NULL
+            )
+            """
+        )
+        await self.conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS run_traces_thread_id_start_time_idx
+            ON run_traces (thread_id, start_time DESC)
+            """
+        )
+
+    async def save(self, traces: list[RunTrace]) -> None:
+        """Insert a batch of traces, then prune each of their threads once."""
+        async with self.conn.transaction():
+            async with self.conn.cursor() as cursor:
+                await cursor.executemany(
+                    """
+                    INSERT INTO run_traces (trace_id, thread_id, start_time, trace)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    [
+                        (
+                            trace.trace_id,
+                            trace.thread_id,
+                            trace.start_time,
+                            Jsonb(trace.model_dump(mode="json")),
+                        )
+                        for trace in traces
+                    ],
+                )
+                await cursor.executemany(
+                    """
+                    DELETE FROM run_traces
+                    WHERE thread_id = %s AND trace_id NOT IN (
+                        SELECT trace_id FROM run_traces
+                        WHERE thread_id = %s
+                        ORDER BY start_time DESC
+                        LIMIT %s
+                    )
+                    """,
+                    [
+                        (thread_id, thread_id, self.retention)
+                        for thread_id in dict.fromkeys(t.thread_id for t in traces)
+                    ],
+                )
+
+    async def list(self, thread_id: str, limit: int) -> list[RunTrace]:
+        cursor = await self.conn.execute(
+            """
+            SELECT trace FROM run_traces
+            WHERE thread_id = %s
+            ORDER BY start_time DESC
+            LIMIT %s
+            """,
+            (thread_id, limit),
+        )
+        rows = await cursor.fetchall()
+        return [RunTrace.model_validate(_load(row["trace"])) for row in rows]
+
+    async def delete(self, thread_id: str) -> None:
+        await self.conn.execute(
+            "DELETE FROM run_traces WHERE thread_id = %s", (thread_id,)
+        )
+
+
+def _load(value: dict | str) -> dict:
+    return json.loads(value) if isinstance(value, str) else value
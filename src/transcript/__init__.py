@@ -0,0 +1,2 @@
+from .main import *
+from .token_counter import *
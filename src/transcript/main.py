@@ -0,0 +1,118 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+
+from src.common import estimate_tokens, message_cache_key, remove_none_values
+from src.config import env
+from src.transcript.model.transcript_format import TranscriptFormat
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+_ROLES = {
+    "human": "user",
+    "ai": "assistant",
+    "system": "system",
+}
+
+
+class TranscriptRenderer:
+    """
+    Renders chat history into compact role-tagged turns for the chain prompts.
+
+    Only the semantic content of each message is kept (no ids,
+    `additional_kwargs` or `response_metadata`). Rendered turns are cached by
+    message id and revision (see `message_cache_key`), so unchanged history is
+    not re-rendered.
+    """
+
+    format: TranscriptFormat
+    cache_size: int
+
+    def __init__(
+        self,
+        transcript_format: TranscriptFormat | None = None,
+        cache_size: int | None = None,
+    ):
+        self.format = transcript_format or TranscriptFormat(env.TRANSCRIPT_FORMAT)
+        self.cache_size = (
+            env.TRANSCRIPT_CACHE_SIZE if cache_size is None else cache_size
+        )
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, messages: list[BaseMessage] | None) -> str:
+        messages = messages or []
+        if self.format == TranscriptFormat.raw:
+            return str(messages)
+
+        transcript = "\n".join(self.render_message(m) for m in messages)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Rendered {len(messages)} messages: ~{estimate_tokens(transcript)} "
+                f"tokens (raw repr ~{estimate_tokens(str(messages))} tokens)."
+            )
+        return transcript
+
+    def render_message(self, m: BaseMessage) -> str:
+        key = message_cache_key(m)
+        if key is not None:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    return cached
+
+        rendered = f"[{_ROLES.get(m.type, m.type)}] {self._render_content(m.content)}"
+
+        if key is not None and self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = rendered
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return rendered
+
+    def _render_content(self, content: str | list) -> str:
+        if isinstance(content, str):
+            return content
+        return "\n".join(self._render_part(part) for part in content)
+
+    def _render_part(self, part: Any) -> str:
+        if not isinstance(part, dict):
+            return str(part)
+
+        # Input messages (compact or legacy encoding)
+        if "data" in part:
+            return self._render_value(part["data"])
+        # LangChain text blocks
+        if part.get("type") == "text" and isinstance(part.get("text"), str):
+            return part["text"]
+
+        fields = remove_none_values(part)
+        # Plain responses carry nothing but the text
+        if fields.keys() == {"response"}:
+            return self._render_value(fields["response"])
+        return self._render_value(fields)
+
+    def _render_value(self, value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        return json.dumps(
+            value, ensure_ascii=False, separators=(",", ":"), default=str
+        )
+
+
+transcript_renderer = TranscriptRenderer()
+
+
+def render_transcript(messages: list[BaseMessage] | None) -> str:
+    """Render the chat history with the shared, cached renderer."""
+    return transcript_renderer.render(messages)
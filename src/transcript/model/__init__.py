@@ -0,0 +1 @@
+from .transcript_format import *
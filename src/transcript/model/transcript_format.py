@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class TranscriptFormat(Enum):
+    compact = "compact"  # Role-tagged turns with non-semantic fields stripped.
+    raw = "raw"  # Python repr of the message list.
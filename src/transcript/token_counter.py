@@ -0,0 +1,138 @@
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+from langchain_core.messages import BaseMessage
+
+from src.common import (
+    REVISION_KEY,
+    TOKEN_COUNT_KEY,
+    annotate_message,
+    estimate_tokens,
+    message_cache_key,
+)
+from src.config import env
+from src.transcript.main import TranscriptRenderer, transcript_renderer
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+
+class MessageTokenCounter:
+    """
+    Counts the tokens of messages as rendered into the chain prompts.
+
+    Counts are stored on the messages themselves (`with_stored_counts`), for
+    the revision and tokenizer they were made with, so they are checkpointed
+    with the thread and survive restarts and other workers. Messages without a
+    stored count yet fall back to a per-process cache keyed by message id and
+    revision, like the rendered turns. Either way, checking the size of a
+    history only tokenizes the messages added or rewritten since the last check.
+    """
+
+    encoding: str
+    cache_size: int
+
+    def __init__(
+        self,
+        renderer: TranscriptRenderer | None = None,
+        encoding: str | None = None,
+        cache_size: int | None = None,
+    ):
+        self.renderer = renderer or transcript_renderer
+        self.cache_size = (
+            env.TRANSCRIPT_CACHE_SIZE if cache_size is None else cache_size
+        )
+        self.encoding = env.TOKENIZER_ENCODING if encoding is None else encoding
+        # Loaded on first use: tiktoken may have to fetch the encoding
+        self._tokenize: Callable[[str], int] | None = None
+        self._cache: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, messages: list[BaseMessage]) -> int:
+        return sum(self.count_message(m) for m in messages)
+
+    @property
+    def tokenizer(self) -> str:
+        """What the counts depend on, besides the message content."""
+        return f"{self.encoding or 'estimate'}/{self.renderer.format.value}"
+
+    def count_message(self, m: BaseMessage) -> int:
+        stored = self._stored_count(m)
+        if stored is not None:
+            return stored
+
+        key = message_cache_key(m)
+        if key is not None:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    return cached
+
+        if self._tokenize is None:
+            self._tokenize = _load_tokenizer(self.encoding)
+        tokens = self._tokenize(self.renderer.render_message(m))
+
+        if key is not None and self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = tokens
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return tokens
+
+    def with_stored_counts(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """
+        Copies of the messages without a stored count, with it stored: an
+        `add_messages` update keeping the counts with the thread.
+        """
+        return [
+            annotate_message(
+                m,
+                **{
+                    TOKEN_COUNT_KEY: {
+                        "revision": m.additional_kwargs.get(REVISION_KEY, 0),
+                        "tokenizer": self.tokenizer,
+                        "tokens": self.count_message(m),
+                    }
+                },
+            )
+            for m in messages
+            if m.id is not None and self._stored_count(m) is None
+        ]
+
+    def _stored_count(self, m: BaseMessage) -> int | None:
+        stored = m.additional_kwargs.get(TOKEN_COUNT_KEY)
+        # Counts of a previous revision, or another tokenizer, do not apply
+        if (
+            not isinstance(stored, dict)
+            or stored.get("revision") != m.additional_kwargs.get(REVISION_KEY, 0)
+            or stored.get("tokenizer") != self.tokenizer
+        ):
+            return None
+        return stored.get("tokens")
+
+
+def _load_tokenizer(encoding: str) -> Callable[[str], int]:
+    """A tiktoken encoding's token count, or the character estimate."""
+    if not encoding:
+        return estimate_tokens
+    try:
+        import tiktoken
+
+        tokenizer = tiktoken.get_encoding(encoding)
+    except Exception as e:
+        # tiktoken fetches encodings on first use, which fails offline
+        logger.warning(
+            f"Could not load the {encoding} tokenizer ({e}); estimating tokens "
+            "from the text length instead."
+        )
+        return estimate_tokens
+    return lambda text: len(tokenizer.encode(text, disallowed_special=()))
+
+
+message_token_counter = MessageTokenCounter()
@@ -3,10 +3,21 @@ from typing import Any
 
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
 from langchain_milvus import Milvus
 
+from src.admission import AdmissionController, Priority, admission_controller
+from src.common import estimate_tokens
 from src.config import env
 from src.llm.service import load_embedding
+from src.metrics.main import (
+    RETRIEVAL_LATENCY,
+    RETRIEVED_DOCUMENTS,
+    chat_interface_label,
+    observe_duration,
+)
+from src.tracing.main import trace_span
+from src.tracing.model.run_trace import SpanKind
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -21,8 +32,9 @@ class VectorManager:
     insertion, and deletion of documents for RAG systems.
     """
 
-    vectorstore: Milvus
+    vectorstore: VectorStore
     embeddings_model: Embeddings
+    admission: AdmissionController
 
     def __init__(self):
         """
@@ -33,16 +45,24 @@ class VectorManager:
             env.TEXT_EMBEDDING_API_KEY,
             env.TEXT_EMBEDDING_MODEL_NAME,
         )
+        self.admission = admission_controller(
+            env.TEXT_EMBEDDING_PROVIDER.value, env.TEXT_EMBEDDING_MODEL_NAME
+        )
         self.vectorstore = self._load_vectorstore()
 
-    def _load_vectorstore(self) -> Milvus:
+    def _load_vectorstore(self) -> VectorStore:
         """
         Private method to initialize the Milvus vector store connection
         using environment variables.
 
         Returns:
-            Milvus: Configured Milvus vectorstore instance.
+            VectorStore: Configured Milvus vectorstore instance, or an in-process
+            store when `VECTOR_STORE=memory`.
         """
+        if env.VECTOR_STORE == "memory":
+            logger.info("Using an in-memory vectorstore.")
+            return InMemoryVectorStore(embedding=self.embeddings_model)
+
         try:
             logger.info("Loading Milvus vectorstore...")
 
@@ -76,7 +96,7 @@ class VectorManager:
             logger.error(f"Error loading Milvus vectorstore: {str(e)}", exc_info=True)
             raise
 
-    def retrieve(
+    async def retrieve(
         self, query: str, top_k: int = 5, metadata_filter: dict | None = None
     ) -> list[Document]:
         """
@@ -89,15 +109,27 @@ class VectorManager:
 
         Returns:
             List[Document]: List of documents ordered by similarity.
+
+        Raises:
+            Overloaded: If the embedding model admits no more calls.
         """
         try:
             logger.info(f"Retrieving documents for query: '{query}' (top_k={top_k})")
 
-            results = self.vectorstore.similarity_search(
-                query=query,
-                k=top_k,
-                filter=metadata_filter,
-            )
+            chat_interface = chat_interface_label()
+            with (
+                trace_span(SpanKind.retrieval, "retrieve", top_k=top_k) as span,
+                observe_duration(RETRIEVAL_LATENCY, chat_interface),
+            ):
+                async with self.admission.admit(estimate_tokens(query)):
+                    results = await self.vectorstore.asimilarity_search(
+                        query=query,
+                        k=top_k,
+                        filter=metadata_filter,
+                    )
+                if span is not None:
+                    span.attributes["hits"] = len(results)
+            RETRIEVED_DOCUMENTS.labels(chat_interface).observe(len(results))
 
             logger.info(f"Retrieved {len(results)} documents.")
             return results
@@ -105,18 +137,23 @@ class VectorManager:
             logger.error(f"Error retrieving documents: {str(e)}", exc_info=True)
             raise
 
-    def add_documents(self, documents: list[Document]):
+    async def add_documents(self, documents: list[Document]):
         """
         Add new documents to the Milvus vectorstore.
 
+        Documents are embedded in batches of `INGESTION_BATCH_SIZE`, each
+        admitted as bulk work, so chat turns go first.
+
         Args:
             documents (List[Document]): Documents to be embedded and stored.
         """
         try:
             logger.info(f"Adding {len(documents)} documents to Milvus.")
-            self.vectorstore.add_documents(
-                documents,
-            )
+            for i in range(0, len(documents), env.INGESTION_BATCH_SIZE):
+                batch = documents[i : i + env.INGESTION_BATCH_SIZE]
+                tokens = sum(estimate_tokens(d.page_content) for d in batch)
+                async with self.admission.admit(tokens, priority=Priority.bulk):
+                    await self.vectorstore.aadd_documents(batch)
             logger.info(f"Successfully added {len(documents)} documents.")
         except Exception as e:
             logger.error(f"Error adding documents: {str(e)}", exc_info=True)
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from src.admission.main import (
+    AdmissionController,
+    Overloaded,
+    TokenBucket,
+    lowered_priority,
+    priority_var,
+)
+from src.admission.model.priority import Priority
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def controller(**kwargs) -> AdmissionController:
+    controller = AdmissionController("test/model", **kwargs)
+    controller.enabled = True
+    return controller
+
+
+async def test_limits_concurrent_calls():
+    admission = controller(max_concurrency=2, queue_timeout=5)
+    running = peak = 0
+
+    async def call() -> None:
+        nonlocal running, peak
+        async with admission.admit():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call() for _ in range(6)))
+
+    assert peak == 2
+    assert admission._in_flight == 0
+
+
+async def test_queue_timeout_fails_fast():
+    admission = controller(max_concurrency=1, queue_timeout=0.01)
+
+    async with admission.admit():
+        with pytest.raises(Overloaded):
+            async with admission.admit():
+                pass
+
+    # The slot was given back
+    async with admission.admit():
+        pass
+
+
+async def test_rate_limit_cuts_the_limit_and_success_grows_it():
+    admission = controller(max_concurrency=8, min_concurrency=1, backoff=0.5)
+
+    with pytest.raises(RateLimitError):
+        async with admission.admit():
+            raise RateLimitError()
+    assert admission.concurrency == 4
+
+    for _ in range(8):
+        async with admission.admit():
+            pass
+    assert 4 < admission.limit <= 8
+
+
+async def test_slow_calls_cut_the_limit():
+    admission = controller(max_concurrency=4, latency_target=0.001, backoff=0.5)
+
+    async with admission.admit():
+        await asyncio.sleep(0.01)
+
+    assert admission.concurrency == 2
+
+
+async def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate=100, capacity=1)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    for _ in range(3):
+        await bucket.take(1)
+
+    assert loop.time() - started >= 0.015
+
+
+async def test_queued_calls_start_by_priority():
+    admission = controller(
+        max_concurrency=1,
+        queue_timeout=5,
+        shares={p: 1 for p in Priority},
+        starvation_age=60,
+    )
+    started: list[Priority] = []
+
+    async def call(priority: Priority) -> None:
+        async with admission.admit(priority=priority):
+            started.append(priority)
+            await asyncio.sleep(0.01)
+
+    async with admission.admit():
+        calls = [
+            asyncio.create_task(call(p))
+            for p in (Priority.bulk, Priority.background, Priority.interactive)
+        ]
+        await asyncio.sleep(0.01)
+    await asyncio.gather(*calls)
+
+    assert started == [Priority.interactive, Priority.background, Priority.bulk]
+
+
+async def test_class_share_caps_concurrency():
+    admission = controller(
+        max_concurrency=4, queue_timeout=5, shares={Priority.bulk: 0.25}
+    )
+    running = peak = 0
+
+    async def call() -> None:
+        nonlocal running, peak
+        async with admission.admit(priority=Priority.bulk):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call() for _ in range(4)))
+
+    assert peak == 1
+
+
+async def test_starved_calls_go_first():
+    admission = controller(
+        max_concurrency=1,
+        queue_timeout=5,
+        shares={p: 1 for p in Priority},
+        starvation_age=0.01,
+    )
+    started: list[Priority] = []
+
+    async def call(priority: Priority) -> None:
+        async with admission.admit(priority=priority):
+            started.append(priority)
+
+    async with admission.admit():
+        bulk = asyncio.create_task(call(Priority.bulk))
+        await asyncio.sleep(0.02)
+        interactive = asyncio.create_task(call(Priority.interactive))
+        await asyncio.sleep(0)
+    await asyncio.gather(bulk, interactive)
+
+    assert started == [Priority.bulk, Priority.interactive]
+
+
+async def test_lowered_priority_never_raises_it():
+    with lowered_priority(Priority.bulk):
+        with lowered_priority(Priority.background):
+            assert priority_var.get() == Priority.bulk
+    assert priority_var.get() == Priority.interactive
@@ -0,0 +1,58 @@
+import asyncio
+
+from src.agent.model.input import InputRequest
+from src.batch.main import run_batch
+from src.thread_lock import ThreadBusy
+
+
+def request(thread_id: str, data: str) -> InputRequest:
+    return InputRequest(thread_id=thread_id, data=data)
+
+
+async def collect(requests, answer, max_concurrency=None) -> list:
+    return [result async for result in run_batch(requests, answer, max_concurrency)]
+
+
+async def test_batch_keeps_thread_order_and_bounds_concurrency():
+    running = 0
+    peak = 0
+    answered: list[str] = []
+
+    async def answer(req: InputRequest):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        answered.append(f"{req.thread_id}:{req.data}")
+        return {"response": req.data}
+
+    requests = [request(t, str(i)) for i in range(3) for t in ("a", "b", "c", "d")]
+    results = await collect(requests, answer, max_concurrency=2)
+
+    assert sorted(r.index for r in results) == list(range(len(requests)))
+    assert peak == 2
+    for thread in ("a", "b", "c", "d"):
+        assert [m for m in answered if m.startswith(thread)] == [
+            f"{thread}:0",
+            f"{thread}:1",
+            f"{thread}:2",
+        ]
+
+
+async def test_failed_messages_do_not_fail_the_batch():
+    async def answer(req: InputRequest):
+        if req.data == "busy":
+            raise ThreadBusy("busy")
+        if req.data == "boom":
+            raise RuntimeError("boom")
+        return {"response": "ok"}
+
+    requests = [request("a", "busy"), request("b", "boom"), request("c", "fine")]
+    results = await collect(requests, answer)
+
+    by_index = {r.index: r for r in results}
+    assert by_index[0].status_code == 409
+    assert by_index[1].status_code == 500
+    assert by_index[2].status_code == 200
+    assert by_index[2].response == {"response": "ok"}
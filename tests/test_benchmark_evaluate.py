@@ -0,0 +1,75 @@
+import json
+
+from benchmarks.evaluate import (
+    TurnResult,
+    completed_conversations,
+    format_summary,
+    load_dataset,
+)
+
+
+def test_load_dataset_defaults_ids_to_line_numbers(tmp_path):
+    dataset = tmp_path / "dataset.jsonl"
+    dataset.write_text(
+        json.dumps({"id": "billing", "turns": [{"data": "Hi"}]})
+        + "\n\n"
+        + json.dumps({"turns": [{"data": "Hello"}, {"data": "Bye"}]})
+        + "\n",
+        encoding="utf-8",
+    )
+
+    conversations = load_dataset(dataset)
+
+    assert [c.id for c in conversations] == ["billing", "3"]
+    assert len(conversations[1].turns) == 2
+
+
+def test_completed_conversations_are_read_from_results(tmp_path):
+    results = tmp_path / "results.jsonl"
+    assert completed_conversations(results) == set()
+
+    lines = [
+        TurnResult(conversation_id=c, turn=t, input="x", latency_s=0.1)
+        for c, t in (("a", 0), ("a", 1), ("b", 0))
+    ]
+    results.write_text(
+        "".join(r.model_dump_json() + "\n" for r in lines), encoding="utf-8"
+    )
+
+    assert completed_conversations(results) == {"a", "b"}
+
+
+def test_failed_conversations_are_not_completed(tmp_path):
+    results = tmp_path / "results.jsonl"
+    lines = [
+        TurnResult(conversation_id="a", turn=0, input="x", latency_s=0.1),
+        TurnResult(conversation_id="a", turn=1, input="x", latency_s=1, error="boom"),
+        TurnResult(conversation_id="b", turn=0, input="x", latency_s=1, error="boom"),
+        # Played again after failing
+        TurnResult(conversation_id="b", turn=0, input="x", latency_s=0.1),
+    ]
+    results.write_text(
+        "".join(r.model_dump_json() + "\n" for r in lines), encoding="utf-8"
+    )
+
+    assert completed_conversations(results) == {"b"}
+
+
+def test_format_summary_counts_tokens_and_errors():
+    results = [
+        TurnResult(
+            conversation_id="a",
+            turn=0,
+            input="x",
+            latency_s=0.2,
+            input_tokens=10,
+            output_tokens=5,
+            llm_calls=2,
+        ),
+        TurnResult(conversation_id="b", turn=0, input="y", latency_s=1, error="boom"),
+    ]
+
+    summary = format_summary(results)
+
+    assert "2 turns (2 answered), 1 errors" in summary
+    assert "10 in / 5 out, 2 LLM calls" in summary
@@ -0,0 +1,41 @@
+from typing import TypedDict
+
+import httpx
+from fastapi import FastAPI
+from langgraph.graph import END, StateGraph
+
+from benchmarks.offline import free_port, serve_timed
+
+
+class State(TypedDict):
+    text: str
+
+
+def echo(state: State) -> State:
+    return {"text": state["text"]}
+
+
+def graph():
+    builder = StateGraph(State)
+    builder.add_node("echo", echo)
+    builder.set_entry_point("echo")
+    builder.add_edge("echo", END)
+    return builder.compile()
+
+
+async def test_node_timer_times_the_graph_runs_of_http_requests():
+    app = FastAPI()
+    compiled = graph()
+
+    @app.get("/echo")
+    async def run_echo():
+        return await compiled.ainvoke({"text": "hi"})
+
+    port = free_port()
+    async with serve_timed(app, port) as timer:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            response = await client.get("/echo")
+        durations = timer.take()
+
+    assert response.json() == {"text": "hi"}
+    assert len(durations["echo"]) == 1
@@ -0,0 +1,58 @@
+from benchmarks.report import (
+    LoadReport,
+    ResourceUsage,
+    Sample,
+    build_load_level,
+    build_report,
+    compare_to_baseline,
+    saturation_point,
+    save_baseline,
+)
+
+
+def _report(latency: float, errors: int = 0):
+    samples = [Sample(latency=latency) for _ in range(20)]
+    samples += [Sample(latency=0, ok=False) for _ in range(errors)]
+    return build_report("start", samples, 4, 1.0, {"rag": [0.01, 0.02]})
+
+
+def test_build_report_ignores_failed_requests():
+    report = _report(0.1, errors=2)
+
+    assert report.errors == 2
+    assert report.latency_ms is not None
+    assert round(report.latency_ms.p99) == 100
+    assert report.nodes["rag"].count == 2
+
+
+def test_compare_to_baseline_flags_regressions(tmp_path):
+    save_baseline(_report(0.1), tmp_path)
+
+    assert compare_to_baseline(_report(0.11), tmp_path, tolerance=0.2) == []
+    regressions = compare_to_baseline(_report(0.2, errors=1), tmp_path, tolerance=0.2)
+    assert any(r.startswith("errors") for r in regressions)
+    assert any(r.startswith("latency_ms p50") for r in regressions)
+
+
+def _level(concurrency: int, ttft: float, errors: int = 0):
+    samples = [Sample(latency=ttft * 2, ttft=ttft) for _ in range(20)]
+    samples += [Sample(latency=0, ok=False, error="timeout") for _ in range(errors)]
+    return build_load_level(concurrency, samples, 10.0, ResourceUsage())
+
+
+def test_build_load_level_counts_errors_by_kind():
+    level = _level(8, 0.1, errors=5)
+
+    assert level.errors_by_kind == {"timeout": 5}
+    assert level.error_rate == 0.2
+    assert level.throughput_rps == 2.0
+
+
+def test_saturation_point_stops_at_the_first_slow_level():
+    report = LoadReport(
+        scenario="websocket",
+        levels=[_level(1, 0.1), _level(4, 0.2), _level(16, 0.9), _level(32, 0.3)],
+    )
+
+    assert saturation_point(report, p95_slo_ms=500) == 4
+    assert saturation_point(report, p95_slo_ms=50) is None
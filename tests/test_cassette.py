@@ -0,0 +1,28 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.cassette.main import Cassette, CassetteMiss
+from src.cassette.model.cassette_mode import CassetteMode
+from src.llm.chat_models.cassette_chat_model import CassetteChatModel
+from src.llm.chat_models.fake_chat_model import FakeChatModel
+
+
+@pytest.mark.asyncio
+async def test_cassette_replays_recorded_calls(tmp_path):
+    path = tmp_path / "llm.jsonl"
+    recorder = CassetteChatModel(
+        model=FakeChatModel(response_text="recorded answer"),
+        model_name="fake/test",
+        cassette=Cassette(CassetteMode.record, path),
+    )
+    recorded = await recorder.ainvoke([HumanMessage(content="hello")])
+
+    player = CassetteChatModel(
+        model_name="fake/test", cassette=Cassette(CassetteMode.replay, path)
+    )
+    chunks = [c async for c in player.astream([HumanMessage(content="hello")])]
+
+    assert "".join(str(c.content) for c in chunks) == recorded.content
+    assert len(chunks) > 1
+    with pytest.raises(CassetteMiss):
+        await player.ainvoke([HumanMessage(content="something else")])
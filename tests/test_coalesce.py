@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from src.coalesce.main import MessageCoalescer
+from src.frame_sink import FRAME_SINK_KEY
+from src.rest import messages
+
+
+async def test_burst_runs_once_with_all_messages():
+    coalescer = MessageCoalescer(window=0.05, max_window=1)
+    runs: list[list[str]] = []
+
+    def runner(name: str):
+        async def run(inputs: list[str]) -> str:
+            runs.append(list(inputs))
+            return name
+
+        return run
+
+    async def send(message: str, delay: float) -> str:
+        await asyncio.sleep(delay)
+        return await coalescer.submit("t", [message], runner(message))
+
+    results = await asyncio.gather(send("a", 0), send("b", 0.01), send("c", 0.02))
+
+    assert runs == [["a", "b", "c"]]
+    # The burst runs with the latest message's runner, answering all of them
+    assert results == ["c", "c", "c"]
+
+
+async def test_messages_during_a_run_join_the_next_burst():
+    coalescer = MessageCoalescer(window=0.01, max_window=1)
+    runs: list[list[str]] = []
+    release = asyncio.Event()
+
+    async def run(inputs: list[str]) -> int:
+        runs.append(list(inputs))
+        if len(runs) == 1:
+            await release.wait()
+        return len(runs)
+
+    first = asyncio.create_task(coalescer.submit("t", ["a"], run))
+    await asyncio.sleep(0.05)
+    later = [
+        asyncio.create_task(coalescer.submit("t", [m], run)) for m in ("b", "c")
+    ]
+    # Longer than the window: the burst still waits for the run in flight
+    await asyncio.sleep(0.05)
+    assert runs == [["a"]]
+
+    release.set()
+    assert await first == 1
+    assert await asyncio.gather(*later) == [2, 2]
+    assert runs == [["a"], ["b", "c"]]
+
+
+async def test_max_window_bounds_a_burst():
+    coalescer = MessageCoalescer(window=0.05, max_window=0.05)
+    runs: list[list[str]] = []
+
+    async def run(inputs: list[str]) -> None:
+        runs.append(list(inputs))
+
+    async def trickle() -> None:
+        for m in "abcdef":
+            asyncio.create_task(coalescer.submit("t", [m], run))
+            await asyncio.sleep(0.02)
+
+    await trickle()
+    await asyncio.sleep(0.2)
+
+    assert len(runs) > 1
+    assert sum(runs, []) == list("abcdef")
+
+
+async def test_failed_run_fails_every_message():
+    coalescer = MessageCoalescer(window=0.01, max_window=1)
+
+    async def run(inputs: list[str]) -> None:
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        coalescer.submit("t", ["a"], run),
+        coalescer.submit("t", ["b"], run),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        await coalescer.submit("t", ["c"], run)
+
+
+async def test_run_is_cancelled_once_no_sender_waits():
+    coalescer = MessageCoalescer(window=0.01, max_window=1)
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def run(inputs: list[str]) -> None:
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    senders = [
+        asyncio.create_task(coalescer.submit("t", [m], run)) for m in ("a", "b")
+    ]
+    await started.wait()
+
+    senders[0].cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+
+    senders[1].cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert not coalescer._running
+
+
+class FakeWebSocket:
+    """Feeds client messages to the endpoint and collects the sent frames."""
+
+    def __init__(self) -> None:
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent: list[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def receive_json(self):
+        data = await self.incoming.get()
+        if data is None:
+            raise WebSocketDisconnect()
+        return data
+
+    async def send_json(self, data: dict) -> None:
+        self.sent.append(data)
+
+
+async def test_websocket_keeps_the_order_of_threads(monkeypatch):
+    coalescer = MessageCoalescer(window=0.02, max_window=1)
+    runs: list[list[str]] = []
+
+    async def start(input, config, *args, **kwargs):
+        configurable = config["configurable"]
+        websocket, thread_id = configurable[FRAME_SINK_KEY], configurable["thread_id"]
+
+        async def run(inputs: list) -> None:
+            runs.append([m.content[0]["data"] for m in inputs])
+            for i in range(3):
+                await websocket.send_json({"thread_id": thread_id, "data": i})
+                await asyncio.sleep(0.01)
+
+        return await coalescer.submit(thread_id, input, run)
+
+    monkeypatch.setattr(messages, "message_coalescer", coalescer)
+    monkeypatch.setattr(messages, "start", start)
+    websocket = FakeWebSocket()
+    for thread_id, data in (("a", "1"), ("a", "2"), ("b", "3")):
+        websocket.incoming.put_nowait({"thread_id": thread_id, "data": data})
+    server = asyncio.create_task(
+        messages.send_message_ws(websocket)  # type: ignore[arg-type]
+    )
+    await asyncio.sleep(0.3)
+    websocket.incoming.put_nowait(None)
+    await server
+
+    # Consecutive messages of a thread are merged, the other thread waits its turn
+    assert runs == [["1", "2"], ["3"]]
+    assert [f["thread_id"] for f in websocket.sent] == ["a"] * 3 + ["b"] * 3
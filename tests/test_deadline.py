@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+from src.deadline.main import (
+    DeadlineExceeded,
+    call_timeout,
+    deadline_passed,
+    deadline_within,
+    remaining_time,
+    with_deadline,
+    within_deadline,
+)
+from src.llm.service.deadline_chains import DeadlineChains
+
+
+def test_with_deadline_keeps_the_config():
+    config = with_deadline({"configurable": {"thread_id": "t"}}, 30)
+
+    assert config["configurable"]["thread_id"] == "t"
+    remaining = remaining_time(config)
+    assert remaining is not None and 29 < remaining <= 30
+    assert deadline_within(config, 60) and not deadline_passed(config)
+    assert remaining_time(with_deadline({}, 0)) is None
+
+
+async def test_within_deadline_raises_at_the_deadline():
+    config = with_deadline({}, 0.01)
+
+    with pytest.raises(DeadlineExceeded):
+        async with within_deadline(config):
+            await asyncio.sleep(1)
+    assert deadline_passed(config)
+
+
+async def test_within_deadline_keeps_other_timeouts():
+    with pytest.raises(TimeoutError):
+        async with within_deadline(with_deadline({}, 10)):
+            raise TimeoutError("provider timeout")
+
+
+def test_chains_time_out_at_the_request_deadline():
+    built: list[int] = []
+
+    def build(timeout: int):
+        built.append(timeout)
+        return RunnableLambda(lambda _: timeout)
+
+    chains = DeadlineChains(build)
+    config = with_deadline({}, 29.5)
+
+    assert chains.for_config(config).invoke(None) == 30
+    assert chains.for_config({}).invoke(None) == 0
+    assert call_timeout(with_deadline({}, 0.01)) == 1
+    assert built == [0, 30]
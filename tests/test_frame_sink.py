@@ -0,0 +1,156 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from src.agent.model.input import InputRequest
+from src.config import env
+from src.frame_sink.main import (
+    FRAME_SINK_KEY,
+    BufferedSink,
+    ProgressCallbackHandler,
+    QueueSink,
+    SlowConsumer,
+)
+from src.rest import messages
+
+
+class SlowSink:
+    """Collects the frames sent, taking `delay` seconds for each."""
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.sent: list[dict] = []
+
+    async def send_json(self, data) -> None:
+        await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+
+def delta(text: str) -> dict:
+    return {"type": "delta", "data": {"response": text}}
+
+
+async def drain(sink: QueueSink) -> list[dict]:
+    return [frame async for frame in sink.frames()]
+
+
+async def test_queue_sink_yields_frames_until_closed():
+    sink = QueueSink()
+    await sink.send_json({"type": "delta", "data": {"text": "a"}})
+    sink.send_nowait({"type": "progress", "data": {}})
+    sink.close()
+
+    frames = await drain(sink)
+
+    assert [frame["type"] for frame in frames] == ["delta", "progress"]
+
+
+async def test_progress_handler_reports_graph_nodes_only():
+    sink = QueueSink()
+    handler = ProgressCallbackHandler(sink)
+    node, nested, internal = uuid4(), uuid4(), uuid4()
+    metadata = {"langgraph_node": "generate_response"}
+    handler.on_chain_start(
+        None, {}, run_id=node, metadata=metadata, name="generate_response"
+    )
+    handler.on_chain_start(
+        None, {}, run_id=nested, metadata=metadata, name="RunnableSequence"
+    )
+    handler.on_chain_start(
+        None,
+        {},
+        run_id=internal,
+        metadata={"langgraph_node": "__start__"},
+        name="__start__",
+    )
+    handler.on_chain_end({}, run_id=nested)
+    handler.on_chain_end({}, run_id=node)
+    sink.close()
+
+    frames = await drain(sink)
+
+    assert [frame["data"] for frame in frames] == [
+        {"node": "generate_response", "status": "start"},
+        {"node": "generate_response", "status": "end"},
+    ]
+
+
+async def test_buffered_sink_sends_only_the_latest_delta_per_window():
+    sink = SlowSink()
+    async with BufferedSink(sink, window=0.05, max_chars=1000) as frames:
+        for i in range(1, 101):
+            await frames.send_json(delta("x" * i))
+        await frames.send_json({"type": "progress", "data": {}})
+
+    # Cumulative deltas: the skipped ones are contained in the last one sent
+    assert len(sink.sent) < 10
+    assert sink.sent[-2] == delta("x" * 100)
+    assert sink.sent[-1]["type"] == "progress"
+
+
+async def test_buffered_sink_final_supersedes_pending_delta():
+    sink = SlowSink(delay=0.01)
+    async with BufferedSink(sink, window=10, max_chars=1000) as frames:
+        await frames.send_json(delta("a"))
+        await asyncio.sleep(0.05)
+        await frames.send_json(delta("ab"))
+        await frames.send_json({"type": "final", "data": {"response": "abc"}})
+
+    assert [frame["type"] for frame in sink.sent] == ["delta", "final"]
+
+
+async def test_buffered_sink_gives_up_on_a_stalled_client():
+    sink = SlowSink(delay=10)
+    with pytest.raises(SlowConsumer):
+        async with BufferedSink(sink, max_frames=1, timeout=0.05) as frames:
+            for _ in range(3):
+                await frames.send_json({"type": "progress", "data": {}})
+
+
+async def test_queue_sink_keeps_only_the_latest_delta():
+    sink = QueueSink()
+    await sink.send_json({"type": "progress", "data": {}})
+    for text in ("a", "ab", "abc"):
+        await sink.send_json(delta(text))
+    sink.close()
+
+    assert await drain(sink) == [{"type": "progress", "data": {}}, delta("abc")]
+
+
+async def test_queue_sink_gives_up_on_a_reader_that_never_consumes():
+    sink = QueueSink(max_frames=2, timeout=0.05)
+    for _ in range(2):
+        await sink.send_json({"type": "progress", "data": {}})
+
+    with pytest.raises(SlowConsumer):
+        await sink.send_json({"type": "final", "data": {}})
+    with pytest.raises(SlowConsumer):
+        await drain(sink)
+
+
+async def test_sse_stream_ends_with_an_error_for_a_stalled_reader(monkeypatch):
+    monkeypatch.setattr(env, "STREAM_MAX_QUEUED_FRAMES", 2)
+    monkeypatch.setattr(env, "STREAM_SLOW_CLIENT_TIMEOUT", 0.05)
+    stopped = asyncio.Event()
+
+    async def start(input, config, *args, **kwargs):
+        sink = config["configurable"][FRAME_SINK_KEY]
+        try:
+            for i in range(100):
+                await sink.send_json({"type": "progress", "data": i})
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(messages, "start", start)
+    events = messages._stream_sse(InputRequest(thread_id="t", data="hi"))
+
+    first = await anext(events)
+    # The reader stops reading for longer than the run waits for it
+    await asyncio.sleep(0.2)
+    rest = [event async for event in events]
+
+    assert first.startswith("event: progress")
+    assert len(rest) == 1 and rest[0].startswith("event: error")
+    assert '"status_code":408' in rest[0]
+    assert stopped.is_set()
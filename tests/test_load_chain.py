@@ -0,0 +1,89 @@
+from typing import Any
+
+from langchain_core.language_models import FakeListChatModel, FakeListLLM
+from langchain_core.runnables import RunnableLambda, RunnableWithFallbacks
+from langchain_ollama import ChatOllama
+from pydantic import BaseModel
+
+from src.llm.model.llm_provider import LLMProvider
+from src.llm.model.structured_output_mode import StructuredOutputMode
+from src.llm.service.load_chain import load_chain
+from src.metrics.main import STRUCTURED_OUTPUT_FALLBACKS
+from src.repair_json.main import RepairingJsonOutputParser
+
+TEMPLATE = "{query}\n\n{format_instructions}"
+PARSED = '{"response": "parsed"}'
+
+
+class Answer(BaseModel):
+    response: str
+
+
+class StructuredFakeChatModel(FakeListChatModel):
+    """Answers natively through `with_structured_output`, or fails to."""
+
+    fail: bool = False
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> RunnableLambda:
+        def answer(_: Any) -> dict:
+            if self.fail:
+                raise ValueError("No tool call in the response.")
+            return {"response": "native"}
+
+        return RunnableLambda(answer)
+
+
+def test_parser_mode_parses_the_prompted_json():
+    model = StructuredFakeChatModel(responses=[PARSED])
+
+    chain = load_chain(
+        TEMPLATE, model, LLMProvider.openai, Answer, StructuredOutputMode.parser
+    )
+
+    assert isinstance(chain.last, RepairingJsonOutputParser)
+    assert chain.invoke({"query": "hi"}) == {"response": "parsed"}
+
+
+def test_native_mode_uses_structured_output_with_parser_fallback():
+    model = StructuredFakeChatModel(responses=[PARSED])
+
+    chain = load_chain(
+        TEMPLATE, model, LLMProvider.openai, Answer, StructuredOutputMode.native
+    )
+
+    assert isinstance(chain, RunnableWithFallbacks)
+    assert chain.invoke({"query": "hi"}) == {"response": "native"}
+
+
+def test_native_mode_counts_fallbacks_per_provider():
+    model = StructuredFakeChatModel(responses=[PARSED], fail=True)
+    fallbacks = STRUCTURED_OUTPUT_FALLBACKS.labels("anthropic", "Answer")
+    before = fallbacks._value.get()
+
+    chain = load_chain(
+        TEMPLATE, model, LLMProvider.anthropic, Answer, StructuredOutputMode.native
+    )
+
+    assert chain.invoke({"query": "hi"}) == {"response": "parsed"}
+    assert fallbacks._value.get() == before + 1
+
+
+def test_native_mode_on_ollama_uses_json_mode():
+    model = ChatOllama(model="llama3")
+
+    chain = load_chain(
+        TEMPLATE, model, LLMProvider.ollama, Answer, StructuredOutputMode.native
+    )
+
+    assert chain.steps[1].format == "json"
+    assert isinstance(chain.last, RepairingJsonOutputParser)
+
+
+def test_native_mode_without_chat_model_uses_the_parser():
+    model = FakeListLLM(responses=[PARSED])
+
+    chain = load_chain(
+        TEMPLATE, model, LLMProvider.openai, Answer, StructuredOutputMode.native
+    )
+
+    assert chain.invoke({"query": "hi"}) == {"response": "parsed"}
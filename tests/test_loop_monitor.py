@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import pytest
+
+from src.loop_monitor.main import LoopMonitor
+
+
+def _blocking_call():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_reports_blocking_call_with_its_stack():
+    monitor = LoopMonitor(interval=0.01, threshold=0.1)
+    await monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        _blocking_call()
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    # A loaded machine may stall the loop elsewhere too
+    assert len(monitor.stalls) >= 1
+    stall = next(
+        s for s in monitor.stalls if any("_blocking_call" in line for line in s.stack)
+    )
+    assert stall.duration >= 0.2
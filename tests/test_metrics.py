@@ -0,0 +1,74 @@
+import asyncio
+from typing import TypedDict
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph
+
+from src.metrics.instrumented_checkpoint_saver import InstrumentedCheckpointSaver
+from src.metrics.main import CANCELLED_TOKENS_SAVED
+from src.metrics.metrics_callback_handler import MetricsCallbackHandler, token_usage
+
+
+def test_token_usage_reads_usage_metadata():
+    message = AIMessage(
+        content="hi",
+        usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15},
+    )
+    response = LLMResult(generations=[[ChatGeneration(message=message)]])
+
+    assert token_usage(response) == (12, 3)
+
+
+def test_token_usage_falls_back_to_llm_output():
+    response = LLMResult(
+        generations=[[]],
+        llm_output={"token_usage": {"prompt_tokens": 7, "completion_tokens": 2}},
+    )
+
+    assert token_usage(response) == (7, 2)
+
+
+def test_cancelled_call_reports_saved_output_tokens():
+    handler = MetricsCallbackHandler("websocket")
+    saved = CANCELLED_TOKENS_SAVED.labels("m", "disconnect")
+    before = saved._value.get()
+
+    completed, cancelled = uuid4(), uuid4()
+    handler.on_llm_start({}, [], run_id=completed, metadata={"ls_model_name": "m"})
+    message = AIMessage(
+        content="hi",
+        usage_metadata={"input_tokens": 1, "output_tokens": 40, "total_tokens": 41},
+    )
+    handler.on_llm_end(
+        LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=completed
+    )
+
+    handler.on_llm_start({}, [], run_id=cancelled, metadata={"ls_model_name": "m"})
+    for _ in range(10):
+        handler.on_llm_new_token("x", run_id=cancelled)
+    handler.on_llm_error(asyncio.CancelledError("disconnect"), run_id=cancelled)
+
+    assert saved._value.get() - before == 30
+
+
+class EchoState(TypedDict):
+    text: str
+
+
+async def test_instrumented_saver_delegates_thread_deletion():
+    builder = StateGraph(EchoState)
+    builder.add_node("echo", lambda state: state)
+    builder.set_entry_point("echo")
+    builder.add_edge("echo", END)
+    saver = InstrumentedCheckpointSaver(MemorySaver())
+    graph = builder.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "t1"}}
+    await graph.ainvoke({"text": "hi"}, config)
+
+    assert await saver.aget_tuple(config) is not None
+    assert "t1" in saver.storage  # The wrapped saver's own attribute
+    await saver.adelete_thread("t1")
+    assert await saver.aget_tuple(config) is None
@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+from src.multiplex.main import MultiplexedConnection, RequestChannel
+from src.multiplex.model.multiplex_frame import MultiplexRequest
+
+
+class FakeWebSocket:
+    """Feeds client frames to the connection and collects the sent ones."""
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent: list[dict] = []
+        self.close_code: int | None = None
+
+    async def receive_json(self):
+        frame = await self.incoming.get()
+        if frame is None:
+            raise ConnectionError("closed")
+        return frame
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(data))
+        await asyncio.sleep(0)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.close_code = code
+        self.incoming.put_nowait(None)
+
+
+def request(request_id: str) -> dict:
+    return {"request_id": request_id, "thread_id": request_id, "data": "hi"}
+
+
+async def serve(
+    websocket: FakeWebSocket, answer, max_concurrency: int = 8, **kwargs
+) -> None:
+    connection = MultiplexedConnection(
+        websocket,  # type: ignore[arg-type]
+        max_concurrency,
+        **kwargs,
+    )
+    try:
+        await connection.serve(answer)
+    except ConnectionError:
+        pass
+
+
+async def test_frames_of_concurrent_requests_are_interleaved():
+    websocket = FakeWebSocket()
+
+    async def answer(req: MultiplexRequest, channel: RequestChannel) -> None:
+        for i in range(3):
+            await channel.send_json({"type": "progress", "data": i})
+        await channel.send_json({"type": "final", "data": req.request_id})
+
+    for request_id in ("a", "b"):
+        websocket.incoming.put_nowait(request(request_id))
+    server = asyncio.create_task(serve(websocket, answer))
+    await asyncio.sleep(0.05)
+    websocket.incoming.put_nowait(None)
+    await server
+
+    order = [frame["request_id"] for frame in websocket.sent]
+    assert order.count("a") == order.count("b") == 4
+    # Neither request's frames all went out before the other's
+    assert order[:2] in (["a", "b"], ["b", "a"])
+    assert websocket.sent[-1]["type"] == "final"
+
+
+async def test_concurrency_cap_and_cancel():
+    websocket = FakeWebSocket()
+    running = peak = 0
+
+    async def answer(req: MultiplexRequest, channel: RequestChannel) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(10 if req.request_id == "slow" else 0.01)
+            await channel.send_json({"type": "final", "data": None})
+        finally:
+            running -= 1
+
+    server = asyncio.create_task(serve(websocket, answer, max_concurrency=1))
+    websocket.incoming.put_nowait(request("slow"))
+    websocket.incoming.put_nowait(request("fast"))
+    await asyncio.sleep(0.01)
+    websocket.incoming.put_nowait({"type": "cancel", "request_id": "slow"})
+    await asyncio.sleep(0.05)
+    websocket.incoming.put_nowait(None)
+    await server
+
+    frames = [(f["request_id"], f["type"]) for f in websocket.sent]
+    assert frames == [("slow", "cancelled"), ("fast", "final")]
+    assert peak == 1
+
+
+async def test_invalid_and_duplicate_requests_get_error_frames():
+    websocket = FakeWebSocket()
+
+    async def answer(req: MultiplexRequest, channel: RequestChannel) -> None:
+        await asyncio.sleep(0.05)
+
+    server = asyncio.create_task(serve(websocket, answer))
+    websocket.incoming.put_nowait({"request_id": "x"})
+    websocket.incoming.put_nowait(request("a"))
+    websocket.incoming.put_nowait(request("a"))
+    await asyncio.sleep(0.01)
+    websocket.incoming.put_nowait(None)
+    await server
+
+    errors = [(f["request_id"], f["data"]["status_code"]) for f in websocket.sent]
+    assert errors == [("x", 422), ("a", 409)]
+
+
+async def test_pending_deltas_are_collapsed():
+    websocket = FakeWebSocket(delay=0.02)
+
+    async def answer(req: MultiplexRequest, channel: RequestChannel) -> None:
+        for i in range(1, 21):
+            await channel.send_json({"type": "delta", "data": "x" * i})
+        await channel.send_json({"type": "final", "data": "x" * 21})
+
+    server = asyncio.create_task(serve(websocket, answer))
+    websocket.incoming.put_nowait(request("a"))
+    await asyncio.sleep(0.2)
+    websocket.incoming.put_nowait(None)
+    await server
+
+    # Cumulative deltas: the replaced ones are contained in the next one
+    assert len(websocket.sent) < 21
+    assert websocket.sent[-1] == {"request_id": "a", "type": "final", "data": "x" * 21}
+
+
+async def test_stalled_client_is_disconnected():
+    websocket = FakeWebSocket(delay=10)
+
+    async def answer(req: MultiplexRequest, channel: RequestChannel) -> None:
+        for i in range(5):
+            await channel.send_json({"type": "progress", "data": i})
+
+    server = asyncio.create_task(serve(websocket, answer, max_frames=2, timeout=0.05))
+    websocket.incoming.put_nowait(request("a"))
+    await server
+
+    assert websocket.close_code == 1008
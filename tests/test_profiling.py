@@ -0,0 +1,42 @@
+import time
+from collections import Counter
+
+from src.profiling.main import _safe, _top_functions
+from src.profiling.stack_sampler import StackSampler, profiled_run_var
+
+
+def test_top_functions_ranks_by_self_samples():
+    stacks = Counter(
+        {
+            ("main", "handler", "parse"): 6,
+            ("main", "handler"): 1,
+            ("main", "render"): 3,
+        }
+    )
+
+    top = _top_functions(stacks)
+
+    assert [f.function for f in top] == ["parse", "render", "handler"]
+    assert top[0].self_samples == 6 and top[0].total_samples == 6
+    assert top[2].total_samples == 7
+
+
+def test_safe_names_cannot_escape_the_profiles_directory():
+    assert "/" not in _safe("../../etc") and ".." not in _safe("../../etc")
+
+
+def _busy_in_profiled_run():
+    time.sleep(0.2)
+
+
+async def test_stack_sampler_samples_the_profiled_task():
+    sampler = StackSampler(object(), interval=0.01)
+    token = profiled_run_var.set(sampler.marker)
+    sampler.start()
+    try:
+        _busy_in_profiled_run()
+    finally:
+        sampler.stop()
+        profiled_run_var.reset(token)
+
+    assert any("_busy_in_profiled_run" in stack[-1] for stack in sampler.stacks)
@@ -0,0 +1,74 @@
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph.message import add_messages
+
+from src.common.rewrite_messages import message_cache_key
+from src.prune_tool_data.main import TOOL_DATA_TYPE, ToolDataPruner
+from src.prune_tool_data.model.retention_policy import RetentionPolicy
+
+
+def history() -> list[BaseMessage]:
+    return [
+        HumanMessage(content="What is the refund policy?", id="h1"),
+        BaseMessage(
+            type=TOOL_DATA_TYPE,
+            content=["Refunds are accepted within 30 days."],
+            additional_kwargs={"rag_query": "refund policy", "document_ids": ["d1"]},
+            id="r1",
+        ),
+        AIMessage(content="Within 30 days.", id="a1"),
+        HumanMessage(content="Thanks!", id="h2"),
+        AIMessage(content="You're welcome.", id="a2"),
+    ]
+
+
+def test_stub_keeps_ids_and_order():
+    messages = history()
+
+    ops = ToolDataPruner(RetentionPolicy.stub, turns=1).prune(messages)
+
+    # Only the stale tool result is re-emitted, under its own id
+    assert [m.id for m in ops] == ["r1"]
+    pruned = add_messages(messages, ops)
+    assert [m.id for m in pruned] == ["h1", "r1", "a1", "h2", "a2"]
+    stub = pruned[1]
+    assert stub.additional_kwargs["stub"] is True
+    assert stub.additional_kwargs["document_ids"] == ["d1"]
+    assert "refund policy" in str(stub.content)
+
+
+def test_stub_changes_the_cache_key_of_the_rewritten_message_only():
+    messages = history()
+    before = [message_cache_key(m) for m in messages]
+
+    pruned = add_messages(
+        messages, ToolDataPruner(RetentionPolicy.stub, turns=1).prune(messages)
+    )
+
+    after = [message_cache_key(m) for m in pruned]
+    assert after[1] != before[1]
+    assert after[:1] + after[2:] == before[:1] + before[2:]
+
+
+def test_stubs_are_not_stubbed_again():
+    messages = history()
+    pruner = ToolDataPruner(RetentionPolicy.stub, turns=1)
+    pruned = add_messages(messages, pruner.prune(messages))
+
+    assert pruner.prune(pruned) == []
+
+
+def test_drop_removes_only_stale_tool_results():
+    messages = history()
+
+    pruned = add_messages(
+        messages, ToolDataPruner(RetentionPolicy.drop, turns=1).prune(messages)
+    )
+
+    assert [m.id for m in pruned] == ["h1", "a1", "h2", "a2"]
+
+
+def test_recent_tool_results_and_keep_policy_are_left_alone():
+    messages = history()
+
+    assert ToolDataPruner(RetentionPolicy.stub, turns=2).prune(messages) == []
+    assert ToolDataPruner(RetentionPolicy.keep, turns=0).prune(messages) == []
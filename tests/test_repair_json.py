@@ -0,0 +1,86 @@
+import pytest
+from langchain_core.exceptions import OutputParserException
+from prometheus_client import REGISTRY
+
+from src.repair_json.main import RepairingJsonOutputParser, repair_json
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"tool": "rag", "rag_query": "vacation policy"}',
+        'Sure! Here is my answer:\n{"tool": "rag", "rag_query": "vacation policy"}\nHope it helps.',
+        '```json\n{"tool": "rag", "rag_query": "vacation policy",}\n```',
+        "{'tool': 'rag', 'rag_query': 'vacation policy'}",
+        '{"tool": "rag", "rag_query": "vacation policy',
+        "{“tool”: “rag”, “rag_query”: “vacation policy”}",
+    ],
+)
+def test_repair_json_recovers_common_mistakes(text):
+    assert repair_json(text) == {"tool": "rag", "rag_query": "vacation policy"}
+
+
+def test_repair_json_rejects_prose():
+    with pytest.raises(ValueError):
+        repair_json("I think we should search the knowledge base.")
+
+
+def chunks(text: str, size: int = 4) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "{“response”: “Hello there”}",
+        '```json\n{"response": "Hello there",}\n```',
+        "{'response': 'Hello there'}",
+    ],
+)
+async def test_streamed_malformed_json_is_repaired_at_the_end(text):
+    parser = RepairingJsonOutputParser()
+
+    async def stream():
+        for chunk in chunks(text):
+            yield chunk
+
+    parsed = [p async for p in parser.atransform(stream())]
+
+    assert parsed[-1] == {"response": "Hello there"}
+
+
+def test_sync_stream_is_repaired_too():
+    parser = RepairingJsonOutputParser()
+
+    parsed = list(parser.transform(iter(chunks("{“response”: “Hi”}"))))
+
+    assert parsed[-1] == {"response": "Hi"}
+
+
+async def test_well_formed_stream_is_not_yielded_twice():
+    parser = RepairingJsonOutputParser()
+
+    async def stream():
+        for chunk in chunks('{"response": "Hello there"}'):
+            yield chunk
+
+    parsed = [p async for p in parser.atransform(stream())]
+
+    assert parsed.count({"response": "Hello there"}) == 1
+
+
+def repairs(outcome: str) -> float:
+    labels = {"provider": "test", "outcome": outcome}
+    return REGISTRY.get_sample_value("lia_json_repairs_total", labels) or 0
+
+
+def test_repairs_are_counted_by_provider_and_outcome():
+    parser = RepairingJsonOutputParser(provider="test")
+    repaired, failed = repairs("repaired"), repairs("failed")
+
+    parser.parse("{'response': 'Hi'}")
+    with pytest.raises(OutputParserException):
+        parser.parse("No JSON here.")
+
+    assert repairs("repaired") == repaired + 1
+    assert repairs("failed") == failed + 1
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from src.thread_lock.main import ThreadBusy, ThreadLocks
+from src.thread_lock.model.thread_lock_policy import ThreadLockPolicy
+
+
+async def test_runs_of_a_thread_are_serialized():
+    locks = ThreadLocks(ThreadLockPolicy.queue, timeout=5)
+    events: list[str] = []
+
+    async def run(name: str) -> None:
+        async with locks.hold("t"):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+
+    await asyncio.gather(run("a"), run("b"))
+
+    assert events == ["a start", "a end", "b start", "b end"]
+    assert not locks._locks
+
+
+async def test_reject_policy_fails_while_busy():
+    locks = ThreadLocks(ThreadLockPolicy.reject)
+
+    async with locks.hold("t"):
+        with pytest.raises(ThreadBusy):
+            async with locks.hold("t"):
+                pass
+        # Other threads are not affected
+        async with locks.hold("other"):
+            pass
+
+
+async def test_queue_policy_times_out():
+    locks = ThreadLocks(ThreadLockPolicy.queue, timeout=0.01)
+
+    async with locks.hold("t"):
+        with pytest.raises(ThreadBusy):
+            async with locks.hold("t"):
+                pass
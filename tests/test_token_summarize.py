@@ -0,0 +1,129 @@
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.graph.message import add_messages
+
+from src.agent.model.graph_state import GraphState
+from src.common import message_cache_key, rewrite_messages
+from src.prune_tool_data.main import TOOL_DATA_TYPE, ToolDataPruner
+from src.prune_tool_data.model.retention_policy import RetentionPolicy
+from src.summarize.main import Summarizer
+from src.summarize.model.output import SummarizeOutput
+from src.transcript.token_counter import MessageTokenCounter
+
+
+def _summarizer(counter: MessageTokenCounter) -> Summarizer:
+    # Only the trigger is exercised, so no model is loaded
+    summarizer = Summarizer.__new__(Summarizer)
+    summarizer.token_counter = counter
+    return summarizer
+
+
+def _state(**kwargs) -> GraphState:
+    messages = [
+        SystemMessage(content="Be helpful.", id="s"),
+        HumanMessage(content="x" * 400, id="big-rag"),  # ~100 tokens
+        AIMessage(content="y" * 40, id="a1"),  # ~10 tokens
+        HumanMessage(content="z" * 40, id="h2"),
+    ]
+    return GraphState(input=[], messages=messages, top_k=5, **kwargs)
+
+
+def test_token_trigger_keeps_the_latest_messages_within_budget():
+    summarizer = _summarizer(MessageTokenCounter(encoding=""))
+    state = _state(summarize_token_threshold=100, summarize_token_keep=30)
+
+    assert summarizer._token_keep_start(state, 100) == 2
+
+
+def test_token_trigger_waits_for_the_threshold():
+    summarizer = _summarizer(MessageTokenCounter(encoding=""))
+    state = _state(summarize_token_threshold=500)
+
+    assert summarizer._token_keep_start(state, 500) is None
+
+
+def test_token_counts_are_cached_by_message_id():
+    calls = []
+    counter = MessageTokenCounter(encoding="")
+    counter._tokenize = lambda text: calls.append(text) or len(text)
+    messages = [HumanMessage(content="hello", id="1"), AIMessage(content="hi", id="2")]
+
+    first = counter.count(messages)
+    second = counter.count(messages + [HumanMessage(content="again", id="3")])
+
+    assert second > first
+    assert len(calls) == 3
+
+
+def test_a_prune_only_recounts_the_rewritten_message():
+    calls = []
+    counter = MessageTokenCounter(encoding="")
+    counter._tokenize = lambda text: calls.append(text) or len(text)
+    messages = [
+        HumanMessage(content="What is the refund policy?", id="h1"),
+        BaseMessage(
+            type=TOOL_DATA_TYPE,
+            content=["Refunds are accepted within 30 days."],
+            additional_kwargs={"rag_query": "refund policy", "document_ids": ["d1"]},
+            id="r1",
+        ),
+        AIMessage(content="Within 30 days.", id="a1"),
+        HumanMessage(content="Thanks!", id="h2"),
+    ]
+    counter.count(messages)
+    calls.clear()
+
+    pruned = add_messages(
+        messages, ToolDataPruner(RetentionPolicy.stub, turns=1).prune(messages)
+    )
+    counter.count(pruned)
+
+    assert len(calls) == 1 and "refund policy" in calls[0]
+
+
+async def test_summary_keeps_the_ids_of_the_kept_messages():
+    summarizer = _summarizer(MessageTokenCounter(encoding=""))
+
+    async def summarize(query, config=None, usage=None):
+        return SummarizeOutput(summary="The user shared a long document.")
+
+    summarizer.summarize = summarize
+    state = _state(summarize_token_threshold=100, summarize_token_keep=30)
+    history = list(state.messages)
+
+    await summarizer.summarize_conditionally(state)
+    summarized = add_messages(history, state.messages)
+
+    assert [m.id for m in summarized] == ["s", "big-rag", "a1", "h2"]
+    assert summarized[1].type == "summary"
+    assert [message_cache_key(m) for m in summarized] == [
+        "s",
+        "big-rag@1",
+        "a1",
+        "h2",
+    ]
+
+
+def test_stored_counts_are_not_recounted_by_another_worker():
+    messages = [HumanMessage(content="hello", id="1"), AIMessage(content="hi", id="2")]
+    stored = add_messages(
+        messages, MessageTokenCounter(encoding="").with_stored_counts(messages)
+    )
+    calls = []
+    other_worker = MessageTokenCounter(encoding="")
+    other_worker._tokenize = lambda text: calls.append(text) or len(text)
+
+    assert other_worker.count(stored) > 0
+    assert calls == []
+    assert other_worker.with_stored_counts(stored) == []
+
+
+def test_stored_count_of_a_previous_revision_is_ignored():
+    counter = MessageTokenCounter(encoding="")
+    message = HumanMessage(content="short", id="1")
+    [stored] = counter.with_stored_counts([message])
+
+    [revised] = rewrite_messages([stored], {0: HumanMessage(content="x" * 400)})
+
+    assert counter.count_message(revised) == counter.count_message(
+        HumanMessage(content="x" * 400)
+    )
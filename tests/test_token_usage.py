@@ -0,0 +1,45 @@
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.token_usage.main import UsageCallbackHandler, exhausted_budget
+from src.token_usage.model.token_usage import TokenUsage
+
+
+def _call(handler: UsageCallbackHandler, message: AIMessage) -> None:
+    run_id = uuid4()
+    handler.on_chat_model_start({}, [[HumanMessage(content="x" * 40)]], run_id=run_id)
+    handler.on_llm_end(
+        LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id
+    )
+
+
+def test_usage_handler_prefers_reported_usage():
+    usage = TokenUsage()
+    message = AIMessage(
+        content="hi",
+        usage_metadata={"input_tokens": 30, "output_tokens": 5, "total_tokens": 35},
+    )
+
+    _call(UsageCallbackHandler(usage), message)
+
+    assert (usage.input_tokens, usage.output_tokens) == (30, 5)
+    assert usage.calls == 1 and usage.estimated_calls == 0
+
+
+def test_usage_handler_estimates_unreported_usage():
+    usage = TokenUsage()
+
+    _call(UsageCallbackHandler(usage), AIMessage(content="y" * 20))
+
+    assert usage.input_tokens > 0 and usage.output_tokens == 5
+    assert usage.estimated_calls == 1
+
+
+def test_exhausted_budget():
+    used = TokenUsage(input_tokens=80, output_tokens=20)
+
+    assert exhausted_budget(used, 200, used, None) is None
+    assert exhausted_budget(used, 100, used, None) == "run"
+    assert exhausted_budget(TokenUsage(), 100, used, 50) == "thread"
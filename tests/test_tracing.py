@@ -0,0 +1,71 @@
+import asyncio
+
+from src.tracing.main import Tracer
+from src.tracing.model.run_trace import RunTrace, Span, SpanKind, TraceEvent
+from src.tracing.otlp_json_exporter import to_otlp_json
+
+
+def test_to_otlp_json_nests_spans_under_the_run():
+    node = Span(kind=SpanKind.node, name="rag", start_time=1.0, end_time=1.5)
+    retrieval = Span(
+        kind=SpanKind.retrieval,
+        name="retrieve",
+        parent_span_id=node.span_id,
+        start_time=1.1,
+        end_time=1.2,
+        attributes={"top_k": 5, "hits": 3},
+    )
+    trace = RunTrace(
+        thread_id="t1",
+        chat_interface="api",
+        start_time=1.0,
+        end_time=2.0,
+        spans=[node, retrieval],
+        events=[TraceEvent(name="retry", time=1.6, attributes={"retry": 1})],
+    )
+
+    spans = to_otlp_json(trace)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root, otlp_node, otlp_retrieval = spans
+
+    assert root["traceId"] == trace.trace_id and len(root["spanId"]) == 16
+    assert root["events"][0]["name"] == "retry"
+    assert otlp_node["parentSpanId"] == root["spanId"]
+    assert otlp_retrieval["parentSpanId"] == node.span_id
+    assert otlp_retrieval["startTimeUnixNano"] == "1100000000"
+    assert {"key": "hits", "value": {"intValue": "3"}} in otlp_retrieval["attributes"]
+    assert trace.duration_ms == 1000
+
+
+class SlowTraceStore:
+    def __init__(self):
+        self.batches: list[list[RunTrace]] = []
+        self.release = asyncio.Event()
+
+    async def save(self, traces: list[RunTrace]) -> None:
+        await self.release.wait()
+        self.batches.append(traces)
+
+    async def list(self, thread_id: str, limit: int) -> list[RunTrace]:
+        return [t for batch in self.batches for t in batch][:limit]
+
+    async def delete(self, thread_id: str) -> None:
+        self.batches.clear()
+
+
+async def test_runs_do_not_wait_for_the_trace_store():
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.store = store = SlowTraceStore()
+    config = {"configurable": {"thread_id": "t1"}}
+
+    for _ in range(3):
+        async with tracer.run(config, "api"):
+            pass
+
+    assert store.batches == []
+    store.release.set()
+    traces = await tracer.list("t1", 10)
+
+    assert len(traces) == 3
+    assert len(store.batches) < 3  # batched by the background writer
+    await tracer.close()
@@ -0,0 +1,53 @@
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from src.transcript.main import TranscriptRenderer
+from src.transcript.model.transcript_format import TranscriptFormat
+
+
+def test_compact_transcript_strips_non_semantic_fields():
+    renderer = TranscriptRenderer(TranscriptFormat.compact)
+    messages: list[BaseMessage] = [
+        SystemMessage(content="Be helpful.", id="1"),
+        HumanMessage(content=[{"type": "input", "data": "Hello! My name is Ruy!"}]),
+        BaseMessage(
+            type="reasoning",
+            content=[{"tool": "rag", "rag_query": "Ruy"}],
+            id="2",
+        ),
+        AIMessage(
+            content=[{"response": "Hi Ruy!"}],
+            id="3",
+            response_metadata={"model_name": "mistral"},
+        ),
+    ]
+
+    transcript = renderer.render(messages)
+
+    assert transcript == "\n".join(
+        [
+            "[system] Be helpful.",
+            "[user] Hello! My name is Ruy!",
+            '[reasoning] {"tool":"rag","rag_query":"Ruy"}',
+            "[assistant] Hi Ruy!",
+        ]
+    )
+    assert "mistral" not in transcript
+
+
+def test_compact_transcript_caches_by_message_id():
+    renderer = TranscriptRenderer(TranscriptFormat.compact)
+    first = HumanMessage(content="What is my name?", id="42")
+    renderer.render([first])
+
+    # Same id is served from the cache without looking at the content again
+    second = HumanMessage(content="Something else", id="42")
+    assert renderer.render([second]) == "[user] What is my name?"
+
+
+def test_legacy_input_encoding_renders_only_the_payload():
+    renderer = TranscriptRenderer(TranscriptFormat.compact)
+    legacy = HumanMessage(
+        content=[{"data": "Hi", "chat_interface": "api", "max_retries": 1, "top_k": 5}]
+    )
+
+    assert renderer.render([legacy]) == "[user] Hi"